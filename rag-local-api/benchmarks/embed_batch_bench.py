@@ -0,0 +1,98 @@
+"""Micro-benchmark de escritura de embeddings por lotes.
+
+Mide fragmentos/segundo de config.ingestion.add_chunks_batched para distintas
+combinaciones de tamaño de lote y lotes en curso, contra el servidor falso de
+Ollama (benchmarks/fake_ollama.py) y una base Chroma temporal.
+
+Uso (desde rag-local-api/):
+    python -m benchmarks.embed_batch_bench --chunks 2000 --batch-sizes 8,32,128 --inflight 1,2,4
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_in_thread
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000, help="fragmentos a indexar por corrida")
+    parser.add_argument("--chunk-chars", type=int, default=800, help="caracteres por fragmento")
+    parser.add_argument("--batch-sizes", default="8,16,32,64,128")
+    parser.add_argument("--inflight", default="1,2,4")
+    parser.add_argument("--base-latency", type=float, default=0.02, help="latencia fija por llamada (s)")
+    parser.add_argument("--per-item-latency", type=float, default=0.002, help="latencia por texto (s)")
+    parser.add_argument("--parallel", type=int, default=2, help="llamadas que el servidor atiende a la vez")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de llamadas que fallan con 503")
+    parser.add_argument("--port", type=int, default=11500)
+    return parser.parse_args()
+
+
+def make_chunks(n: int, chars: int):
+    from langchain_core.documents import Document
+
+    words = "factura cuenta banco pago servicio mes valor total cliente plato precio menu".split()
+    chunks = []
+    for i in range(n):
+        text = " ".join(words[(i + j) % len(words)] for j in range(chars // 7)) + f" #{i}"
+        chunks.append(Document(page_content=text, metadata={"source": "bench.txt", "chunk_index": i}))
+    return chunks, [f"bench-{i}" for i in range(n)]
+
+
+async def run_case(chunks, ids, embeddings, batch_size: int, inflight: int) -> float:
+    from config.chroma_store import ChromaVectorStore
+    from config.ingestion import add_chunks_batched
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vectordb = ChromaVectorStore(tmp, "bench", embeddings)
+        start = time.perf_counter()
+        await add_chunks_batched(vectordb, chunks, ids, embeddings=embeddings,
+                                 batch_size=batch_size, max_inflight=inflight)
+        elapsed = time.perf_counter() - start
+        assert vectordb.count() == len(chunks)
+    return elapsed
+
+
+def main():
+    args = parse_args()
+    config = FakeOllamaConfig(args.base_latency, args.per_item_latency, args.parallel, args.error_rate)
+    url, server = start_in_thread(config, args.port)
+
+    # Se configura antes de importar config.*: sin caché de embeddings y apuntando al servidor falso
+    os.environ["OLLAMA_HOST"] = url
+    os.environ["EMBED_CACHE_ENABLED"] = "false"
+    os.environ.setdefault("EMBED_RETRY_BACKOFF", "0.05")
+    from langchain_ollama import OllamaEmbeddings
+
+    embeddings = OllamaEmbeddings(model="mxbai-embed-large", base_url=url)
+    chunks, ids = make_chunks(args.chunks, args.chunk_chars)
+
+    results = []
+    for batch_size in [int(x) for x in args.batch_sizes.split(",")]:
+        for inflight in [int(x) for x in args.inflight.split(",")]:
+            elapsed = asyncio.run(run_case(chunks, ids, embeddings, batch_size, inflight))
+            results.append({
+                "batch_size": batch_size,
+                "inflight": inflight,
+                "seconds": round(elapsed, 3),
+                "chunks_per_sec": round(len(chunks) / elapsed, 1),
+            })
+            print(json.dumps(results[-1]), file=sys.stderr)
+
+    print(json.dumps({
+        "benchmark": "embed_batch",
+        "chunks": args.chunks,
+        "fake_ollama": vars(config),
+        "results": results,
+    }, indent=2))
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
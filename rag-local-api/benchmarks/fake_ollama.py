@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+# Servidor local que imita la API de Ollama para correr benchmarks sin GPU.
+# Los embeddings son deterministas (derivados del hash del texto) y la latencia se simula:
+#   costo de una llamada = base_latency + per_item_latency * número de textos
+# con a lo sumo `parallel` llamadas atendidas a la vez, como un Ollama con OLLAMA_NUM_PARALLEL.
+# El chat simula la evaluación del prompt (prompt_latency + tokens del prompt / prompt_tokens_per_second)
+# y luego genera answer_tokens tokens a tokens_per_second, también con `parallel` respuestas a la vez.
+
+# Dimensión de los vectores generados
+EMBED_DIM = int(os.getenv("FAKE_EMBED_DIM", 1024))
+
+# Configuración de la latencia simulada
+class FakeOllamaConfig:
+    def __init__(self, base_latency: float = 0.02, per_item_latency: float = 0.002,
+                 parallel: int = 1, error_rate: float = 0.0, dim: int = EMBED_DIM,
+                 prompt_latency: float = 0.05, prompt_tokens_per_second: float = 2000.0,
+                 tokens_per_second: float = 50.0, answer_tokens: int = 20):
+        self.base_latency = base_latency
+        self.per_item_latency = per_item_latency
+        self.parallel = parallel
+        self.error_rate = error_rate
+        self.dim = dim
+        self.prompt_latency = prompt_latency
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+
+# Vector determinista y normalizado para un texto
+def fake_embedding(text: str, dim: int) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim)
+    # Las palabras comparten componentes, así textos parecidos quedan cerca entre sí
+    for word in text.lower().split():
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dim] += 3.0
+    return (vector / np.linalg.norm(vector)).tolist()
+
+# Crea la aplicación FastAPI del servidor falso
+def create_app(config: FakeOllamaConfig) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+    app.state.config = config
+    app.state.stats = {"embed_calls": 0, "embed_inputs": 0, "errors": 0, "chat_calls": 0, "chat_tokens": 0}
+    slots = asyncio.Semaphore(config.parallel)
+    chat_slots = asyncio.Semaphore(config.parallel)
+    call_counter = {"n": 0}
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "llama3.2:latest"}, {"name": "mxbai-embed-large:latest"}]}
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+
+        # Errores transitorios deterministas: uno de cada 1/error_rate llamadas
+        call_counter["n"] += 1
+        if config.error_rate and call_counter["n"] % max(1, round(1 / config.error_rate)) == 0:
+            app.state.stats["errors"] += 1
+            raise HTTPException(status_code=503, detail="fake overload")
+
+        async with slots:
+            await asyncio.sleep(config.base_latency + config.per_item_latency * len(inputs))
+        app.state.stats["embed_calls"] += 1
+        app.state.stats["embed_inputs"] += len(inputs)
+        return {"model": body.get("model"), "embeddings": [fake_embedding(t, config.dim) for t in inputs]}
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body.get("model")
+        prompt_chars = sum(len(message.get("content", "")) for message in body.get("messages", []))
+        prompt_tokens = max(1, prompt_chars // 4)
+        answer_tokens = min(config.answer_tokens, body.get("options", {}).get("num_predict") or config.answer_tokens)
+
+        def line(content: str, done: bool, **extra) -> str:
+            return json.dumps({
+                "model": model,
+                "created_at": "2024-01-01T00:00:00Z",
+                "message": {"role": "assistant", "content": content},
+                "done": done,
+                **extra,
+            }) + "\n"
+
+        async def generate():
+            async with chat_slots:
+                start = time.perf_counter()
+                await asyncio.sleep(config.prompt_latency + prompt_tokens / config.prompt_tokens_per_second)
+                prompt_done = time.perf_counter()
+                for i in range(answer_tokens):
+                    await asyncio.sleep(1 / config.tokens_per_second)
+                    yield line(f" token{i}", False)
+                end = time.perf_counter()
+            app.state.stats["chat_calls"] += 1
+            app.state.stats["chat_tokens"] += answer_tokens
+            yield line("", True, done_reason="stop",
+                       total_duration=int((end - start) * 1e9),
+                       load_duration=0,
+                       prompt_eval_count=prompt_tokens,
+                       prompt_eval_duration=int((prompt_done - start) * 1e9),
+                       eval_count=answer_tokens,
+                       eval_duration=int((end - prompt_done) * 1e9))
+
+        if body.get("stream", True):
+            return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+        # Sin stream: se devuelve un único objeto con la respuesta completa y los conteos finales
+        content, final = "", {}
+        async for chunk in generate():
+            data = json.loads(chunk)
+            content += data["message"]["content"]
+            final = data
+        final["message"]["content"] = content
+        return final
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+# Levanta el servidor en un hilo y devuelve (url, server) cuando ya acepta conexiones
+def start_in_thread(config: FakeOllamaConfig, port: int = 11500):
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
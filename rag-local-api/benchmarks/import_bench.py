@@ -0,0 +1,113 @@
+"""Benchmark del arranque en frío: cuánto tarda `import main` en un proceso nuevo.
+
+Importa la aplicación varias veces, cada una en un intérprete limpio, y reporta la
+mediana y el máximo junto con los módulos que más tiempo suman (python -X importtime).
+Además comprueba que las dependencias pesadas (LangChain/Ollama, loaders, Chroma,
+pypdf, python-docx) no se importen al arrancar: deben cargarse en el primer uso.
+
+Sale con código 1 si la mediana supera --budget-ms o si se importó algún módulo
+pesado, así se puede usar como verificación en CI.
+
+Uso (desde rag-local-api/):
+    python -m benchmarks.import_bench
+    python -m benchmarks.import_bench --runs 10 --budget-ms 1500 --output import.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_bench import API_DIR, git_commit
+
+# Módulos que no deben importarse al arrancar la API
+HEAVY_MODULES = (
+    "langchain_ollama",
+    "langchain_community",
+    "langchain_text_splitters",
+    "langchain_chroma",
+    "chromadb",
+    "pypdf",
+    "docx",
+)
+
+# Se ejecuta en el proceso hijo: mide la importación y lista los módulos pesados cargados
+PROBE = """
+import sys, json, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+heavy = sorted({name.split(".")[0] for name in sys.modules} & set(%r))
+print(json.dumps({"seconds": elapsed, "heavy": heavy}))
+""" % (HEAVY_MODULES,)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="importaciones, cada una en un proceso nuevo")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="mediana máxima permitida")
+    parser.add_argument("--top", type=int, default=15, help="módulos de primer nivel a listar")
+    parser.add_argument("--output", help="archivo donde guardar el JSON de resultados")
+    return parser.parse_args()
+
+
+def measure() -> dict:
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=API_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+# Tiempo acumulado por paquete de primer nivel según python -X importtime
+def top_packages(limit: int) -> list:
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=API_DIR,
+                            capture_output=True, text=True, check=True).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not self_us.isdigit():
+            continue
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [{"package": package, "ms": round(us / 1000, 1)} for package, us in ranked]
+
+
+def main():
+    args = parse_args()
+    runs = [measure() for _ in range(args.runs)]
+    times = [run["seconds"] * 1000 for run in runs]
+    heavy = sorted({name for run in runs for name in run["heavy"]})
+    median = statistics.median(times)
+
+    report = {
+        "benchmark": "import",
+        "commit": git_commit(),
+        "runs": args.runs,
+        "median_ms": round(median, 1),
+        "max_ms": round(max(times), 1),
+        "budget_ms": args.budget_ms,
+        "heavy_modules_loaded": heavy,
+        "top_packages": top_packages(args.top),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if median > args.budget_ms:
+        failures.append(f"la mediana ({median:.0f} ms) supera el presupuesto de {args.budget_ms:g} ms")
+    if heavy:
+        failures.append(f"módulos pesados importados al arrancar: {', '.join(heavy)}")
+    if failures:
+        print("ERROR: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
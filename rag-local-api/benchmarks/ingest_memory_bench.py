@@ -0,0 +1,244 @@
+"""Benchmark de memoria de la ingesta.
+
+Genera PDFs sintéticos de distintos tamaños (número de páginas), levanta la API
+(uvicorn en un subproceso) contra el servidor falso de Ollama y, para cada
+tamaño, sube el PDF a /ingest, espera el trabajo y reporta el pico de memoria
+(VmHWM de /proc, solo Linux) del proceso de la API y de sus procesos hijos
+(pool de parseo y administrador de colas), junto con el tiempo y los fragmentos.
+
+Cada tamaño corre en una API nueva para que el pico sea el de esa ingesta. Los
+índices residentes (HNSW de Chroma, índice BM25) crecen con el corpus sea cual sea
+la forma de ingerir, así que después de la ingesta la API se reinicia sobre los
+mismos datos, se hace una consulta para cargarlos y se reporta esa memoria
+(index_resident_rss_mb). La diferencia con el pico (ingest_overhead_mb) es lo que
+cuesta la ingesta en sí, y no debería crecer con el tamaño del PDF. Los embeddings
+falsos tienen pocas dimensiones por defecto (--dim) para que el índice no domine.
+
+Uso (desde rag-local-api/):
+    python -m benchmarks.ingest_memory_bench --fake-redis --pages 200,1000,4000
+    python -m benchmarks.ingest_memory_bench --pages 20000 --chars-per-page 4000 --output mem.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_in_thread
+from benchmarks.load_bench import CHAT_MODEL, start_api, start_fake_redis, wait_until_ready, git_commit
+
+WORDS = ("factura cuenta banco pago servicio mes valor total cliente plato precio menu desayuno "
+         "almuerzo cena titular ahorro periodo deuda compromiso producto contrato saldo").split()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="200,1000,4000", help="páginas de cada PDF, separadas por comas")
+    parser.add_argument("--chars-per-page", type=int, default=3000, help="caracteres de texto por página")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--app-env", action="append", default=[], help="variable extra para la API (CLAVE=VALOR)")
+    parser.add_argument("--parallel", type=int, default=8, help="llamadas que Ollama atiende a la vez")
+    parser.add_argument("--dim", type=int, default=64, help="dimensiones de los embeddings falsos")
+    parser.add_argument("--base-latency", type=float, default=0.002, help="latencia fija por llamada de embeddings (s)")
+    parser.add_argument("--per-item-latency", type=float, default=0.0002, help="latencia por texto embebido (s)")
+    parser.add_argument("--port", type=int, default=8100, help="puerto de la API")
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--fake-redis", action="store_true", help="usar un Redis en proceso (fakeredis)")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--redis-db", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="archivo donde guardar el JSON de resultados")
+    # Usados por start_api
+    parser.add_argument("--workers", type=int, default=1, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def _pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+# Escribe un PDF de texto plano página a página (sin tenerlo completo en memoria)
+def write_pdf(path: str, pages: int, chars_per_page: int, rng: random.Random) -> int:
+    # Objetos: 1 catálogo, 2 árbol de páginas, 3 fuente; luego página y contenido por cada página
+    offsets = {}
+    with open(path, "wb") as f:
+        def write_object(number: int, body: bytes) -> None:
+            offsets[number] = f.tell()
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for page in range(pages):
+            lines = [f"Pagina {page + 1}. Producto {page}: precio ${rng.randint(1, 99)}.{rng.randint(0, 999):03d}."]
+            while sum(len(line) for line in lines) < chars_per_page:
+                lines.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14))) + ".")
+            content = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(f"({_pdf_text(line)}) Tj T*" for line in lines) + " ET"
+            content = content.encode("latin-1")
+            page_number, content_number = 4 + 2 * page, 5 + 2 * page
+            write_object(page_number, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                                      b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_number)
+            write_object(content_number, b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        kids = b" ".join(b"%d 0 R" % (4 + 2 * page) for page in range(pages))
+        write_object(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages)
+
+        xref_offset = f.tell()
+        size = 4 + 2 * pages
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for number in range(1, size):
+            f.write(b"%010d 00000 n \n" % offsets[number])
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_offset))
+    return os.path.getsize(path)
+
+
+# Pico de memoria residente (MB) de un proceso, según /proc
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def child_pids(pid: int) -> list:
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                children += [int(child) for child in f.read().split()]
+        except FileNotFoundError:
+            continue
+    return children + [grandchild for child in children for grandchild in child_pids(child)]
+
+
+async def ingest_pdf(client: httpx.AsyncClient, path: str, args) -> dict:
+    with open(path, "rb") as f:
+        response = await client.post(
+            "/ingest",
+            files={"files": (os.path.basename(path), f, "application/pdf")},
+            data={"chunk_size": str(args.chunk_size), "chunk_overlap": str(args.chunk_overlap)},
+        )
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        job = (await client.get(f"/ingest/{job_id}")).json()
+        if job["finished_at"]:
+            break
+        await asyncio.sleep(0.1)
+    if job["status"] != "indexed":
+        raise RuntimeError(job.get("errors"))
+    return job
+
+
+# Ejecuta `action(client, process)` en una API recién levantada y la detiene al terminar
+async def with_api(args, env: dict, workdir: str, action):
+    log_path = os.path.join(workdir, "api.log")
+    process = start_api(args, env, log_path)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=3600) as client:
+            await wait_until_ready(client, process)
+            return await action(client, process)
+    except Exception:
+        with open(log_path) as log:
+            print(log.read()[-4000:], file=sys.stderr)
+        raise
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+async def run_size(args, env: dict, workdir: str, pdf_path: str) -> dict:
+    async def ingest(client, process):
+        idle_mb = peak_rss_mb(process.pid)
+        start = time.perf_counter()
+        job = await ingest_pdf(client, pdf_path, args)
+        elapsed = time.perf_counter() - start
+        children = [peak_rss_mb(pid) for pid in child_pids(process.pid)]
+        return {
+            "seconds": round(elapsed, 2),
+            "pages": job["files"][0].get("pages"),
+            "chunks": job["total_chunks"],
+            "api_rss_before_ingest_mb": round(idle_mb, 1),
+            "api_peak_rss_mb": round(peak_rss_mb(process.pid), 1),
+            "children_peak_rss_mb": round(max(children, default=0.0), 1),
+            "timings": job["files"][0]["timings"],
+        }
+
+    # Memoria de la API con el corpus ya cargado (sin ingesta de por medio)
+    async def resident(client, process):
+        response = await client.post("/ask_model", json={"question": "¿Cuál es el precio del producto 7?",
+                                                         "model": CHAT_MODEL})
+        response.raise_for_status()
+        return peak_rss_mb(process.pid)
+
+    result = await with_api(args, env, workdir, ingest)
+    resident_mb = await with_api(args, env, workdir, resident)
+    result["index_resident_rss_mb"] = round(resident_mb, 1)
+    result["ingest_overhead_mb"] = round(result["api_peak_rss_mb"] - resident_mb, 1)
+    return result
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    config = FakeOllamaConfig(base_latency=args.base_latency, per_item_latency=args.per_item_latency,
+                              parallel=args.parallel, dim=args.dim)
+    ollama_url, ollama_server = start_in_thread(config, args.ollama_port)
+
+    if args.fake_redis:
+        start_fake_redis(args.redis_port)
+
+    workdir = tempfile.mkdtemp(prefix="rag_mem_bench_")
+    results = []
+    try:
+        for pages in [int(x) for x in args.pages.split(",")]:
+            pdf_path = os.path.join(workdir, f"synthetic_{pages}.pdf")
+            size = write_pdf(pdf_path, pages, args.chars_per_page, rng)
+            run_dir = os.path.join(workdir, f"run_{pages}")
+            env = {
+                **os.environ,
+                "OLLAMA_HOST": ollama_url,
+                "REDIS_HOST": args.redis_host,
+                "REDIS_PORT": str(args.redis_port),
+                "REDIS_DB": str(args.redis_db),
+                "CHROMA_DIR": os.path.join(run_dir, "chroma"),
+                "EMBED_CACHE_PATH": os.path.join(run_dir, "embedding_cache", "embeddings.sqlite3"),
+                "MAX_FILE_SIZE_MB": str(max(1024, size // (1024 * 1024) + 1)),
+            }
+            env.update(item.split("=", 1) for item in args.app_env)
+            result = {"pdf_pages": pages, "pdf_mb": round(size / (1024 * 1024), 1),
+                      **asyncio.run(run_size(args, env, workdir, pdf_path))}
+            results.append(result)
+            print(json.dumps(result), file=sys.stderr)
+            os.remove(pdf_path)
+    finally:
+        ollama_server.should_exit = True
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "ingest_memory",
+        "commit": git_commit(),
+        "app_env": args.app_env,
+        "chars_per_page": args.chars_per_page,
+        "embedding_dim": args.dim,
+        "chunk_size": args.chunk_size,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
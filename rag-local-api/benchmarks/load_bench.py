@@ -0,0 +1,344 @@
+"""Benchmark de carga de la API completa.
+
+Levanta la API (uvicorn en un subproceso) contra el servidor falso de Ollama
+(benchmarks/fake_ollama.py), un Redis local y un directorio temporal para Chroma
+y la caché de embeddings. Luego ejecuta tres fases (cuatro con --batch-questions) y
+reporta throughput y latencias p50/p95/p99 en JSON, para comparar corridas entre commits:
+
+  1. ingest:  sube documentos sintéticos a /ingest y espera cada trabajo
+  2. ask:     preguntas a /ask_model con la concurrencia indicada
+  3. history: lecturas de /history con la misma concurrencia
+  4. batch:   --batch-questions preguntas en una sola solicitud a /ask_batch (respuesta NDJSON),
+              para comparar su throughput con el de la fase ask
+
+Redis: con --fake-redis se levanta un servidor en proceso (requiere fakeredis y
+lupa); si no, se usa el Redis de --redis-host/--redis-port en la base --redis-db,
+que se vacía al empezar. fakeredis agrega algunos milisegundos por comando, así que
+para comparar latencias de /history conviene un Redis real.
+
+Uso (desde rag-local-api/):
+    python -m benchmarks.load_bench --fake-redis --asks 200 --concurrency 1,8,32 --output bench.json
+    python -m benchmarks.load_bench --app-env RETRIEVAL_MODE=mmr --tokens-per-second 20
+    python -m benchmarks.load_bench --fake-redis --batch-questions 200 --concurrency 4
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_in_thread
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHAT_MODEL = "llama3.2:latest"
+
+QUESTIONS = [
+    "¿Cuál es el precio del producto {n}?",
+    "¿Qué número de cuenta aparece en la factura {n}?",
+    "¿Cuál es el plato más caro del menú {n}?",
+    "¿Qué servicios se prestaron en el periodo {n}?",
+    "Resume el documento {n}",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20, help="documentos sintéticos a ingerir")
+    parser.add_argument("--doc-chars", type=int, default=8000, help="caracteres por documento")
+    parser.add_argument("--ingest-concurrency", type=int, default=4, help="subidas a /ingest en paralelo")
+    parser.add_argument("--asks", type=int, default=100, help="solicitudes a /ask_model por nivel de concurrencia")
+    parser.add_argument("--history-requests", type=int, default=200, help="solicitudes a /history por nivel")
+    parser.add_argument("--concurrency", default="1,8", help="niveles de concurrencia, separados por comas")
+    parser.add_argument("--batch-questions", type=int, default=0,
+                        help="preguntas por solicitud a /ask_batch en cada nivel (0 omite la fase)")
+    parser.add_argument("--workers", type=int, default=1, help="procesos de uvicorn")
+    parser.add_argument("--app-env", action="append", default=[], help="variable extra para la API (CLAVE=VALOR)")
+    # Servidor falso de Ollama
+    parser.add_argument("--parallel", type=int, default=4, help="llamadas que Ollama atiende a la vez")
+    parser.add_argument("--base-latency", type=float, default=0.02, help="latencia fija por llamada de embeddings (s)")
+    parser.add_argument("--per-item-latency", type=float, default=0.002, help="latencia por texto embebido (s)")
+    parser.add_argument("--prompt-latency", type=float, default=0.05, help="latencia fija de evaluación del prompt (s)")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="velocidad de generación")
+    parser.add_argument("--answer-tokens", type=int, default=20, help="tokens por respuesta")
+    # Puertos y Redis
+    parser.add_argument("--port", type=int, default=8100, help="puerto de la API")
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--fake-redis", action="store_true", help="usar un Redis en proceso (fakeredis)")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--redis-db", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="archivo donde guardar el JSON de resultados")
+    return parser.parse_args()
+
+
+# Latencias en milisegundos y throughput de una fase
+def summarize(latencies, errors: int, elapsed: float) -> dict:
+    values = np.array(latencies) * 1000 if latencies else np.array([0.0])
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(float(np.percentile(values, 50)), 1),
+            "p95": round(float(np.percentile(values, 95)), 1),
+            "p99": round(float(np.percentile(values, 99)), 1),
+            "mean": round(float(values.mean()), 1),
+            "max": round(float(values.max()), 1),
+        },
+    }
+
+
+def make_document(n: int, chars: int, rng: random.Random) -> str:
+    words = ("factura cuenta banco pago servicio mes valor total cliente plato precio menu "
+             "desayuno almuerzo cena titular ahorro periodo deuda compromiso producto").split()
+    lines = [
+        f"Documento {n}. Producto {n}: precio ${rng.randint(1, 99)}.{rng.randint(0, 999):03d}.",
+        f"Cuenta de pagos {rng.randint(100, 999)}-{rng.randint(100000, 999999)}-{n:02d}, titular Cliente {n}.",
+    ]
+    while sum(len(line) for line in lines) < chars:
+        lines.append(" ".join(rng.choice(words) for _ in range(rng.randint(8, 20))) + ".")
+    return "\n\n".join(lines)
+
+
+# Servidor Redis en proceso (solo para benchmarks)
+def start_fake_redis(port: int) -> None:
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+
+def start_api(args, env: dict, log_path: str) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+               "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"]
+    log = open(log_path, "w")
+    return subprocess.Popen(command, cwd=API_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_until_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("La API terminó al iniciar; revise el log")
+        try:
+            response = await client.get("/models")
+            if response.status_code == 200 and response.json().get("models"):
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("La API no respondió a tiempo")
+
+
+# Ejecuta `total` llamadas a `call(i)` con a lo sumo `concurrency` en curso
+async def drive(total: int, concurrency: int, call) -> dict:
+    latencies, errors, counter = [], 0, iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                await call(i)
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def ingest_phase(client: httpx.AsyncClient, args, rng: random.Random) -> dict:
+    documents = [make_document(n, args.doc_chars, rng) for n in range(args.docs)]
+    chunks = {"total": 0}
+
+    async def ingest(i: int):
+        files = {"files": (f"bench_{i}.txt", documents[i].encode("utf-8"), "text/plain")}
+        response = await client.post("/ingest", files=files)
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        while True:
+            job = (await client.get(f"/ingest/{job_id}")).json()
+            if job["status"] in ("indexed", "partial_success"):
+                break
+            await asyncio.sleep(0.05)
+        if job["status"] != "indexed":
+            raise RuntimeError(job.get("errors"))
+        chunks["total"] += job["total_chunks"]
+
+    result = await drive(args.docs, args.ingest_concurrency, ingest)
+    result["concurrency"] = args.ingest_concurrency
+    result["chunks"] = chunks["total"]
+    result["chunks_per_sec"] = round(chunks["total"] / result["seconds"], 1) if result["seconds"] else 0.0
+    return result
+
+
+async def ask_phase(client: httpx.AsyncClient, args, concurrency: int, rng: random.Random) -> dict:
+    stage_timings = {}
+
+    async def ask(i: int):
+        question = rng.choice(QUESTIONS).format(n=rng.randrange(args.docs))
+        response = await client.post("/ask_model", json={
+            "question": question,
+            "model": CHAT_MODEL,
+            "session_id": f"bench-{i % concurrency}",
+            "include_timings": True,
+        })
+        response.raise_for_status()
+        for stage, seconds in response.json().get("timings", {}).items():
+            stage_timings.setdefault(stage, []).append(seconds)
+
+    result = await drive(args.asks, concurrency, ask)
+    result["concurrency"] = concurrency
+    # Mediana de cada etapa según la propia API, para ver dónde se va el tiempo
+    result["server_stage_p50_ms"] = {
+        stage: round(float(np.percentile(values, 50)) * 1000, 1) for stage, values in stage_timings.items()
+    }
+    return result
+
+
+async def history_phase(client: httpx.AsyncClient, args, concurrency: int) -> dict:
+    async def history(i: int):
+        response = await client.get("/history", params={"session_id": f"bench-{i % concurrency}", "limit": 20})
+        response.raise_for_status()
+
+    result = await drive(args.history_requests, concurrency, history)
+    result["concurrency"] = concurrency
+    return result
+
+
+async def batch_phase(client: httpx.AsyncClient, args, concurrency: int, rng: random.Random) -> dict:
+    questions = [rng.choice(QUESTIONS).format(n=rng.randrange(args.docs)) for _ in range(args.batch_questions)]
+    arrivals, errors, summary = [], 0, {}
+    start = time.perf_counter()
+    async with client.stream("POST", "/ask_batch", json={
+        "questions": questions,
+        "model": CHAT_MODEL,
+        "concurrency": concurrency,
+    }) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            item = json.loads(line)
+            if item.get("done"):
+                summary = item
+                continue
+            arrivals.append(time.perf_counter() - start)
+            errors += "error" in item
+    elapsed = time.perf_counter() - start
+    return {
+        "questions": len(questions),
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_qps": round(len(arrivals) / elapsed, 2) if elapsed else 0.0,
+        "first_answer_ms": round(arrivals[0] * 1000, 1) if arrivals else None,
+        # Etapas compartidas por todo el lote (embeddings, recuperación...) según la propia API
+        "server_stage_ms": {stage: round(seconds * 1000, 1) for stage, seconds in summary.get("timings", {}).items()},
+    }
+
+
+async def run_phases(args, process: subprocess.Popen) -> dict:
+    rng = random.Random(args.seed)
+    levels = [int(x) for x in args.concurrency.split(",")]
+    limits = httpx.Limits(max_connections=max(levels + [args.ingest_concurrency]) * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=600, limits=limits) as client:
+        await wait_until_ready(client, process)
+        phases = {"ingest": await ingest_phase(client, args, rng), "ask": [], "history": [], "batch": []}
+        print(json.dumps({"ingest": phases["ingest"]}), file=sys.stderr)
+        for concurrency in levels:
+            phases["ask"].append(await ask_phase(client, args, concurrency, rng))
+            print(json.dumps({"ask": phases["ask"][-1]}), file=sys.stderr)
+            phases["history"].append(await history_phase(client, args, concurrency))
+            print(json.dumps({"history": phases["history"][-1]}), file=sys.stderr)
+            if args.batch_questions:
+                phases["batch"].append(await batch_phase(client, args, concurrency, rng))
+                print(json.dumps({"batch": phases["batch"][-1]}), file=sys.stderr)
+    return phases
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    args = parse_args()
+    config = FakeOllamaConfig(
+        base_latency=args.base_latency, per_item_latency=args.per_item_latency, parallel=args.parallel,
+        prompt_latency=args.prompt_latency, prompt_tokens_per_second=args.prompt_tokens_per_second,
+        tokens_per_second=args.tokens_per_second, answer_tokens=args.answer_tokens,
+    )
+    ollama_url, ollama_server = start_in_thread(config, args.ollama_port)
+
+    if args.fake_redis:
+        start_fake_redis(args.redis_port)
+    else:
+        import redis
+
+        redis.Redis(host=args.redis_host, port=args.redis_port, db=args.redis_db).flushdb()
+
+    workdir = tempfile.mkdtemp(prefix="rag_bench_")
+    env = {
+        **os.environ,
+        "OLLAMA_HOST": ollama_url,
+        "REDIS_HOST": args.redis_host,
+        "REDIS_PORT": str(args.redis_port),
+        "REDIS_DB": str(args.redis_db),
+        "CHROMA_DIR": os.path.join(workdir, "chroma"),
+        "EMBED_CACHE_PATH": os.path.join(workdir, "embedding_cache", "embeddings.sqlite3"),
+        "ANSWER_CACHE_ENABLED": "false",
+    }
+    env.update(item.split("=", 1) for item in args.app_env)
+
+    log_path = os.path.join(workdir, "api.log")
+    process = start_api(args, env, log_path)
+    try:
+        phases = asyncio.run(run_phases(args, process))
+    except Exception:
+        with open(log_path) as log:
+            print(log.read()[-4000:], file=sys.stderr)
+        raise
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        ollama_server.should_exit = True
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "load",
+        "commit": git_commit(),
+        "workers": args.workers,
+        "app_env": args.app_env,
+        "docs": args.docs,
+        "doc_chars": args.doc_chars,
+        "fake_ollama": vars(config),
+        "phases": phases,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
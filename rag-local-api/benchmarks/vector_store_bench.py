@@ -0,0 +1,193 @@
+"""Benchmark de las bases vectoriales: Chroma frente al índice NumPy (int8 / float16).
+
+Genera vectores sintéticos agrupados (parecidos a embeddings reales), los carga en
+cada backend y, en un proceso nuevo por backend, mide:
+
+  - open_seconds:   importar el backend y abrir la base ya guardada
+  - first_query_ms: primera consulta (incluye traer las páginas del disco)
+  - latencias p50/p95 de similitud (k), MMR y similitud con filtro de metadatos
+  - peak_rss_mb:    pico de memoria del proceso (VmHWM, solo Linux)
+  - recall@k frente a la búsqueda exacta en float32
+
+Uso (desde rag-local-api/):
+    python -m benchmarks.vector_store_bench --rows 50000 --dim 1024
+    python -m benchmarks.vector_store_bench --rows 300000 --backends numpy-int8 --index ivf --output vec.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_bench import git_commit
+
+BACKENDS = ("chroma", "numpy-int8", "numpy-float16")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000, help="vectores en la base")
+    parser.add_argument("--dim", type=int, default=1024, help="dimensiones (mxbai-embed-large usa 1024)")
+    parser.add_argument("--clusters", type=int, default=500, help="grupos de vectores parecidos")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--index", default="flat", choices=("flat", "ivf"), help="índice del backend numpy")
+    parser.add_argument("--batch-size", type=int, default=2000, help="vectores por upsert al cargar")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="archivo donde guardar el JSON de resultados")
+    # Uso interno: mide un backend ya cargado en un proceso nuevo
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def make_data(args):
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((args.clusters, args.dim))
+    data = normalized(centers[rng.integers(0, args.clusters, args.rows)] + 0.8 * rng.standard_normal((args.rows, args.dim)))
+    picks = rng.integers(0, args.rows, args.queries)
+    queries = normalized(data[picks] + 0.3 * rng.standard_normal((args.queries, args.dim)) / np.sqrt(args.dim) * 10)
+    return data, queries
+
+
+def open_store(backend: str, path: str, index: str):
+    if backend == "chroma":
+        from config.chroma_store import ChromaVectorStore
+        return ChromaVectorStore(path, "bench")
+    from config.numpy_store import NumpyVectorStore
+    return NumpyVectorStore(path, quantization=backend.split("-")[1], index=index)
+
+
+def load(backend: str, path: str, data: np.ndarray, args) -> float:
+    store = open_store(backend, path, args.index)
+    start = time.perf_counter()
+    for begin in range(0, len(data), args.batch_size):
+        end = min(begin + args.batch_size, len(data))
+        store.upsert(
+            ids=[f"c{i}" for i in range(begin, end)],
+            embeddings=data[begin:end].tolist(),
+            documents=[f"fragmento {i}" for i in range(begin, end)],
+            metadatas=[{"doc_id": f"d{i % 100}", "chunk_index": i} for i in range(begin, end)],
+        )
+    if backend != "chroma" and args.index == "ivf":
+        store.build_index()
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed
+
+
+def peak_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def percentiles(values) -> dict:
+    values = np.array(values) * 1000
+    return {"p50": round(float(np.percentile(values, 50)), 2), "p95": round(float(np.percentile(values, 95)), 2)}
+
+
+# Se ejecuta en un proceso nuevo: abre la base, responde las consultas y reporta por stdout
+def probe(args) -> None:
+    queries = np.load(os.path.join(args.path, "..", "queries.npy"))
+    start = time.perf_counter()
+    store = open_store(args.probe, args.path, args.index)
+    open_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store.similarity_search_by_vector(queries[0].tolist(), k=args.k)
+    first_query = time.perf_counter() - start
+
+    similarity, mmr, filtered, results = [], [], [], []
+    for query in queries:
+        query = query.tolist()
+        start = time.perf_counter()
+        docs = store.similarity_search_by_vector(query, k=args.k)
+        similarity.append(time.perf_counter() - start)
+        results.append([int(doc.id[1:]) for doc in docs])
+
+        start = time.perf_counter()
+        store.max_marginal_relevance_search_by_vector(query, k=args.k, fetch_k=20, lambda_mult=0.8)
+        mmr.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        store.similarity_search_by_vector(query, k=args.k, where={"doc_id": "d7"})
+        filtered.append(time.perf_counter() - start)
+
+    print(json.dumps({
+        "open_seconds": round(open_seconds, 3),
+        "first_query_ms": round(first_query * 1000, 2),
+        "similarity_ms": percentiles(similarity),
+        "mmr_ms": percentiles(mmr),
+        "filtered_ms": percentiles(filtered),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "results": results,
+    }))
+
+
+def disk_mb(path: str) -> float:
+    total = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return round(total / (1024 * 1024), 1)
+
+
+def main():
+    args = parse_args()
+    if args.probe:
+        probe(args)
+        return
+
+    data, queries = make_data(args)
+    truth = [set(np.argsort(-(data @ query))[:args.k].tolist()) for query in queries]
+    workdir = tempfile.mkdtemp(prefix="rag_vec_bench_")
+    np.save(os.path.join(workdir, "queries.npy"), queries)
+    results = []
+    try:
+        for backend in args.backends.split(","):
+            path = os.path.join(workdir, backend)
+            load_seconds = load(backend, path, data, args)
+            command = [sys.executable, "-m", "benchmarks.vector_store_bench", "--probe", backend, "--path", path,
+                       "--index", args.index, "--k", str(args.k)]
+            output = subprocess.run(command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                    capture_output=True, text=True, check=True).stdout
+            measured = json.loads(output.strip().splitlines()[-1])
+            found = measured.pop("results")
+            recall = np.mean([len(truth[i] & set(ids)) / args.k for i, ids in enumerate(found)])
+            result = {"backend": backend, "load_seconds": round(load_seconds, 2), "disk_mb": disk_mb(path),
+                      **measured, f"recall_at_{args.k}": round(float(recall), 4)}
+            results.append(result)
+            print(json.dumps(result), file=sys.stderr)
+            shutil.rmtree(path, ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "vector_store",
+        "commit": git_commit(),
+        "rows": args.rows,
+        "dim": args.dim,
+        "index": args.index,
+        "k": args.k,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
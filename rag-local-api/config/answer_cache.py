@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import base64
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.redis_client import redis_client
+from config.utils import run_blocking
+
+# Caché semántica de respuestas (opt-in): si una pregunta nueva es muy parecida a una ya
+# respondida con el mismo modelo y el corpus no cambió desde entonces, se devuelve esa respuesta.
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+
+# Similitud coseno mínima entre preguntas para considerar un acierto
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95))
+
+# Respuestas guardadas por modelo y versión del corpus (se conservan las más recientes)
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 500))
+
+# Tiempo de vida de las entradas (segundos)
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", 86400))
+
+ANSWER_CACHE_PREFIX = "answer_cache:"
+
+# Clave de Redis: una lista por versión del corpus y modelo
+def _cache_key(corpus_version: int, model: str) -> str:
+    return f"{ANSWER_CACHE_PREFIX}{corpus_version}:{model}"
+
+# Los vectores se guardan como float32 en base64 (más compacto y rápido de leer que una lista JSON)
+def _encode_vector(vector: List[float]) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+def _decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+# Busca una respuesta para una pregunta similar; None si no hay acierto
+async def lookup_answer(question_embedding: List[float], model: str, corpus_version: int) -> Optional[Dict]:
+    try:
+        entries = await redis_client.lrange(_cache_key(corpus_version, model), 0, -1)
+        if not entries:
+            return None
+        # Decodificar hasta ANSWER_CACHE_MAX_ENTRIES entradas y compararlas es trabajo de CPU: va al executor
+        return await run_blocking(_best_match, entries, question_embedding)
+    except Exception as e:
+        # La caché es opcional: si Redis falla la pregunta se responde como un fallo de caché
+        print(f"Error al consultar la caché de respuestas en Redis: {e}")
+        return None
+
+# Entrada guardada más parecida a la pregunta si supera el umbral de similitud; None si no hay acierto
+def _best_match(entries: List[str], question_embedding: List[float]) -> Optional[Dict]:
+    entries = [json.loads(entry) for entry in entries]
+    matrix = np.stack([_decode_vector(entry["embedding"]) for entry in entries])
+    query = np.asarray(question_embedding, dtype=np.float32)
+
+    # Similitud coseno contra todas las preguntas guardadas a la vez
+    norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+    similarities = matrix @ query / np.where(norms == 0, 1.0, norms)
+    best = int(np.argmax(similarities))
+    if similarities[best] < ANSWER_CACHE_SIMILARITY:
+        return None
+
+    entry = entries[best]
+    entry.pop("embedding")
+    entry["similarity"] = round(float(similarities[best]), 4)
+    return entry
+
+# Guarda una respuesta generada para reutilizarla con preguntas similares
+async def store_answer(question: str, question_embedding: List[float], model: str,
+                       corpus_version: int, chunk_ids: List[str], answer: str) -> None:
+    key = _cache_key(corpus_version, model)
+    entry = json.dumps({
+        "question": question,
+        "embedding": _encode_vector(question_embedding),
+        "chunk_ids": chunk_ids,
+        "answer": answer,
+        "created_at": time.time(),
+    })
+    try:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.lpush(key, entry)
+            pipe.ltrim(key, 0, ANSWER_CACHE_MAX_ENTRIES - 1)
+            pipe.expire(key, ANSWER_CACHE_TTL)
+            await pipe.execute()
+    except Exception as e:
+        print(f"Error al guardar en la caché de respuestas en Redis: {e}")
+
+# Elimina todas las respuestas guardadas (se llama cuando cambia la versión del corpus)
+async def clear_answer_cache() -> None:
+    keys = [key async for key in redis_client.scan_iter(match=ANSWER_CACHE_PREFIX + "*")]
+    if keys:
+        await redis_client.delete(*keys)
@@ -0,0 +1,36 @@
+import os
+from typing import List, Optional
+
+from config import settings
+from config.utils import run_blocking
+from config.scheduler import scheduler, BULK
+from config.query_cache import lookup_query_embedding, store_query_embedding
+
+# Máximo de preguntas por solicitud a /ask_batch
+ASK_BATCH_MAX_QUESTIONS = int(os.getenv("ASK_BATCH_MAX_QUESTIONS", 500))
+
+# Respuestas de un lote que se generan a la vez (la solicitud puede pedir menos). Los lotes esperan
+# turno en el planificador con prioridad de ingesta, así no desplazan a las preguntas interactivas.
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", 4))
+
+# Vectores de las preguntas que ya están en la caché de embeddings (None en las que faltan)
+def _cached_vectors(questions: List[str]) -> List[Optional[List[float]]]:
+    lookup_query = getattr(settings.get_embeddings(), "lookup_query", None)
+    if lookup_query is None:
+        return [None] * len(questions)
+    return [lookup_query(question) for question in questions]
+
+# Embeddings de todas las preguntas del lote: se buscan en memoria, luego en la caché en disco, y las
+# que faltan se calculan en una sola llamada a Ollama (sin repetir textos), con un turno de prioridad de ingesta
+async def embed_questions(questions: List[str]) -> List[List[float]]:
+    vectors = [lookup_query_embedding(question) for question in questions]
+    pending = [question for question, vector in zip(questions, vectors) if vector is None]
+    found = dict(zip(pending, await run_blocking(_cached_vectors, pending))) if pending else {}
+    missing = [question for question, vector in found.items() if vector is None]
+    if missing:
+        async with scheduler.slot(settings.EMBED_MODEL, BULK):
+            embeddings = await run_blocking(settings.get_embeddings)
+            found.update(zip(missing, await run_blocking(embeddings.embed_documents, missing)))
+    for question, vector in found.items():
+        store_query_embedding(question, vector)
+    return [found[question] if vector is None else vector for question, vector in zip(questions, vectors)]
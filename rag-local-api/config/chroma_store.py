@@ -0,0 +1,98 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from chromadb import HttpClient, PersistentClient
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from config.vector_store import VectorStore
+
+# Cliente de Chroma: un servidor (host:puerto), que pueden compartir varios workers y contenedores,
+# o la base embebida en el directorio indicado, que solo debe abrir un proceso a la vez
+def create_client(path: Optional[str] = None, host: Optional[str] = None, port: int = 8000):
+    if host:
+        return HttpClient(host=host, port=port)
+    return PersistentClient(path=path)
+
+# Base vectorial sobre Chroma. Este módulo solo se importa si VECTOR_BACKEND=chroma,
+# así la API no carga chromadb cuando usa otro backend.
+class ChromaVectorStore(VectorStore):
+    def __init__(self, path: Optional[str], collection_name: str, embedding_function=None,
+                 host: Optional[str] = None, port: int = 8000):
+        self._client = create_client(path, host, port)
+        self._db = Chroma(
+            client=self._client,
+            collection_name=collection_name,
+            embedding_function=embedding_function,  # convertir documentos en vectores
+        )
+        self._collection = self._db._collection
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Sequence[str] = ("documents", "metadatas")) -> Dict:
+        result = self._collection.get(ids=ids, where=where, include=list(include))
+        return {
+            "ids": result["ids"],
+            "documents": result.get("documents") if "documents" in include else None,
+            "metadatas": result.get("metadatas") if "metadatas" in include else None,
+        }
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+               metadatas: List[Dict]) -> None:
+        self._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update(self, ids: List[str], metadatas: List[Dict]) -> None:
+        self._collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids: List[str]) -> None:
+        self._collection.delete(ids=ids)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    where: Optional[Dict] = None) -> List[Document]:
+        return self._db.similarity_search_by_vector(embedding, k=k, filter=where)
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5,
+                                                where: Optional[Dict] = None) -> List[Document]:
+        return self._db.max_marginal_relevance_search_by_vector(
+            embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=where
+        )
+
+    # Varias consultas en una sola llamada a la colección
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                     where: Optional[Dict] = None) -> List[List[Document]]:
+        if not embeddings:
+            return []
+        result = self._collection.query(query_embeddings=embeddings, n_results=k, where=where,
+                                        include=["documents", "metadatas"])
+        return [
+            [Document(id=chunk_id, page_content=text, metadata=metadata or {})
+             for chunk_id, text, metadata in zip(ids, documents, metadatas)]
+            for ids, documents, metadatas in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+
+    def max_marginal_relevance_search_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                                 fetch_k: int = 20, lambda_mult: float = 0.5,
+                                                 where: Optional[Dict] = None) -> List[List[Document]]:
+        if not embeddings:
+            return []
+        result = self._collection.query(query_embeddings=embeddings, n_results=fetch_k, where=where,
+                                        include=["documents", "metadatas", "embeddings"])
+        results = []
+        for embedding, ids, documents, metadatas, vectors in zip(
+            embeddings, result["ids"], result["documents"], result["metadatas"], result["embeddings"]
+        ):
+            if not ids:
+                results.append([])
+                continue
+            selected = maximal_marginal_relevance(np.asarray(embedding, dtype=np.float32), vectors,
+                                                  k=k, lambda_mult=lambda_mult)
+            results.append([Document(id=ids[i], page_content=documents[i], metadata=metadatas[i] or {})
+                            for i in selected])
+        return results
+
+    def close(self) -> None:
+        self._client = None
@@ -0,0 +1,232 @@
+import os
+import re
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from config.prompt_template import build_prompt, SYSTEM_PROMPT
+from config.settings import context_window
+
+# Caracteres por token usados para estimar el tamaño del prompt (aproximación para español/inglés)
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", 4))
+
+# Tokens reservados para la respuesta del modelo
+ANSWER_RESERVED_TOKENS = int(os.getenv("ANSWER_RESERVED_TOKENS", 768))
+
+# Máximo de tokens de historial que se agregan al prompt (se descartan los pares más antiguos)
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", 512))
+
+# Máximo de tokens de contexto aunque la ventana del modelo permita más (prompts más cortos = menos prompt-eval)
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 1536))
+
+# Mínimo de tokens de contexto que se reservan antes de agregar el historial: si la pregunta y el
+# historial no dejan este espacio, se recorta el historial (el contexto recuperado tiene prioridad)
+CONTEXT_MIN_TOKENS = int(os.getenv("CONTEXT_MIN_TOKENS", 256))
+
+# Similitud (Jaccard sobre trigramas de palabras) a partir de la cual dos fragmentos se consideran duplicados
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", 0.8))
+
+# Separador entre fragmentos de contexto
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# Resultado del armado del prompt
+@dataclass
+class PromptContext:
+    prompt: str
+    sources: List[Dict] = field(default_factory=list)
+    prompt_tokens_estimated: int = 0
+    context_tokens_estimated: int = 0
+    history_pairs: int = 0
+    chunks_retrieved: int = 0
+    chunks_merged: int = 0
+    chunks_duplicated: int = 0
+    chunks_dropped: int = 0
+    context_truncated: bool = False
+
+# Estima la cantidad de tokens de un texto
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+# Fragmento de contexto: uno o varios fragmentos recuperados y unidos, con su mejor posición en el ranking
+@dataclass
+class _Passage:
+    text: str
+    rank: int
+    source: Optional[str]
+    page: Optional[int]
+    doc_id: Optional[str]
+    first_index: Optional[int]
+    last_index: Optional[int]
+    chunk_overlap: int
+    chunk_ids: List[str]
+
+# Une dos textos consecutivos quitando el solapamiento que dejó chunk_overlap
+def _join_overlapping(first: str, second: str, max_overlap: int) -> str:
+    limit = min(len(first), len(second), max_overlap)
+    for size in range(limit, 0, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return first + "\n" + second
+
+# Une los fragmentos contiguos (chunk_index consecutivos) del mismo documento y página.
+# Devuelve los pasajes ordenados por su mejor posición en el ranking y cuántos fragmentos se unieron.
+def merge_adjacent(docs: List[Document]) -> Tuple[List[_Passage], int]:
+    passages = [
+        _Passage(
+            text=doc.page_content,
+            rank=rank,
+            source=doc.metadata.get("source"),
+            page=doc.metadata.get("page"),
+            doc_id=doc.metadata.get("doc_id"),
+            first_index=doc.metadata.get("chunk_index"),
+            last_index=doc.metadata.get("chunk_index"),
+            chunk_overlap=doc.metadata.get("chunk_overlap") or 0,
+            chunk_ids=[doc.id or doc.metadata.get("chunk_id")],
+        )
+        for rank, doc in enumerate(docs)
+    ]
+
+    # Solo se pueden unir fragmentos con posición conocida (los indexados antes no tienen chunk_index)
+    groups: Dict[Tuple, List[_Passage]] = {}
+    merged: List[_Passage] = []
+    for passage in passages:
+        if passage.doc_id is None or passage.first_index is None:
+            merged.append(passage)
+        else:
+            groups.setdefault((passage.doc_id, passage.page), []).append(passage)
+
+    merged_count = 0
+    for group in groups.values():
+        group.sort(key=lambda p: p.first_index)
+        current = group[0]
+        for passage in group[1:]:
+            if passage.last_index <= current.last_index:
+                # El mismo fragmento recuperado dos veces
+                current.rank = min(current.rank, passage.rank)
+                merged_count += 1
+            elif passage.first_index == current.last_index + 1:
+                current.text = _join_overlapping(current.text, passage.text, passage.chunk_overlap)
+                current.last_index = passage.last_index
+                current.rank = min(current.rank, passage.rank)
+                current.chunk_ids.extend(passage.chunk_ids)
+                merged_count += 1
+            else:
+                merged.append(current)
+                current = passage
+        merged.append(current)
+
+    merged.sort(key=lambda p: p.rank)
+    return merged, merged_count
+
+# Trigramas de palabras de un texto, para comparar fragmentos casi idénticos
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < 3:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + 3]) for i in range(len(words) - 2)}
+
+# Descarta pasajes casi idénticos a otro mejor posicionado (por ejemplo, el mismo texto en dos archivos)
+def drop_near_duplicates(passages: List[_Passage], threshold: float = None) -> Tuple[List[_Passage], int]:
+    threshold = CONTEXT_DEDUP_THRESHOLD if threshold is None else threshold
+    kept: List[Tuple[_Passage, set]] = []
+    dropped = 0
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        is_duplicate = any(
+            len(shingles & other) / max(1, len(shingles | other)) >= threshold
+            for _, other in kept
+        )
+        if is_duplicate:
+            dropped += 1
+        else:
+            kept.append((passage, shingles))
+    return [passage for passage, _ in kept], dropped
+
+# Encabezado con el origen del pasaje
+def _format_passage(passage: _Passage) -> str:
+    header = f"[Fuente: {passage.source or 'desconocida'}"
+    if passage.page is not None:
+        header += f", página {passage.page + 1}"
+    return f"{header}]\n{passage.text.strip()}"
+
+# Agrega los pasajes por orden de relevancia mientras quepan en el presupuesto de tokens.
+# Si ni el más relevante cabe, se incluye recortado para no dejar al modelo sin contexto.
+def pack_passages(passages: List[_Passage], max_tokens: int) -> Tuple[List[str], List[_Passage]]:
+    blocks: List[str] = []
+    used: List[_Passage] = []
+    remaining = max_tokens
+    for passage in passages:
+        block = _format_passage(passage)
+        cost = estimate_tokens(block) + (estimate_tokens(CONTEXT_SEPARATOR) if blocks else 0)
+        if cost <= remaining:
+            blocks.append(block)
+            used.append(passage)
+            remaining -= cost
+    if not blocks and passages and max_tokens > 0:
+        blocks.append(_format_passage(passages[0])[:int(max_tokens * CHARS_PER_TOKEN)])
+        used.append(passages[0])
+    return blocks, used
+
+# Texto del historial con los pares más recientes que quepan en max_tokens
+def build_history_text(pairs: List[Dict], max_tokens: int = None) -> Tuple[str, int]:
+    max_tokens = HISTORY_MAX_TOKENS if max_tokens is None else max_tokens
+    lines: List[str] = []
+    remaining = max_tokens
+    for item in reversed(pairs):
+        line = f"👤 Usuario: {item['question']}\n🤖 IA: {item['answer']}"
+        cost = estimate_tokens(line) + 1
+        if cost > remaining:
+            break
+        lines.insert(0, line)
+        remaining -= cost
+    return "\n".join(lines), len(lines)
+
+# Arma el prompt final: contexto sin duplicados y empaquetado según la ventana del modelo, e historial
+# acotado. El contexto tiene prioridad: el historial solo usa lo que queda después de reservar
+# CONTEXT_MIN_TOKENS, y aunque la pregunta llene la ventana se incluye el pasaje más relevante recortado.
+def build_prompt_context(question: str, docs: List[Document], history_pairs: List[Dict],
+                         model_name: str) -> PromptContext:
+    passages, merged_count = merge_adjacent(docs)
+    passages, duplicate_count = drop_near_duplicates(passages)
+
+    # Lo que queda de la ventana tras las instrucciones, la pregunta y la respuesta
+    system_tokens = estimate_tokens(SYSTEM_PROMPT)
+    question_tokens = system_tokens + estimate_tokens(build_prompt(question, "", ""))
+    available = context_window(model_name) - ANSWER_RESERVED_TOKENS - question_tokens
+    min_context = min(CONTEXT_MIN_TOKENS, CONTEXT_MAX_TOKENS) if passages else 0
+
+    history_budget = max(0, min(HISTORY_MAX_TOKENS, available - min_context))
+    history_text, history_count = build_history_text(history_pairs, history_budget)
+    history_tokens = estimate_tokens(build_prompt(question, "", history_text)) - estimate_tokens(
+        build_prompt(question, "", "")
+    )
+    context_budget = max(min_context, min(CONTEXT_MAX_TOKENS, available - history_tokens))
+
+    blocks, used = pack_passages(passages, context_budget)
+    context = CONTEXT_SEPARATOR.join(blocks)
+
+    # Se avisa si la ventana no alcanzó ni para el contexto mínimo o si el historial se recortó por él
+    context_truncated = bool(passages) and available < min_context
+    if context_truncated:
+        print(f"Contexto recortado a {context_budget} tokens: la pregunta casi llena la ventana de '{model_name}'")
+    if history_count < len(history_pairs) and history_budget < HISTORY_MAX_TOKENS:
+        print(f"Historial recortado a {history_count} de {len(history_pairs)} pares para dejar espacio al contexto")
+
+    prompt = build_prompt(question, context, history_text)
+    return PromptContext(
+        prompt=prompt,
+        sources=[
+            {"source": p.source, "page": p.page, "chunk_ids": p.chunk_ids}
+            for p in used
+        ],
+        prompt_tokens_estimated=system_tokens + estimate_tokens(prompt),
+        context_tokens_estimated=estimate_tokens(context),
+        history_pairs=history_count,
+        chunks_retrieved=len(docs),
+        chunks_merged=merged_count,
+        chunks_duplicated=duplicate_count,
+        chunks_dropped=len(passages) - len(used),
+        context_truncated=context_truncated,
+    )
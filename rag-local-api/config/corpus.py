@@ -0,0 +1,53 @@
+from config import settings
+from config.utils import run_blocking
+from config.redis_client import redis_client
+from config.answer_cache import clear_answer_cache
+from config.query_cache import clear_retrieval_cache
+
+# Contador compartido que identifica la versión actual del corpus indexado.
+# Cualquier cambio en la colección (ingesta, borrado de un documento, reseteo) lo incrementa,
+# y las cachés que dependen de los documentos usan esta versión en sus claves.
+CORPUS_VERSION_KEY = "corpus_version"
+
+# Generación actual de la base vectorial; /reset_embeddings la incrementa (ver config/settings.py)
+VECTOR_GENERATION_KEY = "vector_generation"
+
+# Versión actual del corpus (0 si nunca se ha modificado)
+async def get_corpus_version() -> int:
+    return int(await redis_client.get(CORPUS_VERSION_KEY) or 0)
+
+# Incrementa la versión del corpus y avisa a las cachés que dependen de ella. La caché local de
+# recuperación se vacía primero, así este proceso no sirve resultados viejos aunque Redis falle.
+async def bump_corpus_version() -> int:
+    clear_retrieval_cache()
+    version = await redis_client.incr(CORPUS_VERSION_KEY)
+    await clear_answer_cache()
+    return version
+
+# Reserva una generación nueva (vacía) de la base vectorial
+async def new_vector_generation() -> int:
+    return await redis_client.incr(VECTOR_GENERATION_KEY)
+
+# Pone al día las bases abiertas por este proceso con lo que hicieron los demás workers:
+# abre la generación actual si cambió y recarga los cambios si cambió la versión del corpus.
+# Sin Redis el proceso sigue con lo que ya tiene abierto.
+async def sync_corpus() -> None:
+    try:
+        version, generation = await redis_client.mget(CORPUS_VERSION_KEY, VECTOR_GENERATION_KEY)
+    except Exception as e:
+        print(f"No se pudo leer la versión del corpus: {e}")
+        return
+    generation, version = int(generation or 0), int(version or 0)
+    if (generation, version) != settings.corpus_state():
+        await run_blocking(settings.sync_corpus_state, generation, version)
+
+# Base vectorial de la generación actual, sincronizada con los demás procesos
+async def get_synced_vectordb():
+    await sync_corpus()
+    return await run_blocking(settings.get_vectordb)
+
+# Base vectorial e índice léxico de la generación actual (los dos de la misma), sincronizados
+# con los demás procesos. Lo usan las operaciones que escriben en ambos.
+async def get_synced_indexes():
+    await sync_corpus()
+    return await run_blocking(settings.get_indexes)
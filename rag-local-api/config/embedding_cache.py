@@ -0,0 +1,149 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# Número de claves por consulta SQL (SQLite limita la cantidad de parámetros)
+_SQL_BATCH = 500
+
+# Almacén en disco (SQLite) de embeddings ya calculados, con expulsión de los menos usados
+class EmbeddingStore:
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Se comparte entre los hilos del executor, por eso el acceso va protegido con un lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    # Devuelve los vectores encontrados para las claves dadas y marca su último uso
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), _SQL_BATCH):
+                batch = keys[i:i + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("d", blob).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})", [now, *batch]
+                    )
+            self._conn.commit()
+        return found
+
+    # Guarda nuevos vectores y, si se supera el límite, elimina los menos usados recientemente
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, array("d", vector).tobytes(), now) for key, vector in items.items()],
+            )
+            self._entries += self._conn.total_changes - before
+
+            if self._entries > self.max_entries:
+                # Se libera un 10% extra para no expulsar en cada inserción
+                excess = self._entries - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn.commit()
+
+    # Cantidad de vectores almacenados
+    def __len__(self) -> int:
+        return self._entries
+
+# Envoltorio de un modelo de embeddings que evita recalcular textos ya vistos.
+# La clave es hash(modelo + texto), así que sobrevive a /reset_embeddings y a cambios de chunk_size:
+# al reingestar solo se paga por los fragmentos realmente nuevos.
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying: Embeddings, model_name: str, store: EmbeddingStore):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    # Clave de caché direccionada por contenido
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        cached = self.store.get_many(list(set(keys)))
+
+        # Textos faltantes, sin repetir (un mismo fragmento puede aparecer varias veces)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.store.put_many(computed)
+            cached.update(computed)
+
+        with self._counter_lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [cached[key] for key in keys]
+
+    # Devuelve el vector de una consulta si ya está en caché (sin llamar al modelo), o None
+    def lookup_query(self, text: str) -> Optional[List[float]]:
+        key = self._key(text)
+        cached = self.store.get_many([key])
+        if key not in cached:
+            return None
+        with self._counter_lock:
+            self.hits += 1
+        return cached[key]
+
+    def embed_query(self, text: str) -> List[float]:
+        cached = self.lookup_query(text)
+        if cached is not None:
+            return cached
+
+        key = self._key(text)
+        vector = self.underlying.embed_query(text)
+        self.store.put_many({key: vector})
+        with self._counter_lock:
+            self.misses += 1
+        return vector
+
+    # Contadores de aciertos/fallos y tamaño actual de la caché
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": len(self.store),
+            "max_entries": self.store.max_entries,
+        }
@@ -0,0 +1,80 @@
+import os
+import time
+import asyncio
+from typing import Dict, Optional
+
+from config import settings
+from config.utils import ollama_http, run_blocking
+from config.redis_client import redis_client
+from config.corpus import get_synced_vectordb
+
+# Abre en segundo plano, al iniciar la API, el modelo de embeddings, la base vectorial y el índice
+# léxico (importa LangChain y Chroma). Con "false" se abren en la primera solicitud que los use.
+STARTUP_PRELOAD = os.getenv("STARTUP_PRELOAD", "true").lower() == "true"
+
+# Tiempo máximo de cada comprobación de /readyz (segundos)
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", 2))
+
+_preload_task: Optional[asyncio.Task] = None
+
+# Importa las dependencias pesadas y abre las bases de la generación actual; los errores solo se
+# registran (la primera solicitud que las necesite lo vuelve a intentar). Si el índice léxico hay que
+# reconstruirlo (índices anteriores a la marca de generación), se hace aquí y no en una consulta.
+async def preload() -> None:
+    from config.retrieval import ensure_lexical_index
+
+    start = time.time()
+    try:
+        await run_blocking(settings.get_embeddings)
+        vectordb = await get_synced_vectordb()
+        await run_blocking(ensure_lexical_index, vectordb)
+        print(f"Base vectorial y modelo de embeddings listos en {time.time() - start:.2f} segundos")
+    except Exception as e:
+        print(f"No se pudo abrir la base vectorial al iniciar: {e}")
+
+# Lanza la apertura en segundo plano para que la API acepte conexiones (y responda /healthz) de inmediato
+def start_preload() -> None:
+    global _preload_task
+    if STARTUP_PRELOAD and _preload_task is None:
+        _preload_task = asyncio.create_task(preload())
+
+# Cancela la apertura si sigue en curso al apagar la API
+async def stop_preload() -> None:
+    global _preload_task
+    if _preload_task is not None:
+        _preload_task.cancel()
+        try:
+            await _preload_task
+        except asyncio.CancelledError:
+            pass
+        _preload_task = None
+
+async def _ping_redis() -> None:
+    await redis_client.ping()
+
+async def _ping_ollama() -> None:
+    response = await ollama_http.get("/api/version")
+    response.raise_for_status()
+
+async def _open_vector_store() -> None:
+    if _preload_task is not None and not _preload_task.done():
+        raise RuntimeError("abriendo la base vectorial")
+    vectordb = await get_synced_vectordb()
+    await run_blocking(vectordb.count)
+
+# Ejecuta una comprobación con tiempo límite y devuelve su resultado
+async def _check(probe) -> Dict:
+    try:
+        await asyncio.wait_for(probe(), HEALTH_CHECK_TIMEOUT)
+        return {"ok": True}
+    except asyncio.TimeoutError:
+        return {"ok": False, "error": f"sin respuesta en {HEALTH_CHECK_TIMEOUT:g} segundos"}
+    except Exception as e:
+        return {"ok": False, "error": (str(e).splitlines() or [type(e).__name__])[0]}
+
+# Estado de las dependencias que necesita la API para atender consultas (se comprueban en paralelo)
+async def readiness() -> Dict:
+    probes = {"redis": _ping_redis, "ollama": _ping_ollama, "vector_store": _open_vector_store}
+    results = await asyncio.gather(*(_check(probe) for probe in probes.values()))
+    checks = dict(zip(probes, results))
+    return {"ready": all(check["ok"] for check in checks.values()), "checks": checks}
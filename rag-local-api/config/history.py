@@ -1,76 +1,126 @@
 import os
 import json
-from redis import Redis
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime, timezone
 
-# Configuración de conexión a Redis, variables definidas en "api" de docker-compose
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
-
-# Inicializa el cliente Redis
-try:
-    redis_client = Redis(
-        host=REDIS_HOST,
-        port=REDIS_PORT,
-        db=REDIS_DB,
-        decode_responses=True  # Hace que las respuestas sean strings en lugar de bytes
-    )
-    redis_client.ping()  # Verifica si Redis está disponible
-    print("Conexión a Redis exitosa.")
-except Exception as e:
-    print(f"Error al conectar a Redis: {e}")
-
-# Clave por defecto donde se almacenará el historial de conversación
-DEFAULT_HISTORY_REDIS_KEY = "conversation_history:default_single_user"
-
-# cargar el historial desde Redis
-def _load_history_from_redis() -> List[Dict[str, str]]:
-    try:
-        history_json = redis_client.get(DEFAULT_HISTORY_REDIS_KEY)
-        if history_json:
-            return json.loads(history_json)  # Convierte el JSON a lista de diccionarios
-    except Exception as e:
-        print(f"Error al cargar historial desde Redis: {e}")
-    return []
+# Cliente asíncrono de Redis compartido (configurado con las variables de docker-compose)
+from config.redis_client import redis_client
+
+# Sesión usada cuando el cliente no envía un session_id
+DEFAULT_SESSION_ID = "default_single_user"
+
+# Máximo de pares guardados por sesión (0 = sin límite); se descartan los más antiguos
+HISTORY_MAX_PAIRS = int(os.getenv("HISTORY_MAX_PAIRS", 1000))
+
+# Tiempo de vida de una sesión sin actividad, en segundos (0 = no expira)
+HISTORY_TTL_SECONDS = int(os.getenv("HISTORY_TTL_SECONDS", 0))
+
+# Clave antigua donde se guardaba todo el historial como un único JSON
+LEGACY_HISTORY_REDIS_KEY = "conversation_history:default_single_user"
 
-#guardar el historial en Redis
-def _save_history_to_redis(history: List[Dict[str, str]]) -> None:
+# Cada sesión es una lista de Redis (un elemento JSON por par) más un contador de ids
+def _history_key(session_id: str) -> str:
+    return f"chat_history:{session_id}"
+
+def _sequence_key(session_id: str) -> str:
+    return f"chat_history:{session_id}:seq"
+
+# Agrega un par con un id consecutivo, recorta la lista y renueva el TTL en una sola operación
+# atómica, así dos solicitudes simultáneas no se pisan ni desordenan los ids
+_APPEND_SCRIPT = redis_client.register_script("""
+local item = cjson.decode(ARGV[1])
+item['id'] = redis.call('INCR', KEYS[2])
+redis.call('RPUSH', KEYS[1], cjson.encode(item))
+local max_pairs = tonumber(ARGV[2])
+if max_pairs > 0 then
+    redis.call('LTRIM', KEYS[1], -max_pairs, -1)
+end
+local ttl = tonumber(ARGV[3])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+    redis.call('EXPIRE', KEYS[2], ttl)
+end
+return item['id']
+""")
+
+# Agrega un nuevo par pregunta-respuesta al historial (O(1)) y lo devuelve con su id
+async def add_pair(question: str, answer: str, session_id: str = DEFAULT_SESSION_ID) -> Dict:
+    # Obtiene la fecha y hora actual
+    item = {
+        "question": question,
+        "answer": answer,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
     try:
-        redis_client.set(DEFAULT_HISTORY_REDIS_KEY, json.dumps(history))
+        item["id"] = await _APPEND_SCRIPT(
+            keys=[_history_key(session_id), _sequence_key(session_id)],
+            args=[json.dumps(item), HISTORY_MAX_PAIRS, HISTORY_TTL_SECONDS],
+        )
     except Exception as e:
         print(f"Error al guardar historial en Redis: {e}")
+    return item
 
-# Retorna todo el historial guardado en Redis
-def get_full_history() -> List[Dict[str, str]]:
-    return _load_history_from_redis()
-
-# Elimina completamente el historial de Redis
-def clear_history() -> None:
+# Obtiene los últimos 'k' pares pregunta-respuesta (O(k) con LRANGE)
+async def get_last_pairs(k: int = 2, session_id: str = DEFAULT_SESSION_ID) -> List[Dict]:
+    if k <= 0:
+        return []
     try:
-        redis_client.delete(DEFAULT_HISTORY_REDIS_KEY)
+        items = await redis_client.lrange(_history_key(session_id), -k, -1)
+        return [json.loads(item) for item in items]
     except Exception as e:
-        print(f"Error al eliminar historial de Redis: {e}")
+        print(f"Error al cargar historial desde Redis: {e}")
+        return []
 
-# Obtiene los últimos 'k' pares pregunta-respuesta
-def get_last_pairs(k: int = 2) -> List[Dict[str, str]]:
-    current_history = _load_history_from_redis()
-    # Retorna los últimos k elementos si hay suficientes
-    return current_history[-k:] if len(current_history) > k else current_history
+# Devuelve una página del historial en orden cronológico, empezando por lo más reciente.
+# 'cursor' es el id del primer elemento de la página anterior: se devuelven los pares más
+# antiguos que él. 'next_cursor' es None cuando ya no hay más páginas.
+async def get_history_page(session_id: str = DEFAULT_SESSION_ID, cursor: Optional[int] = None,
+                           limit: int = 20) -> Dict:
+    empty_page = {"session_id": session_id, "items": [], "next_cursor": None}
+    key = _history_key(session_id)
+    try:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.lindex(key, 0)
+            pipe.llen(key)
+            first, length = await pipe.execute()
 
-# Agrega un nuevo par pregunta-respuesta al historial
-def add_pair(question: str, answer: str) -> None:
-    current_history = _load_history_from_redis()
+        if not first:
+            return empty_page
 
-    # Obtiene la fecha y hora actual
-    timestamp_utc = datetime.now(timezone.utc).isoformat()
+        # Los ids son consecutivos dentro de la lista, así que la posición se calcula a partir del primero
+        first_id = json.loads(first)["id"]
+        end = length if cursor is None else max(0, min(length, cursor - first_id))
+        start = max(0, end - limit)
+        items = [json.loads(item) for item in await redis_client.lrange(key, start, end - 1)] if end > start else []
+    except Exception as e:
+        print(f"Error al cargar historial desde Redis: {e}")
+        return empty_page
 
-    current_history.append({
-        "question": question,
-        "answer": answer,
-        "timestamp": timestamp_utc
-    })
+    return {
+        "session_id": session_id,
+        "items": items,
+        "next_cursor": items[0]["id"] if start > 0 and items else None,
+    }
 
-    # Guarda el historial actualizado
-    _save_history_to_redis(current_history)
\ No newline at end of file
+# Elimina completamente el historial de una sesión
+async def clear_history(session_id: str = DEFAULT_SESSION_ID) -> None:
+    try:
+        await redis_client.delete(_history_key(session_id), _sequence_key(session_id))
+    except Exception as e:
+        print(f"Error al eliminar historial de Redis: {e}")
+
+# Convierte el historial guardado con el formato anterior (un único JSON) a la lista por sesión
+async def migrate_legacy_history() -> None:
+    try:
+        if await redis_client.type(LEGACY_HISTORY_REDIS_KEY) != "string":
+            return
+        legacy = json.loads(await redis_client.get(LEGACY_HISTORY_REDIS_KEY) or "[]")
+        for item in legacy:
+            await _APPEND_SCRIPT(
+                keys=[_history_key(DEFAULT_SESSION_ID), _sequence_key(DEFAULT_SESSION_ID)],
+                args=[json.dumps(item), HISTORY_MAX_PAIRS, HISTORY_TTL_SECONDS],
+            )
+        await redis_client.delete(LEGACY_HISTORY_REDIS_KEY)
+        print(f"Historial migrado al formato por sesión: {len(legacy)} pares.")
+    except Exception as e:
+        print(f"Error al migrar el historial anterior: {e}")
@@ -0,0 +1,263 @@
+import os
+import time
+import queue
+import asyncio
+import multiprocessing
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from config import ingestion
+from config.jobs import save_job
+from config.corpus import bump_corpus_version, get_synced_indexes
+from config.parsing import stream_documents, friendly_error
+from config.utils import run_blocking
+from config.metrics import INGEST_STAGE_SECONDS, INGEST_FILES, IN_FLIGHT
+
+# Procesos dedicados a parsear PDF/DOCX (trabajo de CPU que no debe competir con el event loop)
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", 2))
+
+# Archivos de un mismo trabajo que avanzan por el pipeline a la vez
+INGEST_FILE_CONCURRENCY = int(os.getenv("INGEST_FILE_CONCURRENCY", 4))
+
+# Archivos que pueden estar calculando embeddings/escribiendo en Chroma a la vez
+INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", 2))
+
+# Páginas ya parseadas que pueden esperar a ser fragmentadas por cada archivo; si se llena,
+# el proceso de parseo se detiene hasta que la ingesta avance (acota la memoria)
+INGEST_PAGE_QUEUE = int(os.getenv("INGEST_PAGE_QUEUE", 64))
+
+# Cada cuánto se revisa si el proceso de parseo terminó mientras no llegan páginas (segundos)
+_PAGE_POLL_SECONDS = 0.5
+
+# Archivo subido y guardado en disco, listo para procesarse en segundo plano
+@dataclass
+class UploadedFile:
+    filename: str
+    suffix: str
+    path: str
+    file_hash: str
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_manager = None
+
+# Pool de procesos para el parseo; se crea en el primer uso.
+# Se usa "spawn" para no hacer fork de un proceso con hilos y conexiones abiertas.
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=INGEST_PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_pool
+
+# Administrador de multiprocessing que aloja las colas de páginas compartidas con el pool
+def get_manager():
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.get_context("spawn").Manager()
+    return _manager
+
+# Cierra el administrador de colas y el pool de procesos (se llama al apagar la API).
+# El administrador va primero para que ningún proceso del pool quede esperando en una cola.
+def shutdown_parse_pool() -> None:
+    global _parse_pool, _manager
+    if _manager is not None:
+        _manager.shutdown()
+        _manager = None
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+# Crea el divisor de fragmentos (langchain_text_splitters se importa en la primera ingesta, no al arrancar)
+def create_splitter(chunk_size: int, chunk_overlap: int):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+# Parsea un archivo en el pool de procesos y entrega sus páginas a medida que se leen.
+# Los errores de parseo se propagan al terminar; si quien consume se detiene antes, el parseo se cancela.
+async def stream_pages(upload: UploadedFile) -> AsyncIterator[Document]:
+    loop = asyncio.get_running_loop()
+    manager = await loop.run_in_executor(None, get_manager)
+    pages = manager.Queue(maxsize=INGEST_PAGE_QUEUE)
+    stop = manager.Event()
+    future = loop.run_in_executor(
+        get_parse_pool(), stream_documents, upload.path, upload.suffix, upload.filename, pages, stop
+    )
+    try:
+        while True:
+            try:
+                # La espera no ocupa hilos del executor acotado, que atiende las consultas
+                page = await loop.run_in_executor(None, pages.get, True, _PAGE_POLL_SECONDS)
+            except queue.Empty:
+                if future.done():
+                    break  # El proceso terminó sin enviar el final: su error se lanza abajo
+                continue
+            if page is None:
+                break
+            yield page
+        await future
+    finally:
+        if not future.done():
+            stop.set()
+
+# Tareas en ejecución (se guarda la referencia para que no las recoja el recolector de basura)
+_running_jobs = set()
+
+# Lanza un trabajo de ingesta en segundo plano
+def start_ingest_job(job: Dict, uploads: List[UploadedFile]) -> None:
+    task = asyncio.create_task(run_ingest_job(job, uploads))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+
+# Ejecuta el pipeline parseo → fragmentación → embeddings/escritura para todos los archivos del trabajo.
+# Los archivos avanzan en paralelo y, dentro de cada uno, las páginas: mientras una tanda calcula
+# embeddings, las páginas siguientes se siguen parseando.
+async def run_ingest_job(job: Dict, uploads: List[UploadedFile]) -> None:
+    with IN_FLIGHT.labels(endpoint="ingest_job").track_inprogress():
+        await _run_ingest_job(job, uploads)
+
+async def _run_ingest_job(job: Dict, uploads: List[UploadedFile]) -> None:
+    start = time.time()
+    try:
+        job["status"] = "running"
+        await save_job(job)
+
+        file_slots = asyncio.Semaphore(INGEST_FILE_CONCURRENCY)
+        embed_slots = asyncio.Semaphore(INGEST_EMBED_CONCURRENCY)
+        try:
+            vectordb, lexical_index = await get_synced_indexes()
+            await asyncio.gather(*[
+                _process_file(job, entry, upload, vectordb, lexical_index, file_slots, embed_slots)
+                for entry, upload in zip(job["files"], uploads)
+            ])
+        except Exception as e:
+            # Error general (por ejemplo, la base vectorial no se pudo abrir)
+            for entry in job["files"]:
+                if entry["status"] not in ("indexed", "unchanged", "error"):
+                    entry["status"] = "error"
+                    entry["error"] = f"Hubo un error al procesar '{entry['file']}': {e}"
+
+        # Resumen con la misma forma que la respuesta síncrona anterior de /ingest
+        errors = job.get("upload_errors", []) + [
+            {"file": f["file"], "error": f["error"]} for f in job["files"] if f["status"] == "error"
+        ]
+        job.update({
+            "status": "partial_success" if errors else "indexed",
+            "files_indexed": [f["file"] for f in job["files"] if f["status"] == "indexed"],
+            "files_unchanged": [f["file"] for f in job["files"] if f["status"] == "unchanged"],
+            "total_chunks": sum(f["chunks"] for f in job["files"] if f["status"] == "indexed"),
+            "chunks_added": sum(f.get("chunks_added", 0) for f in job["files"]),
+            "chunks_removed": sum(f.get("chunks_removed", 0) for f in job["files"]),
+            "elapsed": round(time.time() - start, 3),
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        })
+        if errors:
+            job["errors"] = errors
+
+        # Si la colección cambió, las cachés que dependen del corpus dejan de ser válidas
+        if job["chunks_added"] or job["chunks_removed"]:
+            await bump_corpus_version()
+        await save_job(job)
+    except BaseException as e:
+        # Falló el propio trabajo (Redis caído, cancelación al apagar...): se marca como error para
+        # que quien consulta su estado no espere indefinidamente
+        print(f"Error en el trabajo de ingesta {job['job_id']}: {e!r}")
+        job.update({
+            "status": "error",
+            "error": f"Hubo un error al procesar el trabajo de ingesta: {str(e) or type(e).__name__}",
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        })
+        try:
+            await asyncio.shield(save_job(job))
+        except BaseException as save_error:
+            print(f"No se pudo guardar el estado del trabajo {job['job_id']}: {save_error!r}")
+        if not isinstance(e, Exception):
+            raise  # La cancelación se propaga; los demás errores ya quedaron registrados en el trabajo
+    finally:
+        for upload in uploads:
+            if os.path.exists(upload.path):
+                os.remove(upload.path)
+
+# Procesa un archivo del trabajo actualizando su progreso en Redis en cada etapa
+async def _process_file(job, entry, upload: UploadedFile, vectordb, lexical_index, file_slots,
+                        embed_slots) -> None:
+    chunk_size, chunk_overlap = job["chunk_size"], job["chunk_overlap"]
+    timings = entry["timings"]
+
+    async def set_status(status: str) -> None:
+        entry["status"] = status
+        if status in ("indexed", "unchanged", "error"):
+            INGEST_FILES.labels(status=status).inc()
+        await save_job(job)
+
+    try:
+        async with file_slots:
+            # Si el archivo ya está indexado con el mismo contenido y parámetros, no se reprocesa
+            doc_id = ingestion.document_id(upload.filename)
+            existing = await run_blocking(ingestion.get_document_chunks, vectordb, doc_id)
+            if ingestion.is_unchanged(existing, upload.file_hash, chunk_size, chunk_overlap):
+                await set_status("unchanged")
+                return
+
+            # Parseo (pool de procesos) → fragmentación → embeddings/escritura en streaming: cada página
+            # se fragmenta en cuanto llega y los fragmentos nuevos se envían a Ollama por tandas, así la
+            # memoria usada no depende del tamaño del archivo
+            await set_status("parsing")
+            start = time.time()
+            splitter = await run_blocking(create_splitter, chunk_size, chunk_overlap)
+            doc_metadata = ingestion.document_metadata(
+                doc_id, upload.filename, upload.file_hash, chunk_size, chunk_overlap
+            )
+            sync = ingestion.DocumentSync(vectordb, lexical_index, doc_id, existing, doc_metadata)
+            split_seconds = embed_seconds = 0.0
+
+            async def flush() -> None:
+                nonlocal embed_seconds
+                async with embed_slots:
+                    entry["status"] = "embedding"
+                    stage_start = time.time()
+                    await sync.flush()
+                    embed_seconds += time.time() - stage_start
+                entry["chunks"] = sync.chunks
+                await save_job(job)
+
+            try:
+                async for page in stream_pages(upload):
+                    stage_start = time.time()
+                    sync.add(await run_blocking(splitter.split_documents, [page]))
+                    split_seconds += time.time() - stage_start
+                    entry["pages"] += 1
+                    if sync.pending >= ingestion.INGEST_FLUSH_CHUNKS:
+                        await flush()
+
+                async with embed_slots:
+                    stage_start = time.time()
+                    result = await sync.finish()
+                    embed_seconds += time.time() - stage_start
+            except BaseException:
+                try:
+                    await asyncio.shield(run_blocking(sync.rollback))
+                except Exception as e:
+                    print(f"No se pudo deshacer la ingesta parcial de '{upload.filename}': {e}")
+                raise
+
+            # El parseo corre en paralelo con el resto: su tiempo es lo que se esperó por páginas
+            parse_seconds = max(0.0, time.time() - start - split_seconds - embed_seconds)
+            timings["parse"] = round(parse_seconds, 3)
+            timings["split"] = round(split_seconds, 3)
+            timings["embed"] = round(embed_seconds, 3)
+            INGEST_STAGE_SECONDS.labels(stage="parse").observe(parse_seconds)
+            INGEST_STAGE_SECONDS.labels(stage="split").observe(split_seconds)
+
+            entry["chunks"] = sync.chunks
+            entry["chunks_added"] = result["added"]
+            entry["chunks_removed"] = result["removed"]
+            await set_status("indexed")
+    except Exception as e:
+        entry["error"] = friendly_error(upload.filename, e)
+        await set_status("error")
@@ -0,0 +1,261 @@
+import os
+import time
+import asyncio
+import hashlib
+import httpx
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from langchain_core.documents import Document
+
+from config import settings
+from config.utils import run_blocking
+from config.metrics import INGEST_STAGE_SECONDS
+from config.scheduler import scheduler, BULK
+
+# Fragmentos por llamada de embeddings a Ollama
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+
+# Lotes que pueden estar en curso a la vez (calculando embeddings o escribiéndose en la base vectorial)
+EMBED_MAX_INFLIGHT = int(os.getenv("EMBED_MAX_INFLIGHT", 2))
+
+# Reintentos de un lote ante errores transitorios de Ollama, y espera inicial entre ellos (segundos)
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 3))
+EMBED_RETRY_BACKOFF = float(os.getenv("EMBED_RETRY_BACKOFF", 1.0))
+
+# Fragmentos que se acumulan durante la ingesta de un archivo antes de enviarlos a embeddings.
+# Tandas más grandes reparten mejor el costo fijo de cada escritura (índice léxico, progreso en Redis).
+INGEST_FLUSH_CHUNKS = int(os.getenv("INGEST_FLUSH_CHUNKS", EMBED_BATCH_SIZE * EMBED_MAX_INFLIGHT * 4))
+
+# Bloque de lectura al copiar una subida a disco (bytes)
+UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", 1024 * 1024))
+
+# Identificador estable de un documento, derivado de su nombre de archivo.
+# Subir de nuevo un archivo con el mismo nombre reemplaza al documento anterior.
+def document_id(filename: str) -> str:
+    return hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16]
+
+# Copia un archivo por bloques y devuelve la huella de su contenido (para detectar si cambió
+# desde la última ingesta). El archivo nunca se tiene completo en memoria.
+def copy_with_fingerprint(source, destination, block_size: int = None) -> str:
+    digest = hashlib.sha256()
+    while block := source.read(block_size or UPLOAD_BLOCK_SIZE):
+        digest.update(block)
+        destination.write(block)
+    return digest.hexdigest()
+
+# Asigna IDs deterministas a los fragmentos: hash del contenido + número de aparición.
+# Un fragmento que no cambió conserva su ID aunque se mueva de posición en el archivo.
+# Para asignar por tandas (página a página) se pasan el conteo `seen` y el índice inicial de la tanda.
+def assign_chunk_ids(doc_id: str, chunks: List[Document], metadata: Dict,
+                     seen: Optional[Dict[str, int]] = None, start_index: int = 0) -> List[str]:
+    ids = []
+    seen = {} if seen is None else seen
+    for index, chunk in enumerate(chunks, start=start_index):
+        chunk_hash = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()[:16]
+        occurrence = seen.get(chunk_hash, 0)
+        seen[chunk_hash] = occurrence + 1
+
+        chunk_id = f"{doc_id}-{chunk_hash}-{occurrence}"
+        chunk.metadata.update(metadata)
+        chunk.metadata.update({"chunk_id": chunk_id, "chunk_index": index})
+        ids.append(chunk_id)
+    return ids
+
+# Obtiene IDs y metadatos de los fragmentos guardados de un documento
+def get_document_chunks(vectordb, doc_id: str) -> Dict[str, Dict]:
+    result = vectordb.get(where={"doc_id": doc_id}, include=["metadatas"])
+    return dict(zip(result["ids"], result["metadatas"]))
+
+# Indica si el documento ya está indexado con el mismo contenido y los mismos parámetros de fragmentación
+def is_unchanged(existing: Dict[str, Dict], file_hash: str, chunk_size: int, chunk_overlap: int) -> bool:
+    if not existing:
+        return False
+    return all(
+        meta.get("file_hash") == file_hash
+        and meta.get("chunk_size") == chunk_size
+        and meta.get("chunk_overlap") == chunk_overlap
+        for meta in existing.values()
+    )
+
+# Metadatos comunes a todos los fragmentos de un documento
+def document_metadata(doc_id: str, filename: str, file_hash: str, chunk_size: int, chunk_overlap: int) -> Dict:
+    return {
+        "doc_id": doc_id,
+        "source": filename,
+        "file_hash": file_hash,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "ingested_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+# Trata un error de Ollama como transitorio (vale la pena reintentar el lote)
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    status_code = getattr(error, "status_code", None)  # ollama.ResponseError
+    return isinstance(status_code, int) and (status_code >= 500 or status_code == 429)
+
+# Calcula los embeddings de un lote, reintentando con espera exponencial ante errores transitorios.
+# Cada intento espera turno con prioridad baja: las preguntas de los usuarios pasan primero.
+async def _embed_batch(embeddings, texts: List[str]) -> List[List[float]]:
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            async with scheduler.slot(settings.EMBED_MODEL, BULK):
+                return await run_blocking(embeddings.embed_documents, texts)
+        except Exception as e:
+            if attempt == EMBED_MAX_RETRIES or not _is_transient(e):
+                raise
+            delay = EMBED_RETRY_BACKOFF * (2 ** attempt)
+            print(f"Error transitorio al calcular embeddings (intento {attempt + 1}), reintentando en {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
+
+# Agrega fragmentos a la base vectorial por lotes: cada lote calcula sus embeddings y luego se escribe con upsert.
+# Hasta max_inflight lotes avanzan a la vez, así que mientras uno se escribe otro ya está en Ollama;
+# el número de lotes en curso también acota la memoria usada por los vectores pendientes.
+async def add_chunks_batched(vectordb, chunks: List[Document], ids: List[str], embeddings=None,
+                             batch_size: int = None, max_inflight: int = None) -> None:
+    if embeddings is None:
+        embeddings = await run_blocking(settings.get_embeddings)
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    slots = asyncio.Semaphore(max_inflight or EMBED_MAX_INFLIGHT)
+    write_lock = asyncio.Lock()  # La base vectorial recibe una escritura a la vez
+
+    async def process(start: int) -> None:
+        batch = chunks[start:start + batch_size]
+        batch_ids = ids[start:start + batch_size]
+        async with slots:
+            stage_start = time.perf_counter()
+            vectors = await _embed_batch(embeddings, [chunk.page_content for chunk in batch])
+            INGEST_STAGE_SECONDS.labels(stage="embed").observe(time.perf_counter() - stage_start)
+            async with write_lock:
+                stage_start = time.perf_counter()
+                await run_blocking(
+                    vectordb.upsert,
+                    ids=batch_ids,
+                    embeddings=vectors,
+                    documents=[chunk.page_content for chunk in batch],
+                    metadatas=[chunk.metadata for chunk in batch],
+                )
+                INGEST_STAGE_SECONDS.labels(stage="write").observe(time.perf_counter() - stage_start)
+
+    tasks = [asyncio.create_task(process(start)) for start in range(0, len(chunks), batch_size)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # Si un lote falla definitivamente, no se siguen enviando los demás
+        for task in tasks:
+            task.cancel()
+        raise
+
+# Sincroniza un documento con la base vectorial a medida que llegan sus fragmentos (página a página):
+# - los fragmentos nuevos se acumulan y se envían a embeddings por tandas (los únicos que pasan por el modelo)
+# - los que se conservan solo actualizan sus metadatos
+# - al terminar se eliminan los que ya no existen en la nueva versión del archivo
+# Solo se guarda en memoria la tanda pendiente y el conteo de hashes para los IDs.
+class DocumentSync:
+    def __init__(self, vectordb, lexical_index, doc_id: str, existing: Dict[str, Dict], metadata: Dict):
+        self.vectordb = vectordb
+        self.lexical_index = lexical_index  # El de la misma generación que vectordb
+        self.doc_id = doc_id
+        self.existing = existing
+        self.metadata = metadata
+        self.chunks = 0
+        self.added = 0
+        self._seen: Dict[str, int] = {}
+        self._kept_ids: Set[str] = set()
+        self._new: List = []
+        self._kept: List = []
+
+    # Fragmentos esperando la próxima escritura
+    @property
+    def pending(self) -> int:
+        return len(self._new) + len(self._kept)
+
+    # Asigna IDs a una tanda de fragmentos y los separa en nuevos y conservados
+    def add(self, chunks: List[Document]) -> None:
+        ids = assign_chunk_ids(self.doc_id, chunks, self.metadata, self._seen, self.chunks)
+        self.chunks += len(chunks)
+        for chunk_id, chunk in zip(ids, chunks):
+            if chunk_id in self.existing:
+                self._kept_ids.add(chunk_id)
+                self._kept.append((chunk_id, chunk))
+            else:
+                self._new.append((chunk_id, chunk))
+
+    # Calcula los embeddings de los fragmentos nuevos pendientes y escribe la tanda
+    async def flush(self) -> None:
+        new_chunks, kept = self._new, self._kept
+        self._new, self._kept = [], []
+        if new_chunks:
+            await add_chunks_batched(
+                self.vectordb,
+                [chunk for _, chunk in new_chunks],
+                [chunk_id for chunk_id, _ in new_chunks],
+            )
+            await run_blocking(
+                self.lexical_index.add_many,
+                [(chunk_id, chunk.page_content) for chunk_id, chunk in new_chunks],
+            )
+            self.added += len(new_chunks)
+        if kept:
+            await run_blocking(
+                self.vectordb.update,
+                ids=[chunk_id for chunk_id, _ in kept],
+                metadatas=[chunk.metadata for _, chunk in kept],
+            )
+
+    # Escribe lo pendiente y elimina los fragmentos que ya no existen
+    async def finish(self) -> Dict[str, int]:
+        await self.flush()
+        stale = [chunk_id for chunk_id in self.existing if chunk_id not in self._kept_ids]
+        if stale:
+            await run_blocking(self.vectordb.delete, ids=stale)
+            await run_blocking(self.lexical_index.remove_many, stale)
+        return {"added": self.added, "kept": len(self._kept_ids), "removed": len(stale)}
+
+    # Deshace una sincronización que falló a mitad de camino (síncrono): borra los
+    # fragmentos agregados en esta pasada y devuelve a los conservados sus metadatos anteriores.
+    # Así un archivo a medio indexar no se toma como "sin cambios" en la próxima subida.
+    def rollback(self) -> None:
+        result = self.vectordb.get(
+            where={"$and": [{"doc_id": self.doc_id}, {"ingested_at": self.metadata["ingested_at"]}]},
+            include=[],
+        )
+        added = [chunk_id for chunk_id in result["ids"] if chunk_id not in self.existing]
+        if added:
+            self.vectordb.delete(ids=added)
+            self.lexical_index.remove_many(added)
+        if self._kept_ids:
+            kept = list(self._kept_ids)
+            self.vectordb.update(ids=kept, metadatas=[self.existing[chunk_id] for chunk_id in kept])
+
+# Lista los documentos indexados agrupando los metadatos de sus fragmentos
+def list_documents(vectordb) -> List[Dict]:
+    result = vectordb.get(include=["metadatas"])
+    documents: Dict[str, Dict] = {}
+    for meta in result["metadatas"]:
+        # Fragmentos indexados antes de tener IDs de documento: solo se eliminan con /reset_embeddings
+        doc_id = (meta or {}).get("doc_id")
+        if not doc_id:
+            continue
+        entry = documents.setdefault(doc_id, {
+            "doc_id": doc_id,
+            "source": meta.get("source"),
+            "file_hash": meta.get("file_hash"),
+            "chunk_size": meta.get("chunk_size"),
+            "chunk_overlap": meta.get("chunk_overlap"),
+            "ingested_at": meta.get("ingested_at"),
+            "chunks": 0,
+        })
+        entry["chunks"] += 1
+    return sorted(documents.values(), key=lambda d: d["source"] or "")
+
+# Elimina todos los fragmentos de un documento de la base vectorial y del índice léxico de su
+# misma generación; devuelve cuántos se borraron
+def delete_document(vectordb, lexical_index, doc_id: str) -> int:
+    ids = list(get_document_chunks(vectordb, doc_id))
+    if ids:
+        vectordb.delete(ids=ids)
+        lexical_index.remove_many(ids)
+    return len(ids)
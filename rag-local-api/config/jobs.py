@@ -0,0 +1,45 @@
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from config.redis_client import redis_client
+
+# Los trabajos se guardan en Redis para que cualquier worker de la API pueda consultar su estado
+JOB_KEY_PREFIX = "ingest_job:"
+
+# Tiempo que se conserva el estado de un trabajo terminado (segundos)
+JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL", 86400))
+
+# Locks por trabajo para que las escrituras concurrentes de un mismo trabajo no lleguen desordenadas
+_save_locks: Dict[str, asyncio.Lock] = {}
+
+# Crea el estado inicial de un trabajo de ingesta
+def new_job(filenames: List[str], chunk_size: int, chunk_overlap: int) -> Dict:
+    return {
+        "job_id": uuid.uuid4().hex,
+        "status": "queued",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "finished_at": None,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "files": [
+            {"file": name, "status": "pending", "pages": 0, "chunks": 0, "timings": {}}
+            for name in filenames
+        ],
+    }
+
+# Guarda el estado actual del trabajo en Redis
+async def save_job(job: Dict) -> None:
+    lock = _save_locks.setdefault(job["job_id"], asyncio.Lock())
+    async with lock:
+        await redis_client.set(JOB_KEY_PREFIX + job["job_id"], json.dumps(job), ex=JOB_TTL_SECONDS)
+    if job["finished_at"]:
+        _save_locks.pop(job["job_id"], None)
+
+# Obtiene el estado de un trabajo; None si no existe o ya expiró
+async def get_job(job_id: str) -> Optional[Dict]:
+    job_json = await redis_client.get(JOB_KEY_PREFIX + job_id)
+    return json.loads(job_json) if job_json else None
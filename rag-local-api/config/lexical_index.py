@@ -0,0 +1,203 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Parámetros estándar de BM25
+BM25_K1 = float(os.getenv("BM25_K1", 1.5))
+BM25_B = float(os.getenv("BM25_B", 0.75))
+
+# Palabras muy frecuentes en español que no aportan a la búsqueda léxica
+STOPWORDS = {
+    "a", "al", "algo", "con", "cual", "cuales", "cuanto", "cuantos", "de", "del", "el", "ella", "en",
+    "es", "esta", "este", "esto", "la", "las", "le", "lo", "los", "mas", "me", "mi", "muy", "no", "o",
+    "para", "pero", "por", "que", "se", "si", "sin", "sobre", "su", "sus", "tu", "un", "una", "uno",
+    "y", "ya", "the", "of", "and", "to", "is",
+}
+
+# Palabras, números y códigos compuestos (precios como 11.000, cuentas como 123-456789-00)
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./,][a-z0-9]+)*")
+
+# Normaliza y separa un texto en términos. Los códigos compuestos se indexan completos y
+# también por partes, para que "123-456789-00" coincida tanto exacto como con "456789".
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    terms = []
+    for token in _TOKEN_RE.findall(text):
+        parts = re.split(r"[-./,]", token)
+        if len(parts) > 1:
+            terms.append(token)
+        terms.extend(part for part in parts if part and part not in STOPWORDS)
+    return terms
+
+# Índice invertido BM25 que se mantiene junto a la base vectorial.
+# En memoria guarda las frecuencias por fragmento y las listas invertidas; en disco (SQLite)
+# guarda una fila por fragmento, así agregar o quitar fragmentos no reescribe todo el índice.
+class LexicalIndex:
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, terms TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+
+        # Ids modificados mientras hay una reconstrucción en curso (None si no la hay)
+        self._touched: Optional[set] = None
+        self._data_version = None
+        self.refresh()
+
+    # Carga el índice desde SQLite si otro proceso (worker) lo modificó desde la última lectura
+    # (PRAGMA data_version solo cambia con los commits de otras conexiones)
+    def refresh(self) -> None:
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            self._data_version = version
+            rows = self._conn.execute("SELECT chunk_id, terms FROM chunks")
+            self._load((chunk_id, json.loads(terms)) for chunk_id, terms in rows)
+
+    # Reemplaza las estructuras en memoria por las de los fragmentos dados: pares (chunk_id, términos)
+    def _load(self, items: Iterable[Tuple[str, Dict[str, int]]]) -> None:
+        self._doc_terms: Dict[str, Dict[str, int]] = {}
+        self._postings: Dict[str, set] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._total_len = 0
+        for chunk_id, terms in items:
+            self._index(chunk_id, terms)
+
+    # Agrega un fragmento a las estructuras en memoria
+    def _index(self, chunk_id: str, terms: Dict[str, int]) -> None:
+        self._doc_terms[chunk_id] = terms
+        length = sum(terms.values())
+        self._doc_len[chunk_id] = length
+        self._total_len += length
+        for term in terms:
+            self._postings.setdefault(term, set()).add(chunk_id)
+
+    # Quita un fragmento de las estructuras en memoria
+    def _unindex(self, chunk_id: str) -> None:
+        terms = self._doc_terms.pop(chunk_id, None)
+        if terms is None:
+            return
+        self._total_len -= self._doc_len.pop(chunk_id)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.discard(chunk_id)
+                if not posting:
+                    del self._postings[term]
+
+    # Agrega (o reemplaza) fragmentos: pares (chunk_id, texto)
+    def add_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        rows = []
+        with self._lock:
+            for chunk_id, text in items:
+                terms = dict(Counter(tokenize(text)))
+                self._unindex(chunk_id)
+                self._index(chunk_id, terms)
+                rows.append((chunk_id, json.dumps(terms)))
+            if self._touched is not None:
+                self._touched.update(chunk_id for chunk_id, _ in rows)
+            self._conn.executemany("INSERT OR REPLACE INTO chunks (chunk_id, terms) VALUES (?, ?)", rows)
+            self._conn.commit()
+
+    # Elimina fragmentos por id
+    def remove_many(self, chunk_ids: Iterable[str]) -> None:
+        chunk_ids = list(chunk_ids)
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._unindex(chunk_id)
+            if self._touched is not None:
+                self._touched.update(chunk_ids)
+            self._conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(c,) for c in chunk_ids])
+            self._conn.commit()
+
+    # Generación de la base vectorial desde la que se reconstruyó el índice; None si nunca se reconstruyó
+    # (archivo nuevo o creado antes de guardar la marca)
+    def generation(self) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else None
+
+    # Marca el índice como sincronizado con la generación indicada sin reconstruirlo
+    def set_generation(self, generation: int) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(generation),)
+            )
+            self._conn.commit()
+
+    # Reconstruye el índice con los fragmentos que devuelve 'load' (pares chunk_id, texto) y guarda la
+    # generación de origen. Se construye aparte y se reemplaza en una sola transacción, así las búsquedas
+    # (de este u otros procesos) ven el índice anterior completo hasta el cambio, nunca uno vacío.
+    # Los fragmentos agregados o quitados mientras tanto conservan su estado actual.
+    def rebuild(self, load: Callable[[], Iterable[Tuple[str, str]]], generation: int) -> None:
+        with self._lock:
+            self._touched = set()
+        try:
+            # La lectura de la base vectorial y la tokenización (lo costoso) no bloquean las búsquedas
+            doc_terms = {chunk_id: dict(Counter(tokenize(text))) for chunk_id, text in load()}
+            with self._lock:
+                for chunk_id in self._touched:
+                    if chunk_id in self._doc_terms:
+                        doc_terms[chunk_id] = self._doc_terms[chunk_id]
+                    else:
+                        doc_terms.pop(chunk_id, None)
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.execute("DROP TABLE IF EXISTS chunks_rebuild")
+                    self._conn.execute(
+                        "CREATE TABLE chunks_rebuild (chunk_id TEXT PRIMARY KEY, terms TEXT NOT NULL)"
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO chunks_rebuild (chunk_id, terms) VALUES (?, ?)",
+                        [(chunk_id, json.dumps(terms)) for chunk_id, terms in doc_terms.items()],
+                    )
+                    self._conn.execute("DROP TABLE chunks")
+                    self._conn.execute("ALTER TABLE chunks_rebuild RENAME TO chunks")
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(generation),)
+                    )
+                    self._conn.commit()
+                except BaseException:
+                    self._conn.rollback()
+                    raise
+                self._load(doc_terms.items())
+        finally:
+            with self._lock:
+                self._touched = None
+
+    # Cantidad de fragmentos indexados
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    # Devuelve los 'k' fragmentos con mayor puntaje BM25 para la consulta: [(chunk_id, puntaje)]
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if n_docs == 0:
+                return []
+            avg_len = self._total_len / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for chunk_id in posting:
+                    tf = self._doc_terms[chunk_id][term]
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[chunk_id] / avg_len)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
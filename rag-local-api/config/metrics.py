@@ -0,0 +1,117 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Límites de los histogramas de latencia (segundos): desde consultas a Redis hasta inferencias largas en CPU
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Tiempo de cada etapa de /ask_model: validation, embedding, answer_cache, history_load, retrieval,
+# prompt_build, queue, inference, history_save
+ASK_STAGE_SECONDS = Histogram(
+    "rag_ask_stage_seconds", "Duración de cada etapa de una consulta", ["stage"], buckets=LATENCY_BUCKETS
+)
+
+# Etapas compartidas por todas las preguntas de /ask_batch (validation, embedding, answer_cache,
+# history_load, retrieval); las de cada respuesta se registran en rag_ask_stage_seconds
+ASK_BATCH_STAGE_SECONDS = Histogram(
+    "rag_ask_batch_stage_seconds", "Duración de cada etapa compartida de un lote de preguntas", ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Tiempo de cada etapa de la ingesta: parse y split por archivo, embed y write por lote
+INGEST_STAGE_SECONDS = Histogram(
+    "rag_ingest_stage_seconds", "Duración de cada etapa de la ingesta", ["stage"], buckets=LATENCY_BUCKETS
+)
+
+# Archivos procesados por la ingesta según su resultado (indexed, unchanged, error)
+INGEST_FILES = Counter("rag_ingest_files_total", "Archivos procesados por la ingesta", ["status"])
+
+# Solicitudes y trabajos en curso
+IN_FLIGHT = Gauge("rag_in_flight", "Solicitudes o trabajos en curso", ["endpoint"])
+
+# Datos que devuelve Ollama al terminar cada respuesta
+LLM_PROMPT_TOKENS = Histogram(
+    "rag_llm_prompt_tokens", "Tokens del prompt evaluados por Ollama", ["model"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+LLM_COMPLETION_TOKENS = Histogram(
+    "rag_llm_completion_tokens", "Tokens generados por Ollama", ["model"],
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048),
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "rag_llm_tokens_per_second", "Velocidad de generación de Ollama", ["model"],
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200),
+)
+LLM_PROMPT_EVAL_SECONDS = Histogram(
+    "rag_llm_prompt_eval_seconds", "Tiempo de evaluación del prompt en Ollama", ["model"], buckets=LATENCY_BUCKETS
+)
+LLM_LOAD_SECONDS = Histogram(
+    "rag_llm_load_seconds", "Tiempo de carga del modelo en Ollama (arranque en frío)", ["model"], buckets=LATENCY_BUCKETS
+)
+
+# Planificador de llamadas a Ollama: solicitudes esperando turno, rechazos y tiempo de espera
+SCHEDULER_QUEUED = Gauge("rag_scheduler_queued", "Llamadas esperando turno por modelo", ["model", "priority"])
+SCHEDULER_REJECTED = Counter(
+    "rag_scheduler_rejected_total", "Solicitudes rechazadas por el planificador", ["model", "reason"]
+)
+SCHEDULER_WAIT_SECONDS = Histogram(
+    "rag_scheduler_wait_seconds", "Tiempo de espera en la cola del planificador", ["model", "priority"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Consultas a las cachés en memoria de cada proceso (cache: embedding, retrieval; result: hit, miss)
+QUERY_CACHE_LOOKUPS = Counter(
+    "rag_query_cache_lookups_total", "Consultas a las cachés en memoria de preguntas", ["cache", "result"]
+)
+
+# Tamaño de los índices, actualizado en cada lectura de /metrics
+COLLECTION_CHUNKS = Gauge("rag_collection_chunks", "Fragmentos guardados en la base vectorial")
+LEXICAL_INDEX_CHUNKS = Gauge("rag_lexical_index_chunks", "Fragmentos en el índice léxico (BM25)")
+EMBED_CACHE_ENTRIES = Gauge("rag_embedding_cache_entries", "Vectores guardados en la caché de embeddings")
+EMBED_CACHE_HITS = Gauge("rag_embedding_cache_hits", "Aciertos de la caché de embeddings desde el arranque")
+EMBED_CACHE_MISSES = Gauge("rag_embedding_cache_misses", "Fallos de la caché de embeddings desde el arranque")
+
+# Registra la duración de las etapas de una solicitud en un histograma y, a la vez,
+# guarda el desglose para devolverlo en la respuesta
+class StageTimer:
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.timings: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    # Registra una etapa medida por fuera (por ejemplo, en un hilo del executor)
+    def record(self, name: str, seconds: float) -> None:
+        self.histogram.labels(stage=name).observe(seconds)
+        self.timings[name] = round(self.timings.get(name, 0.0) + seconds, 4)
+
+    # Desglose de la solicitud, con el tiempo total transcurrido
+    def summary(self) -> Dict[str, float]:
+        return {**self.timings, "total": round(time.perf_counter() - self._start, 4)}
+
+# Registra los conteos y duraciones que Ollama incluye en la respuesta (las duraciones vienen en nanosegundos)
+def observe_llm_metadata(model: str, metadata: Optional[Dict]) -> None:
+    if not metadata:
+        return
+    prompt_tokens = metadata.get("prompt_eval_count")
+    completion_tokens = metadata.get("eval_count")
+    eval_duration = metadata.get("eval_duration")
+    if prompt_tokens is not None:
+        LLM_PROMPT_TOKENS.labels(model=model).observe(prompt_tokens)
+    if completion_tokens is not None:
+        LLM_COMPLETION_TOKENS.labels(model=model).observe(completion_tokens)
+        if eval_duration:
+            LLM_TOKENS_PER_SECOND.labels(model=model).observe(completion_tokens / (eval_duration / 1e9))
+    if metadata.get("prompt_eval_duration") is not None:
+        LLM_PROMPT_EVAL_SECONDS.labels(model=model).observe(metadata["prompt_eval_duration"] / 1e9)
+    if metadata.get("load_duration") is not None:
+        LLM_LOAD_SECONDS.labels(model=model).observe(metadata["load_duration"] / 1e9)
@@ -0,0 +1,123 @@
+import os
+import time
+import asyncio
+from typing import List, Optional
+
+from config.utils import ollama_http  # Cliente HTTP compartido hacia Ollama (pool keep-alive)
+
+# Segundos que se considera vigente la lista de modelos en memoria
+MODEL_CACHE_TTL = float(os.getenv("MODEL_CACHE_TTL", 60))
+
+# Cada cuántos segundos la tarea en segundo plano vuelve a consultar a Ollama
+MODEL_REFRESH_INTERVAL = float(os.getenv("MODEL_REFRESH_INTERVAL", 30))
+
+# Tiempo mínimo entre consultas hechas desde una solicitud (caché vencida o modelo desconocido),
+# para no castigar cada solicitud con un timeout cuando Ollama no responde
+MODEL_MIN_REFRESH_INTERVAL = float(os.getenv("MODEL_MIN_REFRESH_INTERVAL", 5))
+
+#palabras clave que identifican modelos de embeddings (no de chat)
+EMBEDDING_KEYWORDS = ["embed", "embedding", "bge", "e5", "mxbai"]
+
+# Función para determinar si un modelo es de tipo chat (no embedding)
+def is_chat_model(model_name: str) -> bool:
+    # Devuelve True solo si no contiene ninguna palabra clave de embeddings
+    return not any(keyword in model_name.lower() for keyword in EMBEDDING_KEYWORDS)
+
+# Registro en memoria de los modelos instalados en Ollama.
+# Mantiene la lista de /api/tags con un TTL, la refresca en segundo plano y, si Ollama
+# no responde (por ejemplo, mientras carga un modelo), sigue sirviendo la última lista conocida.
+class ModelRegistry:
+    def __init__(self, ttl: float = MODEL_CACHE_TTL, refresh_interval: float = MODEL_REFRESH_INTERVAL):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._models: List[str] = []
+        self._chat_models: List[str] = []
+        self._fetched_at = 0.0  # Última consulta exitosa
+        self._attempted_at = 0.0  # Último intento (exitoso o no)
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # Consulta /api/tags y actualiza la caché; devuelve False si Ollama no respondió.
+    # Debe llamarse con el lock tomado
+    async def _fetch(self) -> bool:
+        self._attempted_at = time.monotonic()
+        try:
+            response = await ollama_http.get("/api/tags")
+            response.raise_for_status()  # Lanza una excepción si hubo error HTTP
+            models = response.json().get("models", [])  # Extrae la lista de modelos
+        except Exception as e:
+            print(f"Error al obtener modelos de Ollama: {e}")
+            return False
+
+        self._models = [m["name"] for m in models]  # Extrae solo los nombres
+        # El filtro chat/embeddings se calcula una sola vez por actualización
+        self._chat_models = [name for name in self._models if is_chat_model(name)]
+        self._fetched_at = time.monotonic()
+        return True
+
+    # Fuerza una consulta a Ollama
+    async def refresh(self) -> bool:
+        async with self._lock:
+            return await self._fetch()
+
+    # Indica si hace falta volver a consultar a Ollama
+    def _needs_refresh(self, max_age: float) -> bool:
+        now = time.monotonic()
+        return now - self._fetched_at > max_age and now - self._attempted_at > MODEL_MIN_REFRESH_INTERVAL
+
+    # Refresca solo si la caché venció y no se intentó hace muy poco; las solicitudes que
+    # esperaban el lock no vuelven a consultar si otra ya lo hizo. Mientras no haya ninguna
+    # lista (arranque), se espera a la consulta en curso en lugar de devolver una lista vacía.
+    async def _refresh_if(self, max_age: float) -> None:
+        waiting_first_fetch = self._fetched_at == 0 and self._lock.locked()
+        if not self._needs_refresh(max_age) and not waiting_first_fetch:
+            return
+        async with self._lock:
+            if self._needs_refresh(max_age):
+                await self._fetch()
+
+    async def _ensure_fresh(self) -> None:
+        await self._refresh_if(self.ttl)
+
+    # Todos los modelos instalados (chat y embeddings)
+    async def get_models(self) -> List[str]:
+        await self._ensure_fresh()
+        return list(self._models)
+
+    # Solo los modelos válidos para chat
+    async def get_chat_models(self) -> List[str]:
+        await self._ensure_fresh()
+        return list(self._chat_models)
+
+    # validar si un modelo está disponible en el servidor de Ollama
+    async def is_available(self, model_name: str) -> bool:
+        await self._ensure_fresh()
+        if model_name in self._models:
+            return True
+        # Puede ser un modelo recién descargado: se vuelve a consultar, con un límite de frecuencia
+        await self._refresh_if(0)
+        return model_name in self._models
+
+    # Bucle de la tarea en segundo plano
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_interval)
+
+    # Inicia la actualización periódica (se llama al iniciar la API)
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    # Detiene la actualización periódica (se llama al apagar la API)
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Instancia global compartida por las rutas
+model_registry = ModelRegistry()
@@ -0,0 +1,521 @@
+import os
+import json
+import math
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from config.vector_store import VectorStore
+
+# Bloqueo entre procesos para las escrituras (solo existe en sistemas tipo Unix, como el contenedor)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Formato de los vectores que se recorren en cada búsqueda: "int8" (1 byte por dimensión, con una
+# escala por fila) o "float16" (2 bytes). Los vectores completos en float32 se guardan aparte y
+# solo se leen para recalcular el puntaje exacto de los mejores candidatos.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "int8")
+QUANTIZATIONS = ("int8", "float16")
+
+# Candidatos (como mínimo) cuyo puntaje se recalcula con los vectores completos
+VECTOR_RESCORE_CANDIDATES = int(os.getenv("VECTOR_RESCORE_CANDIDATES", 50))
+
+# Índice de búsqueda: "ivf" (listas invertidas a partir de VECTOR_IVF_MIN_ROWS fragmentos) o
+# "flat" (siempre fuerza bruta sobre toda la matriz)
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "ivf")
+VECTOR_IVF_MIN_ROWS = int(os.getenv("VECTOR_IVF_MIN_ROWS", 50_000))
+
+# Listas que se revisan por consulta con IVF: más listas, mejor recall y búsquedas más lentas
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", 32))
+
+# Entrenamiento de las listas (k-means esférico sobre una muestra)
+IVF_TRAIN_SAMPLE = 20_000
+IVF_TRAIN_ITERATIONS = 10
+
+# Filas que se convierten a float32 a la vez al puntuar (acota la memoria temporal de cada búsqueda)
+_SCORE_BLOCK_ROWS = 4096
+
+# Puntajes que se acumulan (para todas las consultas) antes de quedarse con los mejores de cada una
+_SCORE_BUFFER_VALUES = 4_000_000
+
+# Capacidad inicial de los archivos; luego se duplica al llenarse
+_INITIAL_CAPACITY = 1024
+
+_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+# Traduce un filtro de metadatos con la sintaxis de Chroma a una condición SQL sobre la columna JSON
+def where_to_sql(where: Optional[Dict]) -> Tuple[str, List]:
+    if not where:
+        return "1", []
+    clauses, params = [], []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(item) for item in value]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            params += [param for _, part_params in parts for param in part_params]
+            continue
+        operator, operand = next(iter(value.items())) if isinstance(value, dict) else ("$eq", value)
+        field = "json_extract(metadata, ?)"
+        params.append(f'$."{key}"')
+        if operator in ("$in", "$nin"):
+            placeholders = ", ".join("?" for _ in operand)
+            clauses.append(f"{field} {'IN' if operator == '$in' else 'NOT IN'} ({placeholders})")
+            params += list(operand)
+        elif operator in _OPERATORS:
+            clauses.append(f"{field} {_OPERATORS[operator]} ?")
+            params.append(operand)
+        else:
+            raise ValueError(f"Operador de filtro no soportado: {operator}")
+    return " AND ".join(clauses), params
+
+# Normaliza las filas (similitud coseno = producto punto)
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+# Cuantiza vectores normalizados a int8 con una escala por fila
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+# Base vectorial en proceso: matriz cuantizada en un archivo mapeado en memoria (numpy.memmap),
+# documentos y metadatos en SQLite. Abrirla no carga los vectores: el sistema operativo trae a
+# memoria las páginas a medida que se recorren. La búsqueda es fuerza bruta vectorizada sobre la
+# matriz (o sobre las listas IVF más cercanas) y los mejores candidatos se re-puntúan en float32.
+# Varios procesos pueden abrir el mismo directorio: las escrituras se serializan con un bloqueo de
+# archivo y cada proceso recarga el mapa de filas cuando otro confirmó cambios en SQLite.
+class NumpyVectorStore(VectorStore):
+    def __init__(self, path: str, quantization: str = VECTOR_QUANTIZATION, index: str = VECTOR_INDEX):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(path, "store.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, document TEXT, metadata TEXT)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self._lock_file = open(os.path.join(path, "write.lock"), "a+")
+
+        self.quantization = self._read_meta().get("quantization", quantization)
+        if self.quantization not in QUANTIZATIONS:
+            raise ValueError(f"VECTOR_QUANTIZATION no válido: {self.quantization}. Use: {', '.join(QUANTIZATIONS)}.")
+        self.index = index
+        self.capacity = 0
+        self._codes = self._scales = self._full = self._lists = None
+        self._training: Optional[threading.Thread] = None
+        self._unassigned: List[int] = []
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._reload()
+
+    # Lee el estado guardado (dimensión, capacidad, listas IVF) y el mapa de filas
+    def _reload(self) -> None:
+        meta = self._read_meta()
+        self.dim: Optional[int] = meta.get("dim")
+        capacity = meta.get("capacity", 0)
+        if capacity != self.capacity:
+            self.capacity = capacity
+            self._open_arrays()
+        self._ivf_rows = meta.get("ivf_rows", 0)
+        centroids_path = os.path.join(self.path, "ivf_centroids.npy")
+        self._centroids = np.load(centroids_path) if self._ivf_rows and os.path.exists(centroids_path) else None
+        self._load_rows()
+
+    # Recarga el estado si otro proceso confirmó cambios desde la última lectura
+    # (PRAGMA data_version solo cambia con los commits de otras conexiones)
+    def refresh(self) -> None:
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._data_version = version
+                self._reload()
+
+    # Escritura exclusiva entre hilos y procesos, partiendo del estado más reciente
+    @contextmanager
+    def _writing(self):
+        with self._lock:
+            if fcntl:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # Reconstruye el mapa id ↔ fila desde SQLite: solo las filas confirmadas ahí están vivas
+    def _load_rows(self) -> None:
+        self._id_rows: Dict[str, int] = {}
+        self._row_ids: List[Optional[str]] = [None] * self.capacity
+        self._alive = np.zeros(self.capacity, dtype=bool)
+        for chunk_id, row in self._conn.execute("SELECT id, row FROM chunks"):
+            self._id_rows[chunk_id] = row
+            self._row_ids[row] = chunk_id
+            self._alive[row] = True
+        self._next_row = max(self._id_rows.values(), default=-1) + 1
+        self._free_rows = [row for row in range(self._next_row) if not self._alive[row]]
+
+    # El estado va en SQLite (y no en un archivo aparte) para que su commit avise a los demás procesos
+    def _read_meta(self) -> Dict:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'store'").fetchone()
+        if row:
+            return json.loads(row[0])
+        meta_path = os.path.join(self.path, "meta.json")  # Formato anterior
+        if not os.path.exists(meta_path):
+            return {}
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _write_meta(self) -> None:
+        meta = {"dim": self.dim, "capacity": self.capacity, "quantization": self.quantization,
+                "ivf_rows": self._ivf_rows}
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('store', ?)", (json.dumps(meta),))
+        self._conn.commit()
+
+    # Abre (o agranda) un archivo mapeado en memoria con la forma indicada
+    def _memmap(self, name: str, dtype, shape: Tuple) -> np.memmap:
+        file_path = os.path.join(self.path, name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(file_path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(file_path, dtype=dtype, mode="r+", shape=shape)
+
+    def _open_arrays(self) -> None:
+        shape = (self.capacity, self.dim)
+        self._codes = self._memmap(f"vectors.{self.quantization}", self.quantization, shape)
+        self._scales = self._memmap("scales.float32", np.float32, (self.capacity,)) if self.quantization == "int8" else None
+        self._full = self._memmap("vectors.float32", np.float32, shape)
+        self._lists = self._memmap("ivf_lists.int32", np.int32, (self.capacity,))
+
+    def _flush_arrays(self) -> None:
+        for array in (self._codes, self._scales, self._full, self._lists):
+            if array is not None:
+                array.flush()
+
+    # Duplica la capacidad de los archivos hasta que quepan `rows` filas
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self.capacity:
+            return
+        capacity = max(self.capacity, _INITIAL_CAPACITY)
+        while capacity < rows:
+            capacity *= 2
+        if self.capacity:
+            self._flush_arrays()
+        self._row_ids += [None] * (capacity - self.capacity)
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - self.capacity, dtype=bool)])
+        self.capacity = capacity
+        self._open_arrays()
+        self._write_meta()
+
+    def count(self) -> int:
+        return len(self._id_rows)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Sequence[str] = ("documents", "metadatas")) -> Dict:
+        sql, params = where_to_sql(where)
+        if ids is not None:
+            if not ids:
+                return {"ids": [], "documents": [] if "documents" in include else None,
+                        "metadatas": [] if "metadatas" in include else None}
+            sql += f" AND id IN ({', '.join('?' for _ in ids)})"
+            params += list(ids)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, document, metadata FROM chunks WHERE {sql} ORDER BY row", params
+            ).fetchall()
+        return {
+            "ids": [chunk_id for chunk_id, _, _ in rows],
+            "documents": [document for _, document, _ in rows] if "documents" in include else None,
+            "metadatas": [json.loads(metadata) for _, _, metadata in rows] if "metadatas" in include else None,
+        }
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+               metadatas: List[Dict]) -> None:
+        if not ids:
+            return
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._writing():
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._write_meta()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimensión de embeddings distinta a la del índice: {vectors.shape[1]} != {self.dim}")
+
+            # Cada id conserva su fila; los nuevos reutilizan filas borradas o se agregan al final
+            assigned: Dict[str, int] = {}
+            for chunk_id in ids:
+                if chunk_id in assigned:
+                    continue
+                row = self._id_rows.get(chunk_id)
+                if row is None:
+                    if self._free_rows:
+                        row = self._free_rows.pop()
+                    else:
+                        row = self._next_row
+                        self._next_row += 1
+                assigned[chunk_id] = row
+            self._ensure_capacity(self._next_row)
+            rows = np.array([assigned[chunk_id] for chunk_id in ids])
+
+            # Primero los vectores y luego SQLite: una fila solo está viva cuando SQLite la confirma
+            self._full[rows] = vectors
+            if self.quantization == "int8":
+                self._codes[rows], self._scales[rows] = quantize_int8(vectors)
+            else:
+                self._codes[rows] = vectors.astype(np.float16)
+            if self._centroids is not None:
+                self._lists[rows] = np.argmax(vectors @ self._centroids.T, axis=1)
+            if self._centroids is None or self._training is not None:
+                self._unassigned.extend(rows.tolist())
+            self._flush_arrays()
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, row, document, metadata) VALUES (?, ?, ?, ?)",
+                [(chunk_id, int(row), document, json.dumps(metadata or {}))
+                 for chunk_id, row, document, metadata in zip(ids, rows, documents, metadatas)],
+            )
+            self._conn.commit()
+            for chunk_id, row in assigned.items():
+                self._id_rows[chunk_id] = row
+                self._row_ids[row] = chunk_id
+                self._alive[row] = True
+
+    def update(self, ids: List[str], metadatas: List[Dict]) -> None:
+        with self._writing():
+            self._conn.executemany(
+                "UPDATE chunks SET metadata = ? WHERE id = ?",
+                [(json.dumps(metadata or {}), chunk_id) for chunk_id, metadata in zip(ids, metadatas)],
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List[str]) -> None:
+        with self._writing():
+            rows = [self._id_rows.pop(chunk_id) for chunk_id in ids if chunk_id in self._id_rows]
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+            self._conn.commit()
+            for row in rows:
+                self._alive[row] = False
+                self._row_ids[row] = None
+            self._free_rows.extend(rows)
+
+    # Los `shortlist` mejores puntajes aproximados (matriz cuantizada) de cada consulta, entre las filas
+    # indicadas o todas las vivas si rows es None: (filas, puntajes), de forma (consultas, shortlist).
+    # La matriz se recorre una vez por bloques para todas las consultas; los puntajes se acumulan
+    # hasta _SCORE_BUFFER_VALUES (y al final) y entonces se reducen a los mejores de cada consulta.
+    def _approximate_top(self, queries: np.ndarray, n: int, rows: Optional[np.ndarray], alive: np.ndarray,
+                         shortlist: int) -> Tuple[np.ndarray, np.ndarray]:
+        total = n if rows is None else len(rows)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        blocks, buffer_start = [], 0
+        for start in range(0, total, _SCORE_BLOCK_ROWS):
+            end = min(start + _SCORE_BLOCK_ROWS, total)
+            selection = slice(start, end) if rows is None else rows[start:end]
+            scores = queries @ self._codes[selection].astype(np.float32).T
+            if self._scales is not None:
+                scores *= self._scales[selection]
+            if rows is None:
+                dead = ~alive[start:end]
+                if dead.any():
+                    scores[:, dead] = -np.inf
+            blocks.append(scores)
+            if end < total and (end - buffer_start) * len(queries) < _SCORE_BUFFER_VALUES:
+                continue
+
+            # Columnas: primero los mejores anteriores de cada consulta y luego las filas del búfer
+            buffer_rows = np.arange(buffer_start, end) if rows is None else rows[buffer_start:end]
+            previous = best_rows.shape[1]
+            scores = np.concatenate([best_scores] + blocks, axis=1)
+            if scores.shape[1] > shortlist:
+                top = np.argpartition(-scores, shortlist - 1, axis=1)[:, :shortlist]
+                best_scores = np.take_along_axis(scores, top, axis=1)
+                candidates = buffer_rows[np.maximum(top - previous, 0)]
+                if previous:
+                    earlier = np.take_along_axis(best_rows, np.minimum(top, previous - 1), axis=1)
+                    candidates = np.where(top < previous, earlier, candidates)
+                best_rows = candidates
+            else:
+                best_scores = scores
+                best_rows = np.concatenate(
+                    [best_rows, np.broadcast_to(buffer_rows, (len(queries), len(buffer_rows)))], axis=1
+                )
+            blocks, buffer_start = [], end
+        return best_rows, best_scores
+
+    # Filas donde buscar: las que cumplen el filtro, las de las listas IVF más cercanas a alguna
+    # de las consultas o todas (None)
+    def _search_rows(self, queries: np.ndarray, where: Optional[Dict], alive: np.ndarray) -> Optional[np.ndarray]:
+        if where:
+            sql, params = where_to_sql(where)
+            with self._lock:
+                rows = [row for (row,) in self._conn.execute(f"SELECT row FROM chunks WHERE {sql}", params)]
+            return np.array(sorted(rows), dtype=np.int64)
+        self._maybe_train()
+        centroids = self._centroids
+        if centroids is None or self.index != "ivf":
+            return None
+        probe = np.unique(np.argsort(-(queries @ centroids.T), axis=1)[:, :VECTOR_IVF_NPROBE])
+        return np.nonzero(np.isin(self._lists[:len(alive)], probe) & alive)[0]
+
+    # Para cada consulta, los `candidates` mejores fragmentos con su puntaje exacto, de mayor a menor
+    def _search(self, embeddings: List[List[float]], candidates: int,
+                where: Optional[Dict]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if self.dim is None or not self._id_rows or not len(embeddings):
+            return [empty] * len(embeddings)
+        queries = normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            n = self._next_row
+            alive = self._alive[:n].copy()
+
+        rows = self._search_rows(queries, where, alive)
+        if rows is not None and len(rows) == 0:
+            return [empty] * len(embeddings)
+
+        # Mejores candidatos según la matriz cuantizada, re-puntuados con los vectores completos
+        shortlist = max(candidates, VECTOR_RESCORE_CANDIDATES)
+        best_rows, best_scores = self._approximate_top(queries, n, rows, alive, shortlist)
+        results = []
+        for query, top_rows, top_scores in zip(queries, best_rows, best_scores):
+            top_rows = np.sort(top_rows[np.isfinite(top_scores)])
+            exact = self._full[top_rows] @ query
+            order = np.argsort(-exact)[:candidates]
+            results.append((top_rows[order], exact[order]))
+        return results
+
+    # Documentos (con id) de las filas indicadas, en el mismo orden
+    def _documents(self, rows: np.ndarray) -> List[Document]:
+        if len(rows) == 0:
+            return []
+        with self._lock:
+            ids = [self._row_ids[row] for row in rows]
+            found = {
+                chunk_id: (document, metadata)
+                for chunk_id, document, metadata in self._conn.execute(
+                    f"SELECT id, document, metadata FROM chunks WHERE id IN ({', '.join('?' for _ in ids)})",
+                    [chunk_id for chunk_id in ids if chunk_id],
+                )
+            }
+        return [
+            Document(id=chunk_id, page_content=found[chunk_id][0], metadata=json.loads(found[chunk_id][1]))
+            for chunk_id in ids if chunk_id in found
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    where: Optional[Dict] = None) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k=k, where=where)[0]
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5,
+                                                where: Optional[Dict] = None) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vectors([embedding], k=k, fetch_k=fetch_k,
+                                                             lambda_mult=lambda_mult, where=where)[0]
+
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                     where: Optional[Dict] = None) -> List[List[Document]]:
+        return [self._documents(rows) for rows, _ in self._search(embeddings, k, where)]
+
+    def max_marginal_relevance_search_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                                 fetch_k: int = 20, lambda_mult: float = 0.5,
+                                                 where: Optional[Dict] = None) -> List[List[Document]]:
+        results = []
+        for embedding, (rows, _) in zip(embeddings, self._search(embeddings, fetch_k, where)):
+            if len(rows) == 0:
+                results.append([])
+                continue
+            selected = maximal_marginal_relevance(
+                np.asarray(embedding, dtype=np.float32), np.asarray(self._full[rows]), lambda_mult=lambda_mult, k=k
+            )
+            results.append(self._documents(rows[selected]))
+        return results
+
+    # Lanza el entrenamiento de las listas IVF en segundo plano si el índice creció lo suficiente
+    # (la primera vez, o al duplicar las filas desde el último entrenamiento). Mientras tanto se
+    # sigue buscando con el índice anterior o por fuerza bruta.
+    def _maybe_train(self) -> None:
+        if self.index != "ivf" or self._training is not None:
+            return
+        rows = len(self._id_rows)
+        if rows < VECTOR_IVF_MIN_ROWS or (self._centroids is not None and rows < 2 * self._ivf_rows):
+            return
+        with self._lock:
+            if self._training is None:
+                self._training = threading.Thread(target=self.build_index, daemon=True, name="ivf-train")
+                self._training.start()
+
+    # Entrena las listas IVF (k-means esférico sobre una muestra de la matriz cuantizada)
+    # y asigna cada fila a su lista. Se puede llamar directamente para construir el índice ya.
+    def build_index(self) -> None:
+        try:
+            with self._lock:
+                n = self._next_row
+                alive_rows = np.nonzero(self._alive[:n])[0]
+                self._unassigned = []
+            if len(alive_rows) == 0:
+                return
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(alive_rows, min(len(alive_rows), IVF_TRAIN_SAMPLE), replace=False))
+            data = normalize(self._dequantize(sample))
+
+            nlist = int(min(4096, max(16, math.sqrt(len(alive_rows)))))
+            nlist = min(nlist, len(data))
+            centroids = data[rng.choice(len(data), nlist, replace=False)]
+            for _ in range(IVF_TRAIN_ITERATIONS):
+                assignment = np.argmax(data @ centroids.T, axis=1)
+                order = np.argsort(assignment, kind="stable")
+                present, starts = np.unique(assignment[order], return_index=True)
+                sums = np.add.reduceat(data[order], starts, axis=0)
+                # Las listas que quedan vacías se reinician con puntos al azar
+                centroids = data[rng.choice(len(data), nlist, replace=False)]
+                centroids[present] = sums
+                centroids = normalize(centroids)
+
+            # Asigna todas las filas (por bloques) y publica el índice
+            lists = np.empty(n, dtype=np.int32)
+            for start in range(0, n, _SCORE_BLOCK_ROWS):
+                end = min(start + _SCORE_BLOCK_ROWS, n)
+                lists[start:end] = np.argmax(self._dequantize(slice(start, end)) @ centroids.T, axis=1)
+            # Las filas escritas durante el entrenamiento (aquí o en otro proceso) se asignan al publicar
+            with self._writing():
+                self._lists[:n] = lists
+                pending = np.array(sorted(set(self._unassigned) | set(range(n, self._next_row))), dtype=np.int64)
+                if len(pending):
+                    self._lists[pending] = np.argmax(self._full[pending] @ centroids.T, axis=1)
+                self._unassigned = []
+                self._lists.flush()
+                tmp_path = os.path.join(self.path, "ivf_centroids.tmp.npy")
+                np.save(tmp_path, centroids)
+                os.replace(tmp_path, os.path.join(self.path, "ivf_centroids.npy"))
+                self._centroids = centroids
+                self._ivf_rows = len(alive_rows)
+                self._write_meta()
+        finally:
+            self._training = None
+
+    # Vectores aproximados (float32) de las filas indicadas, a partir de la matriz cuantizada
+    def _dequantize(self, rows) -> np.ndarray:
+        vectors = self._codes[rows].astype(np.float32)
+        if self._scales is not None:
+            vectors *= self._scales[rows][:, None]
+        return vectors
+
+    def close(self) -> None:
+        with self._lock:
+            if self.capacity:
+                self._flush_arrays()
+            self._conn.close()
+            self._lock_file.close()
@@ -0,0 +1,135 @@
+import os
+import queue
+from typing import Iterator, List
+
+from langchain_core.documents import Document
+
+# Este módulo se importa dentro de los procesos del pool de parseo,
+# por eso solo depende de los loaders (nada de Redis, Ollama ni Chroma).
+# Los loaders (langchain_community, pypdf) se importan al abrir el primer archivo, no al arrancar la API.
+
+def _pdf_loader(path: str):
+    from langchain_community.document_loaders import PyPDFLoader
+    return PyPDFLoader(path)
+
+def _docx_loader(path: str):
+    from langchain_community.document_loaders import Docx2txtLoader
+    return Docx2txtLoader(path)
+
+def _text_loader(path: str):
+    from langchain_community.document_loaders import TextLoader
+    return TextLoader(path, encoding="utf-8")  # Para archivos de texto plano
+
+# Diccionario que asocia cada extensión con su cargador correspondiente
+LOADERS = {
+    ".pdf": _pdf_loader,
+    ".docx": _docx_loader,
+    ".txt": _text_loader,
+}
+
+# Error de parseo con un mensaje apto para mostrar al usuario
+class DocumentParseError(ValueError):
+    pass
+
+# Función auxiliar para extraer texto de un documento
+def extract_text(doc) -> str:
+    if isinstance(doc, tuple):
+        return doc[0]
+    elif isinstance(doc, Document):
+        return doc.page_content
+    return str(doc)
+
+# Caracteres por bloque al leer archivos de texto plano (cada bloque se trata como una página)
+TEXT_BLOCK_CHARS = int(os.getenv("INGEST_TEXT_BLOCK_CHARS", 1_000_000))
+
+# Espera máxima para dejar una página en la cola antes de volver a comprobar si se canceló (segundos)
+_PUT_POLL_SECONDS = 0.5
+
+# Convierte lo que devuelve un loader a un Document de LangChain
+def to_document(doc, filename: str) -> Document:
+    if isinstance(doc, Document):
+        return doc
+    if isinstance(doc, tuple):
+        content, metadata = doc
+        if not isinstance(metadata, dict):
+            metadata = {"source": filename}
+        return Document(page_content=content, metadata=metadata)
+    return Document(page_content=str(doc), metadata={"source": filename})
+
+# Lee un archivo de texto por bloques, cortando en el último salto de línea de cada bloque.
+# Un archivo menor que el bloque produce un único Document, igual que TextLoader (que lo cargaba entero).
+def lazy_load_text(path: str) -> Iterator[Document]:
+    with open(path, encoding="utf-8") as f:
+        pending = ""
+        while True:
+            block = f.read(TEXT_BLOCK_CHARS)
+            if not block:
+                break
+            text = pending + block
+            if len(block) < TEXT_BLOCK_CHARS:  # Último bloque
+                pending = ""
+                yield Document(page_content=text, metadata={"source": path})
+                break
+            # Corta preferiblemente entre párrafos para no partir frases
+            cut = text.rfind("\n\n")
+            if cut <= 0:
+                cut = text.rfind("\n")
+            if cut <= 0:
+                cut = len(text)
+            pending = text[cut:]
+            yield Document(page_content=text[:cut], metadata={"source": path})
+        if pending:
+            yield Document(page_content=pending, metadata={"source": path})
+
+# Recorre un archivo página a página (PDF), por bloques (texto) o completo (DOCX) sin cargarlo entero.
+# Las páginas sin texto legible se retienen hasta encontrar una que sí lo tenga; si no aparece
+# ninguna, el archivo se considera escaneado.
+def iter_documents(path: str, suffix: str, filename: str) -> Iterator[Document]:
+    raw_documents = lazy_load_text(path) if suffix == ".txt" else LOADERS[suffix](path).lazy_load()
+    held: List[Document] = []
+    readable = False
+    for raw in raw_documents:
+        document = to_document(raw, filename)
+        if readable:
+            yield document
+            continue
+        held.append(document)
+        if len(extract_text(document).strip()) >= 20:
+            readable = True
+            yield from held
+            held = []
+    if not readable:
+        raise DocumentParseError(f"El archivo {filename} parece estar escaneado o no contiene texto extraíble.")
+
+# Se ejecuta en un proceso del pool: envía las páginas del archivo a la cola a medida que se leen.
+# La cola es acotada, así que el parseo se detiene si los embeddings van más lentos; al terminar
+# (o ante un error) se envía None. Si `stop` se activa, se deja de parsear.
+def stream_documents(path: str, suffix: str, filename: str, pages, stop) -> int:
+    count = 0
+    try:
+        for document in iter_documents(path, suffix, filename):
+            while not stop.is_set():
+                try:
+                    pages.put(document, timeout=_PUT_POLL_SECONDS)
+                    break
+                except queue.Full:
+                    continue
+            if stop.is_set():
+                break
+            count += 1
+    finally:
+        if not stop.is_set():
+            pages.put(None)
+    return count
+
+# Traduce un error de procesamiento a un mensaje entendible para el usuario
+def friendly_error(filename: str, error: Exception) -> str:
+    if isinstance(error, DocumentParseError):
+        return str(error)
+    error_msg = str(error)
+    if "Invalid Elementary Object" in error_msg or "Could not read malformed PDF file" in error_msg:
+        return (
+            f"El archivo '{filename}' parece estar dañado o contener contenido no estándar. "
+            "Asegúrate de subir un PDF válido con texto extraíble."
+        )
+    return f"Hubo un error al procesar '{filename}': {error_msg}"
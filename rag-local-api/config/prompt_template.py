@@ -1,9 +1,8 @@
-PROMPT_TEMPLATE = """
+# Instrucciones y ejemplos fijos. Van primero y sin datos de la solicitud, así el prefijo del prompt
+# es idéntico en todas las consultas y Ollama puede reutilizar su caché KV en lugar de reevaluarlo.
+SYSTEM_PROMPT = """
 Responde en español utilizando la información de la sección 'INFORMACION RELEVANTE' y apoyate con el 'HISTORIAL DE LA CONVERSACION' para mantener el hilo de la conversación.
 --------------------
-INFORMACION RELEVANTE:
-{context}
---------------------
 INSTRUCCIONES:
 - No uses frases como: "Según el contexto" o "Según el documento".
 - Puedes incluir detalles adicionales **que estén directamente relacionados con la pregunta** y ayuden a entender o completar la respuesta (por ejemplo, si se pregunta por el banco de destino, también puedes incluir el número de cuenta, el tipo de cuenta y el nombre del titular si están disponibles).
@@ -25,13 +24,25 @@ Respuesta:
 1. Pollo a la parrilla - $25,000
 2. Lomo saltado - $30,000
 3. Ceviche mixto - $28,000
+""".strip()
 
---------------------
+# Parte variable: el historial (estable entre turnos de una sesión) va antes que el contexto
+# recuperado, que cambia en cada pregunta
+PROMPT_TEMPLATE = """
 HISTORIAL DE LA CONVERSACION:
 {history_text}
-
+--------------------
+INFORMACION RELEVANTE:
+{context}
+--------------------
 Teniendo en cuenta lo anterior responde esto: {question}
 """.strip()
 
 def build_prompt(question, context, history_text):
-  return PROMPT_TEMPLATE.format(question=question, context=context, history_text=history_text)
\ No newline at end of file
+  return PROMPT_TEMPLATE.format(question=question, context=context, history_text=history_text)
+
+# Mensajes para el modelo de chat: instrucciones fijas como mensaje de sistema y la consulta como mensaje de usuario
+# (langchain_core.messages se importa en la primera consulta, no al arrancar la API)
+def build_messages(prompt):
+  from langchain_core.messages import SystemMessage, HumanMessage
+  return [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=prompt)]
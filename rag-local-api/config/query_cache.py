@@ -0,0 +1,108 @@
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from config import settings
+from config.metrics import QUERY_CACHE_LOOKUPS
+
+# Embeddings de preguntas que se guardan en memoria (0 = desactivada). Van delante de la caché de
+# embeddings en disco: una pregunta repetida no pasa por el executor, SQLite ni Ollama.
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", 2048))
+
+# Resultados de recuperación que se guardan en memoria (0 = desactivada). La clave es la pregunta
+# normalizada y los parámetros de búsqueda; solo valen para la generación y la versión del corpus
+# con las que se calcularon, así que cualquier ingesta, borrado o reseteo los invalida.
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 1024))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Caché en memoria acotada que descarta lo usado hace más tiempo. Se usa desde el event loop
+# y desde los hilos del executor, por eso el acceso va protegido con un lock.
+class LRUCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+_query_embeddings = LRUCache(QUERY_EMBED_CACHE_SIZE)
+_retrieval_results = LRUCache(RETRIEVAL_CACHE_SIZE)
+
+# Generación y versión del corpus de los resultados guardados
+_retrieval_state = None
+_retrieval_lock = threading.Lock()
+
+# Vector de una pregunta ya calculado en este proceso, o None
+def lookup_query_embedding(question: str) -> Optional[List[float]]:
+    if QUERY_EMBED_CACHE_SIZE <= 0:
+        return None
+    vector = _query_embeddings.get((settings.EMBED_MODEL, question))
+    QUERY_CACHE_LOOKUPS.labels(cache="embedding", result="miss" if vector is None else "hit").inc()
+    return vector
+
+def store_query_embedding(question: str, vector: List[float]) -> None:
+    _query_embeddings.put((settings.EMBED_MODEL, question), vector)
+
+# Forma canónica de una pregunta para la clave de recuperación: mismas letras (NFKC, sin distinguir
+# mayúsculas) y espacios colapsados. Los signos y tildes se conservan porque BM25 y el embedding los ven.
+def normalize_question(question: str) -> str:
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", question)).strip().casefold()
+
+def retrieval_key(question: str, mode: str, k: int) -> Tuple:
+    return normalize_question(question), mode, k
+
+# Documentos recuperados para la clave en la versión del corpus con la que está sincronizado este proceso
+def lookup_retrieval(key: Tuple) -> Optional[List[Document]]:
+    if RETRIEVAL_CACHE_SIZE <= 0:
+        return None
+    docs = _retrieval_results.get(key) if _retrieval_state == settings.corpus_state() else None
+    QUERY_CACHE_LOOKUPS.labels(cache="retrieval", result="miss" if docs is None else "hit").inc()
+    return list(docs) if docs is not None else None
+
+# Guarda los documentos recuperados con el estado del corpus que se usó al buscar. Si el corpus
+# cambió mientras tanto el resultado se descarta; si es el primero de un estado nuevo, se vacía la caché.
+def store_retrieval(key: Tuple, state: Tuple, docs: List[Document]) -> None:
+    global _retrieval_state
+    if RETRIEVAL_CACHE_SIZE <= 0:
+        return
+    with _retrieval_lock:
+        if state != settings.corpus_state():
+            return
+        if state != _retrieval_state:
+            _retrieval_results.clear()
+            _retrieval_state = state
+        _retrieval_results.put(key, list(docs))
+
+# Vacía los resultados de recuperación (se llama cuando este proceso modifica el corpus)
+def clear_retrieval_cache() -> None:
+    global _retrieval_state
+    with _retrieval_lock:
+        _retrieval_results.clear()
+        _retrieval_state = None
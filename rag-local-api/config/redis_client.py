@@ -0,0 +1,48 @@
+import os
+import time
+import asyncio
+from redis.asyncio import Redis
+
+# Configuración de conexión a Redis, variables definidas en "api" de docker-compose
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+
+# Cliente asíncrono compartido por toda la API (historial, trabajos, cachés).
+# No abre ninguna conexión al crearse: usa un pool que se conecta en el primer comando.
+redis_client = Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    decode_responses=True  # Hace que las respuestas sean strings en lugar de bytes
+)
+
+# Tiempo máximo que la API espera a Redis al iniciar (segundos). El cliente ya reintenta cada comando
+# ante errores de conexión; aquí se sigue intentando, con esperas crecientes, hasta agotar este tiempo.
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 15))
+
+# Espera antes del segundo intento (se duplica en cada uno, hasta 5 segundos)
+_CONNECT_BACKOFF = 0.5
+
+# Abre la primera conexión con Redis, reintentando mientras no responda (se llama al iniciar la API).
+# Si no se logra, la API arranca igual y /readyz informa que Redis no está disponible.
+async def connect_redis(timeout: float = REDIS_CONNECT_TIMEOUT) -> bool:
+    deadline = time.monotonic() + timeout
+    attempt, delay = 0, _CONNECT_BACKOFF
+    while True:
+        attempt += 1
+        try:
+            await asyncio.wait_for(redis_client.ping(), max(deadline - time.monotonic(), 0.1))
+            print("Conexión a Redis exitosa.")
+            return True
+        except Exception as e:
+            print(f"Error al conectar a Redis (intento {attempt}): {str(e) or type(e).__name__}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, 5)
+
+# Cierra el pool de conexiones (se llama al apagar la API)
+async def close_redis() -> None:
+    await redis_client.aclose()
@@ -0,0 +1,147 @@
+import os
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from config import settings
+from config.query_cache import retrieval_key, lookup_retrieval, store_retrieval
+
+# Modo de recuperación por defecto: "hybrid" (BM25 + vectores) o "mmr" (solo vectores, como antes)
+RETRIEVAL_MODES = ("hybrid", "mmr")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# Documentos que se pasan al modelo como contexto
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", 5))
+
+# Balance relevancia/diversidad de la búsqueda MMR
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.8))
+
+# Candidatos que aporta cada ranking (vectorial y léxico) antes de fusionarlos
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+
+# Peso de cada ranking en la fusión (Reciprocal Rank Fusion)
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", 1.0))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", 1.0))
+
+# Constante de RRF: valores altos suavizan la diferencia entre las primeras posiciones
+RRF_K = int(os.getenv("RRF_K", 60))
+
+_backfill_lock = threading.Lock()
+_backfill_state = None
+
+# Reconstruye el índice léxico desde la base vectorial si nunca se construyó para esta generación
+# (documentos ingeridos antes de que existiera el índice, o en otro contenedor que no comparte
+# CHROMA_DIR) o si está vacío y la base vectorial no. No se compara la cantidad de fragmentos: una
+# ingesta en curso escribe primero en la base vectorial y después en el índice, y eso no es un desfase.
+# Se comprueba una vez por generación y versión del corpus. Si otro hilo ya lo está reconstruyendo,
+# la búsqueda sigue con el índice actual en vez de ocupar un hilo del executor esperando el lock.
+def ensure_lexical_index(vectordb) -> None:
+    global _backfill_state
+    state = settings.corpus_state()
+    if _backfill_state == state:
+        return
+    if not _backfill_lock.acquire(blocking=False):
+        return
+    try:
+        if _backfill_state == state:
+            return
+        generation = state[0]
+        lexical_index = settings.get_lexical_index()
+        if lexical_index.generation() != generation or (len(lexical_index) == 0 and vectordb.count() > 0):
+            def load():
+                result = vectordb.get(include=["documents"])
+                return zip(result["ids"], result["documents"])
+
+            lexical_index.rebuild(load, generation)
+            print(f"Índice léxico reconstruido desde la base vectorial: {len(lexical_index)} fragmentos.")
+        _backfill_state = state
+    finally:
+        _backfill_lock.release()
+
+# Fusiona varios rankings de ids con Reciprocal Rank Fusion ponderado
+def reciprocal_rank_fusion(rankings: List[List[str]], weights: List[float], k: int = RRF_K) -> List[str]:
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+# Búsqueda híbrida: une el ranking vectorial con el ranking BM25 del índice léxico.
+# Los nombres de productos, precios y números de cuenta coinciden de forma exacta en BM25
+# aunque su embedding no quede cerca de la pregunta.
+def hybrid_search(vectordb, question: str, k: int, embedding: List[float]) -> List[Document]:
+    return hybrid_search_many(vectordb, [question], k, [embedding])[0]
+
+# Búsqueda híbrida de varias preguntas: los rankings vectoriales salen de una sola búsqueda en la
+# base vectorial y los fragmentos que solo encontró BM25 se leen todos juntos
+def hybrid_search_many(vectordb, questions: List[str], k: int,
+                       embeddings: List[List[float]]) -> List[List[Document]]:
+    ensure_lexical_index(vectordb)
+    lexical_index = settings.get_lexical_index()
+
+    docs_by_id: Dict[str, Document] = {}
+    fused_rankings = []
+    vector_results = vectordb.similarity_search_by_vectors(embeddings, k=HYBRID_CANDIDATES)
+    for question, vector_docs in zip(questions, vector_results):
+        lexical_hits = lexical_index.search(question, HYBRID_CANDIDATES)
+        docs_by_id.update((doc.id, doc) for doc in vector_docs)
+        fused_rankings.append(reciprocal_rank_fusion(
+            [[doc.id for doc in vector_docs], [chunk_id for chunk_id, _ in lexical_hits]],
+            [HYBRID_VECTOR_WEIGHT, HYBRID_LEXICAL_WEIGHT],
+        )[:k])
+
+    # Los fragmentos que solo encontró BM25 se leen de la base vectorial
+    missing = list({chunk_id for fused in fused_rankings for chunk_id in fused if chunk_id not in docs_by_id})
+    if missing:
+        result = vectordb.get(ids=missing)
+        for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"]):
+            docs_by_id[chunk_id] = Document(id=chunk_id, page_content=text, metadata=metadata or {})
+
+    return [[docs_by_id[chunk_id] for chunk_id in fused if chunk_id in docs_by_id] for fused in fused_rankings]
+
+# Recupera los documentos más relevantes para la pregunta con el modo indicado (síncrono, usa la base vectorial).
+# Si ya se calculó el embedding de la pregunta se reutiliza en lugar de pedirlo otra vez a Ollama, y si la
+# misma pregunta ya se buscó con esta versión del corpus se devuelve el resultado guardado (ver config/query_cache.py).
+def retrieve(vectordb, question: str, mode: str = None, k: int = None,
+             embedding: Optional[List[float]] = None) -> List[Document]:
+    mode = mode or RETRIEVAL_MODE
+    k = k or RETRIEVAL_K
+    key = retrieval_key(question, mode, k)
+    docs = lookup_retrieval(key)
+    if docs is not None:
+        return docs
+
+    state = settings.corpus_state()
+    if embedding is None:
+        embedding = settings.get_embeddings().embed_query(question)
+    if mode == "hybrid":
+        docs = hybrid_search(vectordb, question, k, embedding)
+    else:
+        docs = vectordb.max_marginal_relevance_search_by_vector(embedding, k=k, lambda_mult=MMR_LAMBDA)
+    store_retrieval(key, state, docs)
+    return docs
+
+# Igual que retrieve, para varias preguntas con sus embeddings ya calculados: las que no están en la
+# caché de recuperación se buscan en una sola pasada
+def retrieve_many(vectordb, questions: List[str], embeddings: List[List[float]], mode: str = None,
+                  k: int = None) -> List[List[Document]]:
+    mode = mode or RETRIEVAL_MODE
+    k = k or RETRIEVAL_K
+    keys = [retrieval_key(question, mode, k) for question in questions]
+    results = [lookup_retrieval(key) for key in keys]
+    pending = [i for i, docs in enumerate(results) if docs is None]
+    if not pending:
+        return results
+
+    state = settings.corpus_state()
+    pending_questions = [questions[i] for i in pending]
+    pending_embeddings = [embeddings[i] for i in pending]
+    if mode == "hybrid":
+        found = hybrid_search_many(vectordb, pending_questions, k, pending_embeddings)
+    else:
+        found = vectordb.max_marginal_relevance_search_by_vectors(pending_embeddings, k=k, lambda_mult=MMR_LAMBDA)
+    for i, docs in zip(pending, found):
+        results[i] = docs
+        store_retrieval(keys[i], state, docs)
+    return results
@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+from fastapi import HTTPException
+
+from config.settings import EMBED_MODEL
+from config.metrics import SCHEDULER_QUEUED, SCHEDULER_REJECTED, SCHEDULER_WAIT_SECONDS
+
+# Control de admisión delante de Ollama (se puede desactivar con SCHEDULER_ENABLED=false)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+
+# Llamadas simultáneas por modelo: chat y embeddings por defecto, y límites específicos por modelo,
+# por ejemplo SCHEDULER_MODEL_LIMITS='{"llama3.2:latest": 4}'
+SCHEDULER_CHAT_CONCURRENCY = int(os.getenv("SCHEDULER_CHAT_CONCURRENCY", 2))
+SCHEDULER_EMBED_CONCURRENCY = int(os.getenv("SCHEDULER_EMBED_CONCURRENCY", 2))
+SCHEDULER_MODEL_LIMITS: Dict[str, int] = json.loads(os.getenv("SCHEDULER_MODEL_LIMITS", "{}"))
+
+# Solicitudes interactivas que pueden esperar turno por modelo; con la cola llena se responde 429
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", 16))
+
+# Espera máxima en la cola de una solicitud interactiva antes de responder 503 (segundos)
+SCHEDULER_QUEUE_TIMEOUT = float(os.getenv("SCHEDULER_QUEUE_TIMEOUT", 30))
+
+# Prioridades: las preguntas de los usuarios pasan antes que los lotes de embeddings de la ingesta
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+# Turno concedido para llamar a un modelo; release() se puede llamar más de una vez
+class Lease:
+    def __init__(self, scheduler: "OllamaScheduler", model: str):
+        self._scheduler = scheduler
+        self._model = model
+        self._start = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._scheduler._release(self._model, time.monotonic() - self._start)
+
+# Estado de un modelo: llamadas en curso y cola de espera ordenada por (prioridad, llegada)
+class _ModelQueue:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: List = []
+        self.interactive_waiting = 0
+        self.avg_hold = 1.0  # Duración media de un turno (segundos), para estimar Retry-After
+
+# Planificador de llamadas a Ollama con límite de concurrencia por modelo, prioridad para las
+# solicitudes interactivas y rechazo rápido (429/503 con Retry-After) cuando la cola se llena.
+# Los límites son por proceso de la API.
+class OllamaScheduler:
+    def __init__(self, max_queue: int = SCHEDULER_MAX_QUEUE, queue_timeout: float = SCHEDULER_QUEUE_TIMEOUT):
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._sequence = itertools.count()
+
+    # Límite de llamadas simultáneas de un modelo
+    @staticmethod
+    def model_limit(model: str) -> int:
+        if model in SCHEDULER_MODEL_LIMITS:
+            return int(SCHEDULER_MODEL_LIMITS[model])
+        return SCHEDULER_EMBED_CONCURRENCY if model == EMBED_MODEL else SCHEDULER_CHAT_CONCURRENCY
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            queue = self._queues[model] = _ModelQueue(self.model_limit(model))
+        return queue
+
+    # Segundos sugeridos al cliente antes de reintentar
+    def _retry_after(self, queue: _ModelQueue) -> int:
+        pending = len(queue.waiters) + queue.active
+        return max(1, round(queue.avg_hold * pending / max(1, queue.limit)))
+
+    def _reject(self, model: str, queue: _ModelQueue, status_code: int, reason: str, detail: str):
+        SCHEDULER_REJECTED.labels(model=model, reason=reason).inc()
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self._retry_after(queue))},
+        )
+
+    # Espera un turno para llamar al modelo. Las solicitudes interactivas esperan como máximo
+    # queue_timeout y se rechazan si la cola está llena; las de ingesta esperan lo que haga falta.
+    async def acquire(self, model: str, priority: int = INTERACTIVE) -> Lease:
+        queue = self._queue(model)
+        self._dispatch(queue)
+        if not SCHEDULER_ENABLED or queue.active < queue.limit:
+            queue.active += 1
+            return Lease(self, model)
+
+        interactive = priority == INTERACTIVE
+        if interactive and queue.interactive_waiting >= self.max_queue:
+            self._reject(model, queue, 429, "queue_full",
+                         f"El modelo '{model}' está atendiendo demasiadas solicitudes. Intente de nuevo en unos segundos.")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue.waiters, (priority, next(self._sequence), future))
+        if interactive:
+            queue.interactive_waiting += 1
+        SCHEDULER_QUEUED.labels(model=model, priority=PRIORITY_NAMES[priority]).inc()
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout if interactive else None)
+        except asyncio.TimeoutError:
+            self._reject(model, queue, 503, "timeout",
+                         f"El modelo '{model}' no tuvo capacidad disponible a tiempo. Intente de nuevo más tarde.")
+        except asyncio.CancelledError:
+            # Si el turno llegó justo cuando se canceló la espera, se cede al siguiente
+            if future.done() and not future.cancelled():
+                self._release(model, 0.0)
+            raise
+        finally:
+            if interactive:
+                queue.interactive_waiting -= 1
+            SCHEDULER_QUEUED.labels(model=model, priority=PRIORITY_NAMES[priority]).dec()
+            SCHEDULER_WAIT_SECONDS.labels(model=model, priority=PRIORITY_NAMES[priority]).observe(
+                time.monotonic() - start
+            )
+        return Lease(self, model)
+
+    # Entrega los turnos libres a los primeros de la cola (las esperas canceladas se descartan)
+    def _dispatch(self, queue: _ModelQueue) -> None:
+        while queue.waiters and queue.active < queue.limit:
+            _, _, future = heapq.heappop(queue.waiters)
+            if not future.done():
+                queue.active += 1
+                future.set_result(None)
+
+    # Libera un turno y se lo pasa al siguiente en la cola
+    def _release(self, model: str, held: float) -> None:
+        queue = self._queues[model]
+        if held:
+            queue.avg_hold = 0.8 * queue.avg_hold + 0.2 * held
+        queue.active -= 1
+        self._dispatch(queue)
+
+    # Turno como administrador de contexto
+    @asynccontextmanager
+    async def slot(self, model: str, priority: int = INTERACTIVE):
+        lease = await self.acquire(model, priority)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    # Estado actual de cada modelo
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            model: {
+                "limit": queue.limit,
+                "active": queue.active,
+                "waiting": sum(1 for _, _, future in queue.waiters if not future.done()),
+                "avg_hold_seconds": round(queue.avg_hold, 3),
+            }
+            for model, queue in self._queues.items()
+        }
+
+# Instancia global compartida por las rutas y la ingesta
+scheduler = OllamaScheduler()
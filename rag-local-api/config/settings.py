@@ -1,70 +1,253 @@
 import os
+import re
+import json
 import shutil
-from langchain_ollama import ChatOllama, OllamaEmbeddings
-from langchain_chroma import Chroma
-from chromadb import PersistentClient
-from chromadb.config import Settings as ChromaSettings
+import threading
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from config.lexical_index import LexicalIndex
+from config.vector_store import VectorStore
+
+# LangChain/Ollama tardan en importarse: se cargan la primera vez que se crea un modelo,
+# así el arranque de la API (y /healthz) no depende de ellos
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from langchain_ollama import ChatOllama
+
+# URL del servidor de Ollama, variable definida en "api" de docker-compose
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://ollama:11434")
+
+# Segundos que Ollama mantiene un modelo cargado en memoria tras su último uso (-1 = siempre)
+OLLAMA_KEEP_ALIVE = int(os.getenv("OLLAMA_KEEP_ALIVE", 1800))
 
 #modelo de embeddings a utilizar
 EMBED_MODEL = "mxbai-embed-large"
 
+# Base vectorial: "chroma" (PersistentClient) o "numpy" (índice cuantizado en memoria mapeada).
+# Cambiar de backend no migra los datos: hay que volver a ingerir los documentos.
+VECTOR_BACKENDS = ("chroma", "numpy")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+if VECTOR_BACKEND not in VECTOR_BACKENDS:
+    raise ValueError(f"VECTOR_BACKEND no válido: {VECTOR_BACKEND}. Use: {', '.join(VECTOR_BACKENDS)}.")
+
 # Directorio donde se almacenará la base de datos de vectores
-CHROMA_DIR = "chroma_db_e5"
+CHROMA_DIR = os.getenv("CHROMA_DIR", "chroma_db_e5")
+
+# Servidor de Chroma (por ejemplo CHROMA_HOST=chroma). Si se define, la API usa ese servidor en lugar
+# de la base embebida en CHROMA_DIR; es la opción para varios workers o varios contenedores.
+CHROMA_HOST = os.getenv("CHROMA_HOST")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", 8000))
+
+# La base embebida de Chroma no admite que varios procesos la usen a la vez
+# (WEB_CONCURRENCY es la variable que uvicorn toma como número de workers por defecto)
+if VECTOR_BACKEND == "chroma" and not CHROMA_HOST and int(os.getenv("WEB_CONCURRENCY", 1)) > 1:
+    print("Aviso: con varios workers use CHROMA_HOST (servidor de Chroma) o VECTOR_BACKEND=numpy.")
 
 # Nombre de la colección que se usará para el RAG
 COLLECTION_NAME = "rag_collection"
 
-# Crea una instancia global de embeddings usando el modelo definido
-embeddings = OllamaEmbeddings(model=EMBED_MODEL)
+# La base vectorial y el índice léxico se versionan por generación: /reset_embeddings crea una
+# generación nueva y vacía (directorio gen-N y colección rag_collection_gN) en lugar de borrar la
+# actual, así los workers que aún la usan no pierden los archivos. La generación 0 es la
+# disposición original, directamente en CHROMA_DIR.
+_GENERATION_DIR_RE = re.compile(r"^gen-(\d+)$")
+_GENERATION_COLLECTION_RE = re.compile(rf"^{COLLECTION_NAME}(?:_g(\d+))?$")
+
+# Directorio con los archivos de una generación
+def generation_dir(generation: int) -> str:
+    return CHROMA_DIR if generation == 0 else os.path.join(CHROMA_DIR, f"gen-{generation}")
+
+# Colección de Chroma de una generación
+def generation_collection(generation: int) -> str:
+    return COLLECTION_NAME if generation == 0 else f"{COLLECTION_NAME}_g{generation}"
+
+# Archivos del backend "numpy" de una generación
+def numpy_index_dir(generation: int) -> str:
+    return os.path.join(generation_dir(generation), "numpy_index")
+
+# Índice léxico (BM25) que se mantiene junto a la base vectorial para la búsqueda híbrida
+def lexical_index_path(generation: int) -> str:
+    return os.path.join(generation_dir(generation), "bm25_index.sqlite3")
+
+# Caché de embeddings en disco (se puede desactivar con EMBED_CACHE_ENABLED=false)
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+
+# Archivo de la caché de embeddings (fuera de CHROMA_DIR para que sobreviva a /reset_embeddings)
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join("embedding_cache", "embeddings.sqlite3"))
+
+# Máximo de vectores guardados en la caché antes de expulsar los menos usados
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", 200_000))
+
+# Crea el modelo de embeddings definido, envuelto en la caché en disco si está activada
+def create_embeddings() -> "Embeddings":
+    from langchain_ollama import OllamaEmbeddings
+    embeddings = OllamaEmbeddings(model=EMBED_MODEL, base_url=OLLAMA_HOST, keep_alive=OLLAMA_KEEP_ALIVE)
+    if EMBED_CACHE_ENABLED:
+        from config.embedding_cache import CachedEmbeddings, EmbeddingStore
+        embeddings = CachedEmbeddings(
+            embeddings,
+            model_name=EMBED_MODEL,
+            store=EmbeddingStore(EMBED_CACHE_PATH, max_entries=EMBED_CACHE_MAX_ENTRIES),
+        )
+    return embeddings
+
+# Variable global con el modelo de embeddings; se crea la primera vez que se usa
+_embeddings = None
+_embeddings_lock = threading.Lock()
 
-def create_chat_model(model_name: str) -> ChatOllama:
+# Devuelve la instancia global de embeddings; si no existe, la crea
+def get_embeddings() -> "Embeddings":
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                _embeddings = create_embeddings()
+    return _embeddings
+
+# Ventana de contexto (num_ctx) por defecto de los modelos de chat y ventanas específicas por modelo,
+# por ejemplo MODEL_CONTEXT_WINDOWS='{"llama3.2:latest": 8192}'
+MODEL_CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", 4096))
+MODEL_CONTEXT_WINDOWS = json.loads(os.getenv("MODEL_CONTEXT_WINDOWS", "{}"))
+
+# Ventana de contexto del modelo indicado
+def context_window(model_name: str) -> int:
+    return int(MODEL_CONTEXT_WINDOWS.get(model_name, MODEL_CONTEXT_TOKENS))
+
+def create_chat_model(model_name: str) -> "ChatOllama":
+    from langchain_ollama import ChatOllama
     return ChatOllama(
         model=model_name,
+        base_url=OLLAMA_HOST,
         temperature=0.3,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        num_ctx=context_window(model_name),  # Debe ser siempre el mismo o Ollama recarga el modelo
     )
 
-# Crea una instancia de la base de datos vectorial Chroma
-def create_vectordb():
-    client = PersistentClient(
-        path=CHROMA_DIR,
-        settings=ChromaSettings(allow_reset=True)  # Permite reiniciar desde código
-    )
-    return Chroma(
-        client=client,
-        collection_name=COLLECTION_NAME,
-        embedding_function=embeddings,  #convertir documentos en vectores
-        persist_directory=CHROMA_DIR
+# Instancias de ChatOllama reutilizadas entre solicitudes (una por modelo, con su cliente HTTP)
+_chat_models = {}
+_chat_models_lock = threading.Lock()
+
+# Devuelve la instancia compartida del modelo de chat; si no existe, la crea
+def get_chat_model(model_name: str) -> "ChatOllama":
+    model = _chat_models.get(model_name)
+    if model is None:
+        with _chat_models_lock:
+            model = _chat_models.get(model_name)
+            if model is None:
+                model = _chat_models[model_name] = create_chat_model(model_name)
+    return model
+
+# Crea una instancia de la base de datos vectorial del backend configurado para la generación indicada
+# (el módulo de cada backend se importa solo si se usa)
+def create_vectordb(generation: int = 0) -> VectorStore:
+    if VECTOR_BACKEND == "numpy":
+        from config.numpy_store import NumpyVectorStore
+        return NumpyVectorStore(numpy_index_dir(generation))
+
+    from config.chroma_store import ChromaVectorStore
+    return ChromaVectorStore(
+        generation_dir(generation), generation_collection(generation), get_embeddings(),
+        host=CHROMA_HOST, port=CHROMA_PORT,
     )
 
+# Generación abierta por este proceso y última versión del corpus vista (ver config/corpus.py)
+_generation = 0
+_corpus_version: Optional[int] = None
+
 # Variable global para guardar una única instancia del vectorstore durante la ejecución
 _vectordb = None
 
+# Protege la creación y el cambio de generación del vectorstore, que se ejecutan en hilos del executor
+_vectordb_lock = threading.Lock()
+
 # Devuelve la instancia global de vectorstore; si no existe, la crea
-def get_vectordb():
+def get_vectordb() -> VectorStore:
     global _vectordb
     if _vectordb is None:
-        _vectordb = create_vectordb()
+        with _vectordb_lock:
+            if _vectordb is None:
+                _vectordb = create_vectordb(_generation)
     return _vectordb
 
-# Reinicia la base de datos vectorial:
-# - borra la instancia actual
-# - elimina los datos del disco
-# - crea una nueva base limpia
-def reset_vectordb():
+# Variable global con el índice léxico; se carga desde disco la primera vez que se usa
+_lexical_index = None
+_lexical_index_lock = threading.Lock()
+
+# Devuelve la instancia global del índice léxico; si no existe, la crea
+def get_lexical_index() -> LexicalIndex:
+    global _lexical_index
+    if _lexical_index is None:
+        with _lexical_index_lock:
+            if _lexical_index is None:
+                _lexical_index = LexicalIndex(lexical_index_path(_generation))
+    return _lexical_index
+
+# Base vectorial e índice léxico de una misma generación. Se leen con el lock del cambio de
+# generación tomado, así un /reset_embeddings simultáneo no puede devolver uno de cada generación.
+def get_indexes() -> Tuple[VectorStore, LexicalIndex]:
     global _vectordb
-    # Resetea cliente actual si existe
-    if _vectordb:
-        _vectordb._client.reset()  # Limpieza lógica (no elimina archivos)
-        _vectordb._client = None
-        _vectordb = None
+    with _vectordb_lock:
+        if _vectordb is None:
+            _vectordb = create_vectordb(_generation)
+        return _vectordb, get_lexical_index()
+
+# Generación y versión del corpus con las que está sincronizado este proceso
+def corpus_state() -> Tuple[int, Optional[int]]:
+    return _generation, _corpus_version
 
-    # Elimina subdirectorios en el directorio de Chroma
+# Sincroniza este proceso con el estado compartido: si cambió la generación abre la nueva
+# (las instancias anteriores no se cierran porque puede haber solicitudes o ingestas usándolas;
+# se liberan cuando dejan de referenciarse) y si solo cambió la versión del corpus recarga los
+# cambios que hicieron otros procesos.
+def sync_corpus_state(generation: int, corpus_version: int) -> None:
+    global _generation, _corpus_version, _vectordb, _lexical_index
+    with _vectordb_lock:
+        if generation != _generation:
+            vectordb = create_vectordb(generation)
+            lexical_index = LexicalIndex(lexical_index_path(generation))
+            # Una generación nueva empieza vacía en las dos bases y la ingesta escribe en ambas, así que
+            # su índice léxico ya está al día: se marca para que la primera búsqueda no lo reconstruya
+            if lexical_index.generation() is None and len(lexical_index) == 0 and vectordb.count() == 0:
+                lexical_index.set_generation(generation)
+            with _lexical_index_lock:
+                _generation = generation
+                _vectordb = vectordb
+                _lexical_index = lexical_index
+        elif corpus_version != _corpus_version:
+            if _vectordb is not None:
+                _vectordb.refresh()
+            if _lexical_index is not None:
+                _lexical_index.refresh()
+        _corpus_version = corpus_version
+
+# Reinicia la base de datos vectorial cambiando a una generación nueva y vacía. Se conserva la
+# generación anterior (otros workers pueden seguir leyéndola hasta sincronizarse) y se borran las previas.
+def reset_vectordb(generation: int, corpus_version: int) -> VectorStore:
+    sync_corpus_state(generation, corpus_version)
+    drop_generations(generation - 1)
+    return get_vectordb()
+
+# Elimina los datos (directorios y colecciones del servidor de Chroma) de las generaciones anteriores a `keep_from`
+def drop_generations(keep_from: int) -> None:
+    if keep_from <= 0:
+        return
     if os.path.exists(CHROMA_DIR):
         for item in os.listdir(CHROMA_DIR):
+            match = _GENERATION_DIR_RE.match(item)
+            if match and int(match.group(1)) >= keep_from:
+                continue
             item_path = os.path.join(CHROMA_DIR, item)
+            # Todo lo que no es un directorio gen-N pertenece a la generación 0
             if os.path.isdir(item_path):
-                shutil.rmtree(item_path)  # Elimina subcarpetas
+                shutil.rmtree(item_path, ignore_errors=True)
+            else:
+                os.remove(item_path)
 
-    # Crea nueva instancia desde cero
-    _vectordb = create_vectordb()
-    return _vectordb
+    if VECTOR_BACKEND == "chroma" and CHROMA_HOST:
+        from config.chroma_store import create_client
+        client = create_client(host=CHROMA_HOST, port=CHROMA_PORT)
+        for collection in client.list_collections():
+            name = getattr(collection, "name", collection)
+            match = _GENERATION_COLLECTION_RE.match(name)
+            if match and int(match.group(1) or 0) < keep_from:
+                client.delete_collection(name)
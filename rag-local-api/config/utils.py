@@ -1,34 +1,37 @@
 import os
-import requests
+import asyncio
+import functools
+import httpx
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import UploadFile, HTTPException
 
-from langchain_community.document_loaders import TextLoader, PyPDFLoader, Docx2txtLoader
+from config.settings import OLLAMA_HOST
+from config.parsing import LOADERS  # Se reexporta para las rutas
 
-# Tamaño máximo permitido para archivos (en MB)
-MAX_FILE_SIZE_MB = 8
+# Tamaño máximo permitido para archivos (en MB). La subida se copia a disco por bloques y el archivo
+# se procesa página a página, así que el límite no depende de la memoria disponible.
+MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", 256))
 
 # Extensiones permitidas para la carga de archivos
 ALLOWED_EXTENSIONS = {".pdf", ".txt", ".docx"}
 
-# Diccionario que asocia cada extensión con su cargador correspondiente
-LOADERS = {
-    ".pdf": PyPDFLoader,
-    ".docx": Docx2txtLoader,
-    ".txt": lambda path: TextLoader(path, encoding="utf-8"),  # Para archivos de texto plano
-}
-
-# validar si un modelo está disponible en el servidor de Ollama
-def is_valid_model(model_name: str) -> bool:
-    try:
-        # Consulta a la API de Ollama para obtener los modelos disponibles
-        response = requests.get("http://ollama:11434/api/tags")
-        response.raise_for_status()  # Lanza una excepción si hubo error HTTP
-        models = response.json().get("models", [])  # Extrae la lista de modelos
-        available = [m["name"] for m in models]  # Extrae solo los nombres
-        return model_name in available  # Verifica si el modelo está entre los disponibles
-    except Exception as e:
-        print(f"Error al validar modelo: {e}")
-        return False
+# Número máximo de hilos para trabajo bloqueante (Chroma, lectura de PDFs, escritura a disco)
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", 8))
+
+# Executor acotado para no bloquear el event loop con código síncrono
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="rag-blocking")
+
+# Cliente HTTP asíncrono compartido para hablar con Ollama (reutiliza conexiones keep-alive)
+ollama_http = httpx.AsyncClient(
+    base_url=OLLAMA_HOST,
+    timeout=httpx.Timeout(10.0, read=120.0),
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+)
+
+# Ejecuta una función síncrona en el executor acotado y espera su resultado sin bloquear el event loop
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
 
 #validar archivo cargado por el usuario
 def validate_file(file: UploadFile):
@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+# Interfaz común de las bases vectoriales (Chroma o el índice NumPy en memoria mapeada).
+# Es lo único que usan la ingesta, la recuperación y las rutas; `where` sigue la sintaxis de
+# filtros de metadatos de Chroma ({"doc_id": "..."}, {"$and": [...]}, {"campo": {"$in": [...]}}).
+class VectorStore:
+    # Fragmentos guardados
+    def count(self) -> int:
+        raise NotImplementedError
+
+    # Devuelve {"ids", "documents", "metadatas"} de los fragmentos indicados por id o por filtro
+    # (todos si no se indica ninguno); las claves no incluidas en `include` valen None
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Sequence[str] = ("documents", "metadatas")) -> Dict:
+        raise NotImplementedError
+
+    # Inserta o reemplaza fragmentos con sus embeddings ya calculados
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+               metadatas: List[Dict]) -> None:
+        raise NotImplementedError
+
+    # Reemplaza los metadatos de fragmentos existentes
+    def update(self, ids: List[str], metadatas: List[Dict]) -> None:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]) -> None:
+        raise NotImplementedError
+
+    # Los k fragmentos más parecidos al vector de la consulta (Document con id)
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4,
+                                    where: Optional[Dict] = None) -> List[Document]:
+        raise NotImplementedError
+
+    # Búsqueda MMR: entre los fetch_k más parecidos elige k equilibrando relevancia y diversidad
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5,
+                                                where: Optional[Dict] = None) -> List[Document]:
+        raise NotImplementedError
+
+    # Búsquedas de varias consultas a la vez (una lista de resultados por vector, en el mismo orden).
+    # Por defecto se hace una búsqueda por vector; los backends que pueden las resuelven en una pasada.
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                     where: Optional[Dict] = None) -> List[List[Document]]:
+        return [self.similarity_search_by_vector(embedding, k=k, where=where) for embedding in embeddings]
+
+    def max_marginal_relevance_search_by_vectors(self, embeddings: List[List[float]], k: int = 4,
+                                                 fetch_k: int = 20, lambda_mult: float = 0.5,
+                                                 where: Optional[Dict] = None) -> List[List[Document]]:
+        return [
+            self.max_marginal_relevance_search_by_vector(embedding, k=k, fetch_k=fetch_k,
+                                                         lambda_mult=lambda_mult, where=where)
+            for embedding in embeddings
+        ]
+
+    # Incorpora los cambios que otros procesos (workers o contenedores) hicieron en la misma base
+    def refresh(self) -> None:
+        pass
+
+    # Libera los recursos abiertos (archivos, conexiones)
+    def close(self) -> None:
+        pass
@@ -0,0 +1,80 @@
+import os
+import time
+import asyncio
+from functools import partial
+from typing import List, Optional
+
+import httpx
+
+from config import settings
+from config.utils import ollama_http  # Cliente HTTP compartido hacia Ollama (pool keep-alive)
+from config.model_registry import model_registry
+from config.prompt_template import SYSTEM_PROMPT
+
+# Precarga los modelos en Ollama al iniciar la API (desactivado por defecto)
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "false").lower() == "true"
+
+# Modelos de chat a precargar, separados por comas; si se deja vacío se usa el primero disponible
+OLLAMA_WARMUP_MODELS = [m.strip() for m in os.getenv("OLLAMA_WARMUP_MODELS", "").split(",") if m.strip()]
+
+# Cargar un modelo grande en CPU puede tardar bastante más que una solicitud normal
+WARMUP_TIMEOUT = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", 300))
+
+_warmup_task: Optional[asyncio.Task] = None
+
+# Carga el modelo de chat y evalúa las instrucciones fijas, que quedan en la caché KV de Ollama
+# como prefijo de las siguientes consultas. num_ctx debe coincidir con el de las solicitudes,
+# si no Ollama vuelve a cargar el modelo en la primera consulta.
+async def warm_up_chat_model(model_name: str) -> None:
+    response = await ollama_http.post("/api/chat", json={
+        "model": model_name,
+        "messages": [{"role": "system", "content": SYSTEM_PROMPT}],
+        "stream": False,
+        "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+        "options": {"num_ctx": settings.context_window(model_name), "num_predict": 1},
+    }, timeout=httpx.Timeout(10.0, read=WARMUP_TIMEOUT))
+    response.raise_for_status()
+
+# Carga el modelo de embeddings con una entrada corta (sin pasar por la caché de embeddings)
+async def warm_up_embed_model() -> None:
+    response = await ollama_http.post("/api/embed", json={
+        "model": settings.EMBED_MODEL,
+        "input": "warmup",
+        "keep_alive": settings.OLLAMA_KEEP_ALIVE,
+    }, timeout=httpx.Timeout(10.0, read=WARMUP_TIMEOUT))
+    response.raise_for_status()
+
+# Modelos de chat a precargar
+async def _warmup_models() -> List[str]:
+    if OLLAMA_WARMUP_MODELS:
+        return OLLAMA_WARMUP_MODELS
+    return (await model_registry.get_chat_models())[:1]
+
+# Precarga el modelo de embeddings y los de chat; los errores solo se registran
+async def warm_up() -> None:
+    targets = [("embeddings", settings.EMBED_MODEL, warm_up_embed_model)]
+    targets += [("chat", name, partial(warm_up_chat_model, name)) for name in await _warmup_models()]
+    for kind, name, load in targets:
+        start = time.time()
+        try:
+            await load()
+            print(f"Modelo {kind} '{name}' precargado en {time.time() - start:.2f} segundos")
+        except Exception as e:
+            print(f"No se pudo precargar el modelo {kind} '{name}': {e}")
+
+# Lanza la precarga en segundo plano para no retrasar el arranque de la API
+def start_warmup() -> None:
+    global _warmup_task
+    if OLLAMA_WARMUP and _warmup_task is None:
+        _warmup_task = asyncio.create_task(warm_up())
+
+# Cancela la precarga si sigue en curso al apagar la API
+async def stop_warmup() -> None:
+    global _warmup_task
+    if _warmup_task is not None:
+        _warmup_task.cancel()
+        try:
+            await _warmup_task
+        except asyncio.CancelledError:
+            pass
+        _warmup_task = None
@@ -1,9 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routes.ingest import router as ingest_router
 from routes.ask import router as ask_router
 from routes.model import router as model_router
 from routes.history import router as history_router
+from routes.documents import router as documents_router
+from routes.metrics import router as metrics_router
+from routes.health import router as health_router
 from fastapi.middleware.cors import CORSMiddleware
+from config.redis_client import connect_redis, close_redis
+from config.history import migrate_legacy_history
+from config.utils import ollama_http, blocking_executor
+from config.model_registry import model_registry
+from config.ingest_pipeline import shutdown_parse_pool
+from config.warmup import start_warmup, stop_warmup
+from config.health import start_preload, stop_preload
+
+# Abre las conexiones al iniciar (reintentando si Redis aún no responde), carga en segundo plano
+# la base vectorial y libera los recursos compartidos al apagar
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if await connect_redis():
+        await migrate_legacy_history()
+    model_registry.start()
+    start_preload()
+    start_warmup()
+    yield
+    await stop_warmup()
+    await stop_preload()
+    await model_registry.stop()
+    shutdown_parse_pool()
+    await ollama_http.aclose()
+    await close_redis()
+    blocking_executor.shutdown(wait=False, cancel_futures=True)
 
 app = FastAPI(
     title="RAG LOCAL",
@@ -13,7 +42,8 @@ app = FastAPI(
         "name": "Yonier Garcia Mosquera",
         "linkedin": "www.linkedin.com/in/yoniergm",
         "email": "yoniermosquera55@gmail.com",
-    }
+    },
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -30,4 +60,7 @@ def root():
 app.include_router(ingest_router)
 app.include_router(ask_router)
 app.include_router(model_router)
-app.include_router(history_router)
\ No newline at end of file
+app.include_router(history_router)
+app.include_router(documents_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
\ No newline at end of file
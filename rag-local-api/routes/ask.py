@@ -1,14 +1,28 @@
+import json
+import anyio
+import asyncio
 from fastapi import APIRouter, HTTPException, Form
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 
 # Importaciones internas del proyecto
 from config import settings  # Configuraciones generales (como embeddings y vectordb)
-from config.prompt_template import build_prompt  # Función para construir el prompt enriquecido
-from config.settings import create_chat_model  # Función que crea una instancia del modelo de chat
-from config.history import get_last_pairs, add_pair, get_full_history  # Funciones de historial en Redis
-from langchain.schema import HumanMessage  # Representa un mensaje del usuario en LangChain
-from config.utils import is_valid_model  # Función para validar si el modelo está cargado en Ollama
+from config.context_builder import build_prompt_context  # Arma el prompt dentro del presupuesto de tokens del modelo
+from config.prompt_template import build_messages  # Instrucciones fijas (sistema) + consulta (usuario)
+from config.settings import get_chat_model  # Instancia compartida del modelo de chat
+from config.history import get_last_pairs, add_pair, DEFAULT_SESSION_ID  # Funciones de historial en Redis
+from config.utils import run_blocking  # Ejecuta código bloqueante fuera del event loop
+from config.model_registry import model_registry  # Caché de modelos disponibles en Ollama
+from config.corpus import get_corpus_version, get_synced_vectordb  # Versión del corpus para invalidar cachés
+from config.answer_cache import ANSWER_CACHE_ENABLED, lookup_answer, store_answer  # Caché semántica de respuestas
+from config.retrieval import retrieve, retrieve_many, RETRIEVAL_MODES  # Recuperación MMR o híbrida (BM25 + vectores)
+from config.metrics import ASK_STAGE_SECONDS, IN_FLIGHT, StageTimer, observe_llm_metadata  # Métricas de Prometheus
+from config.metrics import ASK_BATCH_STAGE_SECONDS  # Etapas compartidas de /ask_batch
+from config.scheduler import scheduler, INTERACTIVE, BULK  # Turnos por modelo delante de Ollama
+from config.ask_batch import ASK_BATCH_MAX_QUESTIONS, ASK_BATCH_CONCURRENCY, embed_questions  # Lotes de preguntas
+from config.query_cache import lookup_query_embedding, store_query_embedding  # Embeddings de preguntas en memoria
 
 import time  # Para medir tiempos de ejecución
 
@@ -18,64 +32,440 @@ router = APIRouter()
 class AskModelRequest(BaseModel):
     question: str  # Pregunta del usuario
     model: str  # Nombre del modelo a usar
+    use_cache: Optional[bool] = None  # Usar la caché semántica de respuestas (por defecto ANSWER_CACHE_ENABLED)
+    session_id: str = DEFAULT_SESSION_ID  # Conversación a la que pertenece la pregunta
+    retrieval_mode: Optional[str] = None  # "hybrid" o "mmr" (por defecto RETRIEVAL_MODE)
+    include_timings: bool = False  # Devolver el desglose de tiempos por etapa en la respuesta
 
-# Ruta para procesar la pregunta del usuario
-@router.post("/ask_model")
-async def ask_model(req: AskModelRequest):
+# Solicitud de /ask_batch: varias preguntas con el mismo modelo y las mismas opciones
+class AskBatchRequest(BaseModel):
+    questions: List[str]  # Preguntas del lote (máximo ASK_BATCH_MAX_QUESTIONS)
+    model: str  # Nombre del modelo a usar
+    use_cache: Optional[bool] = None  # Usar la caché semántica de respuestas (por defecto ANSWER_CACHE_ENABLED)
+    retrieval_mode: Optional[str] = None  # "hybrid" o "mmr" (por defecto RETRIEVAL_MODE)
+    use_history: bool = False  # Usar el historial de session_id como contexto y guardar las respuestas en él
+    session_id: str = DEFAULT_SESSION_ID  # Conversación a usar si use_history es true
+    concurrency: Optional[int] = None  # Respuestas generándose a la vez (máximo ASK_BATCH_CONCURRENCY)
+    include_timings: bool = False  # Devolver el desglose de tiempos de cada respuesta
+
+# Valida la solicitud y devuelve la base de vectores a consultar
+async def validate_request(req: AskModelRequest):
     # Validación básica de campos requeridos
     if not req.model or not req.question:
         raise HTTPException(status_code=400, detail="Complete todos los campos de la pregunta y el modelo.")
+    return await validate_model_and_corpus(req.model, req.retrieval_mode)
+
+# Validaciones comunes a /ask_model y /ask_batch; devuelve la base de vectores a consultar
+async def validate_model_and_corpus(model_name: str, retrieval_mode: Optional[str]):
+    if retrieval_mode is not None and retrieval_mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"Modo de recuperación no válido. Use: {', '.join(RETRIEVAL_MODES)}.")
 
     # Verifica si el modelo existe en Ollama
-    if not is_valid_model(req.model):
-        raise HTTPException(status_code=400, detail=f"El modelo '{req.model}' no está disponible en Ollama.")
+    if not await model_registry.is_available(model_name):
+        raise HTTPException(status_code=400, detail=f"El modelo '{model_name}' no está disponible en Ollama.")
 
-    # Obtiene la instancia actual de la base de vectores
-    vectordb = settings.get_vectordb()
+    # Obtiene la base de vectores de la generación actual, al día con los demás workers
+    vectordb = await get_synced_vectordb()
 
     # Verifica si hay documentos previamente indexados
-    if vectordb._collection.count() == 0:
+    if await run_blocking(vectordb.count) == 0:
         raise HTTPException(status_code=400, detail="No hay documentos indexados. Ingeste archivos primero.")
+    return vectordb
 
-    # Recupera los últimos 2 pares pregunta-respuesta desde Redis para dar contexto al modelo
-    last_pairs = get_last_pairs(k=2)
-    history_text = "\n".join(
-        f"👤 Usuario: {item['question']}\n🤖 IA: {item['answer']}"
-        for item in last_pairs
-    )
+# Calcula el embedding de la pregunta una sola vez por solicitud (lo usan la caché de respuestas
+# y la búsqueda). Se busca primero en memoria y luego en la caché de embeddings en disco; si no
+# está en ninguna, espera turno con prioridad interactiva.
+async def embed_question(question: str, timer: StageTimer):
+    with timer.stage("embedding"):
+        vector = lookup_query_embedding(question)
+        if vector is not None:
+            return vector
+        embeddings = await run_blocking(settings.get_embeddings)
+        lookup_query = getattr(embeddings, "lookup_query", None)
+        vector = await run_blocking(lookup_query, question) if lookup_query else None
+        if vector is None:
+            async with scheduler.slot(settings.EMBED_MODEL, INTERACTIVE):
+                vector = await run_blocking(embeddings.embed_query, question)
+        store_query_embedding(question, vector)
+        return vector
 
-    # Mide el tiempo que tarda la recuperación de documentos
-    start_retrieval = time.time()
+# Consulta la caché semántica de respuestas. Devuelve el acierto (o None) y el contexto
+# necesario para guardar la respuesta después; (None, None) si la caché no se usa.
+async def check_answer_cache(req: AskModelRequest, timer: StageTimer, question_embedding):
+    use_cache = ANSWER_CACHE_ENABLED if req.use_cache is None else req.use_cache
+    if not use_cache:
+        return None, None
 
-    # Usa búsqueda MMR para obtener los documentos más útiles
-    retriever = vectordb.as_retriever(
-        search_type="mmr",
-        search_kwargs={"k": 5, "lambda_mult": 0.8}
-    )
-    docs = retriever.invoke(req.question)  # Recupera los documentos más relevantes
-    context = "".join(doc.page_content for doc in docs)  # Extrae solo el contenido del documento
+    with timer.stage("answer_cache"):
+        # La versión se lee antes de generar: si el corpus cambia mientras tanto, la respuesta
+        # queda guardada bajo la versión anterior y nunca se sirve
+        corpus_version = await answer_cache_version()
+        if corpus_version is None:
+            return None, None
+        hit = await lookup_answer(question_embedding, req.model, corpus_version)
+    return hit, {"embedding": question_embedding, "corpus_version": corpus_version}
 
-    end_retrieval = time.time()
-    print(f"Tiempo de recuperación de documentos (retrieval): {end_retrieval - start_retrieval:.2f} segundos")
+# Versión del corpus para las claves de la caché de respuestas; None si Redis no responde
+# (la pregunta se responde sin caché en vez de fallar)
+async def answer_cache_version() -> Optional[int]:
+    try:
+        return await get_corpus_version()
+    except Exception as e:
+        print(f"No se pudo leer la versión del corpus para la caché de respuestas: {e}")
+        return None
 
-    #prompt final para el modelo, uniendo la pregunta, contexto y el historial
-    prompt = build_prompt(req.question, context, history_text)
+# Guarda la respuesta generada en la caché semántica si se está usando
+async def save_to_answer_cache(req: AskModelRequest, cache_context, chunk_ids, answer: str) -> None:
+    if cache_context is None or not answer:
+        return
+    await store_answer(
+        req.question,
+        cache_context["embedding"],
+        req.model,
+        cache_context["corpus_version"],
+        chunk_ids,
+        answer,
+    )
 
-    # Crea la instancia del modelo
-    model = create_chat_model(req.model)
+# Recupera documentos e historial y construye el prompt, midiendo cada etapa
+async def prepare_prompt(req: AskModelRequest, vectordb, timer: StageTimer, question_embedding):
+    # Recupera los últimos 2 pares pregunta-respuesta desde Redis para dar contexto al modelo
+    with timer.stage("history_load"):
+        last_pairs = await get_last_pairs(k=2, session_id=req.session_id)
 
-    # Mide el tiempo de respuesta del modelo
-    start_inference = time.time()
-    resp = model.invoke([HumanMessage(content=prompt)])  # Envía el mensaje al modelo
-    end_inference = time.time()
-    print(f"Tiempo de inferencia del modelo (Ollama): {end_inference - start_inference:.2f} segundos")
+    # Recupera los documentos más relevantes (búsqueda híbrida BM25 + vectores, o MMR);
+    # Chroma es síncrono, así que se ejecuta en el executor
+    with timer.stage("retrieval"):
+        docs = await run_blocking(retrieve, vectordb, req.question, req.retrieval_mode,
+                                  embedding=question_embedding)
 
-    # Guarda el nuevo par pregunta-respuesta en el historial de Redis
-    add_pair(req.question, resp.content)
+    # Prompt final: une fragmentos contiguos, quita duplicados y ajusta contexto e historial
+    # a la ventana del modelo
+    with timer.stage("prompt_build"):
+        prompt_context = build_prompt_context(req.question, docs, last_pairs, req.model)
+    return prompt_context
 
+# Conteo de tokens del prompt (estimado antes de enviar y real según Ollama) y de la respuesta
+def usage_info(prompt_context, response_metadata: dict) -> dict:
     return {
+        "prompt_tokens_estimated": prompt_context.prompt_tokens_estimated,
+        "prompt_tokens": response_metadata.get("prompt_eval_count"),
+        "completion_tokens": response_metadata.get("eval_count"),
+        "context_tokens_estimated": prompt_context.context_tokens_estimated,
+        "history_pairs": prompt_context.history_pairs,
+        "context_truncated": prompt_context.context_truncated,
+        "chunks": {
+            "retrieved": prompt_context.chunks_retrieved,
+            "merged": prompt_context.chunks_merged,
+            "duplicated": prompt_context.chunks_duplicated,
+            "dropped": prompt_context.chunks_dropped,
+        },
+    }
+
+# IDs de los fragmentos que terminaron en el contexto
+def context_chunk_ids(prompt_context) -> list:
+    return [chunk_id for source in prompt_context.sources for chunk_id in source["chunk_ids"]]
+
+# Ruta para procesar la pregunta del usuario
+@router.post("/ask_model")
+async def ask_model(req: AskModelRequest):
+    with IN_FLIGHT.labels(endpoint="ask_model").track_inprogress():
+        timer = StageTimer(ASK_STAGE_SECONDS)
+        with timer.stage("validation"):
+            vectordb = await validate_request(req)
+        question_embedding = await embed_question(req.question, timer)
+
+        # Si una pregunta equivalente ya se respondió con este modelo y corpus, se reutiliza la respuesta
+        cached, cache_context = await check_answer_cache(req, timer, question_embedding)
+        if cached:
+            with timer.stage("history_save"):
+                history_item = await add_pair(req.question, cached["answer"], req.session_id)
+            response = {
+                "question": req.question,
+                "model": req.model,
+                "answer": cached["answer"],
+                "cached": True,
+                "session_id": req.session_id,
+                "history_item": history_item
+            }
+            if req.include_timings:
+                response["timings"] = timer.summary()
+            return response
+
+        prompt_context = await prepare_prompt(req, vectordb, timer, question_embedding)
+
+        # Instancia del modelo reutilizada entre solicitudes
+        model = get_chat_model(req.model)
+
+        # Espera turno para el modelo (429/503 si está saturado) y le envía el mensaje
+        with timer.stage("queue"):
+            lease = await scheduler.acquire(req.model, INTERACTIVE)
+        try:
+            with timer.stage("inference"):
+                resp = await model.ainvoke(build_messages(prompt_context.prompt))
+        finally:
+            lease.release()
+        observe_llm_metadata(req.model, resp.response_metadata)
+
+        # Guarda el nuevo par pregunta-respuesta en el historial de Redis
+        with timer.stage("history_save"):
+            history_item = await add_pair(req.question, resp.content, req.session_id)
+        await save_to_answer_cache(req, cache_context, context_chunk_ids(prompt_context), resp.content)
+
+        # Solo se devuelve el par nuevo; el historial completo se consulta paginado en /history
+        response = {
+            "question": req.question,
+            "model": req.model,
+            "answer": resp.content,
+            "cached": False,
+            "session_id": req.session_id,
+            "history_item": history_item,
+            "usage": usage_info(prompt_context, resp.response_metadata),
+        }
+        if req.include_timings:
+            response["timings"] = timer.summary()
+        return response
+
+# Formatea un evento Server-Sent Events con su nombre y datos en JSON
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Ruta para procesar la pregunta enviando la respuesta token a token (Server-Sent Events)
+# Eventos emitidos, en orden: "metadata" (documentos recuperados), "token" (fragmentos
+# de la respuesta a medida que Ollama los genera) y "done" (tiempos y uso de tokens), o "error"
+# en lugar de "done" si la generación falla a mitad de la respuesta
+@router.post("/ask_model/stream")
+async def ask_model_stream(req: AskModelRequest):
+    # La solicitud cuenta como en curso mientras se prepara y, después, mientras dura el stream
+    in_flight = IN_FLIGHT.labels(endpoint="ask_model_stream")
+    with in_flight.track_inprogress():
+        # Las validaciones se hacen antes de abrir el stream para poder responder con errores HTTP
+        timer = StageTimer(ASK_STAGE_SECONDS)
+        with timer.stage("validation"):
+            vectordb = await validate_request(req)
+        question_embedding = await embed_question(req.question, timer)
+
+        cached, cache_context = await check_answer_cache(req, timer, question_embedding)
+        if cached:
+            return StreamingResponse(cached_event_stream(req, cached), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+        prompt_context = await prepare_prompt(req, vectordb, timer, question_embedding)
+        model = get_chat_model(req.model)
+
+        # El turno se pide antes de abrir el stream, así una saturación responde 429/503 de inmediato.
+        # Se libera al terminar el stream o, si este nunca empieza, al cerrar la respuesta.
+        with timer.stage("queue"):
+            lease = await scheduler.acquire(req.model, INTERACTIVE)
+
+    async def event_stream():
+        in_flight.inc()
+        answer_parts = []
+        ollama_metadata = {}
+        first_token_time = None
+        completed = False
+        start_inference = time.time()
+
+        try:
+            yield sse_event("metadata", {
+                "question": req.question,
+                "model": req.model,
+                "cached": False,
+                "sources": [
+                    {"source": source["source"], "page": source["page"]}
+                    for source in prompt_context.sources
+                ],
+                "retrieval_time": timer.timings.get("retrieval"),
+            })
+
+            async for chunk in model.astream(build_messages(prompt_context.prompt)):
+                if chunk.content:
+                    if first_token_time is None:
+                        first_token_time = time.time()
+                    answer_parts.append(chunk.content)
+                    yield sse_event("token", {"content": chunk.content})
+                # El último fragmento trae los conteos de tokens y duraciones de Ollama
+                if chunk.response_metadata:
+                    ollama_metadata.update(chunk.response_metadata)
+
+            completed = True
+            end_inference = time.time()
+            timer.record("inference", end_inference - start_inference)
+            if first_token_time is not None:
+                timer.record("time_to_first_token", first_token_time - start_inference)
+            observe_llm_metadata(req.model, ollama_metadata)
+
+            yield sse_event("done", {
+                "timings": timer.summary(),
+                "usage": usage_info(prompt_context, ollama_metadata),
+            })
+        except Exception as e:
+            # Error de Ollama a mitad de la respuesta (caída, tiempo agotado): se envía un evento final
+            # de error para que el cliente no confunda la respuesta cortada con una completa
+            print(f"Error al generar la respuesta en streaming: {e}")
+            yield sse_event("error", {"detail": f"Error al generar la respuesta: {e}"})
+        finally:
+            lease.release()
+            in_flight.dec()
+            # Se guarda el historial al terminar o si el cliente se desconecta a mitad de la respuesta
+            # (protegido de la cancelación que produce la desconexión)
+            answer = "".join(answer_parts)
+            if answer:
+                with anyio.CancelScope(shield=True):
+                    with timer.stage("history_save"):
+                        await add_pair(req.question, answer, req.session_id)
+                    # Solo se guarda en caché una respuesta completa
+                    if completed:
+                        await save_to_answer_cache(req, cache_context, context_chunk_ids(prompt_context), answer)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(lease.release),
+    )
+
+# Stream equivalente para una respuesta servida desde la caché semántica
+async def cached_event_stream(req: AskModelRequest, cached: dict):
+    await add_pair(req.question, cached["answer"], req.session_id)
+    yield sse_event("metadata", {
         "question": req.question,
         "model": req.model,
+        "cached": True,
+        "similarity": cached["similarity"],
+        "sources": [{"chunk_id": chunk_id} for chunk_id in cached["chunk_ids"]],
+    })
+    yield sse_event("token", {"content": cached["answer"]})
+    yield sse_event("done", {"timings": {}, "cached": True})
+
+# Valida una solicitud de /ask_batch y devuelve la base de vectores a consultar
+async def validate_batch_request(req: AskBatchRequest):
+    if not req.model or not req.questions:
+        raise HTTPException(status_code=400, detail="Envíe al menos una pregunta y el modelo.")
+    if len(req.questions) > ASK_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"El lote admite como máximo {ASK_BATCH_MAX_QUESTIONS} preguntas.")
+    empty = [index for index, question in enumerate(req.questions) if not question.strip()]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Hay preguntas vacías en las posiciones: {empty}.")
+    if req.concurrency is not None and req.concurrency <= 0:
+        raise HTTPException(status_code=400, detail="concurrency debe ser un número entero positivo.")
+    return await validate_model_and_corpus(req.model, req.retrieval_mode)
+
+# Genera la respuesta de una pregunta del lote con los documentos ya recuperados.
+# `slots` limita cuántas respuestas del lote se generan a la vez; el turno del modelo se pide
+# con prioridad de ingesta para no desplazar a las preguntas interactivas.
+async def answer_batch_question(req: AskBatchRequest, index: int, docs, last_pairs, cache_context,
+                                slots: asyncio.Semaphore) -> Dict:
+    question = req.questions[index]
+    timer = StageTimer(ASK_STAGE_SECONDS)
+    async with slots:
+        with timer.stage("prompt_build"):
+            prompt_context = build_prompt_context(question, docs, last_pairs, req.model)
+        with timer.stage("queue"):
+            lease = await scheduler.acquire(req.model, BULK)
+        try:
+            with timer.stage("inference"):
+                resp = await get_chat_model(req.model).ainvoke(build_messages(prompt_context.prompt))
+        finally:
+            lease.release()
+    observe_llm_metadata(req.model, resp.response_metadata)
+
+    if req.use_history:
+        with timer.stage("history_save"):
+            await add_pair(question, resp.content, req.session_id)
+    if cache_context is not None and resp.content:
+        await store_answer(question, cache_context["embedding"], req.model, cache_context["corpus_version"],
+                           context_chunk_ids(prompt_context), resp.content)
+
+    result = {
+        "index": index,
+        "question": question,
         "answer": resp.content,
-        "history": get_full_history()
+        "cached": False,
+        "sources": [{"source": source["source"], "page": source["page"]} for source in prompt_context.sources],
+        "usage": usage_info(prompt_context, resp.response_metadata),
     }
+    if req.include_timings:
+        result["timings"] = timer.summary()
+    return result
+
+# Ruta para responder un lote de preguntas (evaluaciones, reportes). Las etapas compartidas se hacen
+# una sola vez para todo el lote: validación, embeddings en una llamada y recuperación en una pasada
+# sobre la base vectorial. Las respuestas se generan con concurrencia acotada y se envían como NDJSON
+# (una línea JSON por pregunta, en el orden en que terminan, con su "index" en el lote) y al final
+# una línea con "done": true y el resumen. Por defecto no se lee ni se escribe el historial.
+@router.post("/ask_batch")
+async def ask_batch(req: AskBatchRequest):
+    in_flight = IN_FLIGHT.labels(endpoint="ask_batch")
+    with in_flight.track_inprogress():
+        timer = StageTimer(ASK_BATCH_STAGE_SECONDS)
+        with timer.stage("validation"):
+            vectordb = await validate_batch_request(req)
+        with timer.stage("embedding"):
+            embeddings = await embed_questions(req.questions)
+
+        # Preguntas equivalentes ya respondidas con este modelo y corpus
+        cached: List[Optional[Dict]] = [None] * len(req.questions)
+        cache_contexts: List[Optional[Dict]] = [None] * len(req.questions)
+        use_cache = ANSWER_CACHE_ENABLED if req.use_cache is None else req.use_cache
+        if use_cache:
+            with timer.stage("answer_cache"):
+                corpus_version = await answer_cache_version()
+                for index, embedding in enumerate(embeddings if corpus_version is not None else []):
+                    cached[index] = await lookup_answer(embedding, req.model, corpus_version)
+                    cache_contexts[index] = {"embedding": embedding, "corpus_version": corpus_version}
+
+        last_pairs = []
+        if req.use_history:
+            with timer.stage("history_load"):
+                last_pairs = await get_last_pairs(k=2, session_id=req.session_id)
+
+        # Recuperación de todas las preguntas sin respuesta en caché, en una sola pasada
+        pending = [index for index, hit in enumerate(cached) if hit is None]
+        retrieved = []
+        if pending:
+            with timer.stage("retrieval"):
+                retrieved = await run_blocking(
+                    retrieve_many, vectordb, [req.questions[i] for i in pending], [embeddings[i] for i in pending],
+                    req.retrieval_mode,
+                )
+
+    slots = asyncio.Semaphore(min(req.concurrency or ASK_BATCH_CONCURRENCY, ASK_BATCH_CONCURRENCY))
+
+    async def run(index: int, docs) -> Dict:
+        try:
+            return await answer_batch_question(req, index, docs, last_pairs, cache_contexts[index], slots)
+        except Exception as e:
+            return {"index": index, "question": req.questions[index], "error": f"Error al generar la respuesta: {e}"}
+
+    async def result_stream():
+        in_flight.inc()
+        tasks = [asyncio.create_task(run(index, docs)) for index, docs in zip(pending, retrieved)]
+        errors = 0
+        try:
+            for index, hit in enumerate(cached):
+                if hit is not None:
+                    if req.use_history:
+                        await add_pair(req.questions[index], hit["answer"], req.session_id)
+                    line = {"index": index, "question": req.questions[index], "answer": hit["answer"],
+                            "cached": True, "similarity": hit["similarity"]}
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                errors += "error" in result
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "done": True,
+                "questions": len(req.questions),
+                "cached": len(req.questions) - len(pending),
+                "errors": errors,
+                "timings": timer.summary(),
+            }) + "\n"
+        finally:
+            # Si el cliente se desconecta no se siguen generando las respuestas pendientes
+            for task in tasks:
+                task.cancel()
+            in_flight.dec()
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException
+
+from config import ingestion
+from config.utils import run_blocking
+from config.corpus import bump_corpus_version, get_synced_indexes, get_synced_vectordb
+
+router = APIRouter()
+
+# Ruta para listar los documentos indexados (nombre, huella, fragmentos y fecha de ingesta)
+@router.get("/documents")
+async def list_documents():
+    vectordb = await get_synced_vectordb()
+    return {"documents": await run_blocking(ingestion.list_documents, vectordb)}
+
+# Ruta para eliminar un documento y todos sus fragmentos sin resetear toda la base
+@router.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str):
+    vectordb, lexical_index = await get_synced_indexes()
+    deleted = await run_blocking(ingestion.delete_document, vectordb, lexical_index, doc_id)
+    if deleted == 0:
+        raise HTTPException(status_code=404, detail=f"No existe un documento indexado con id '{doc_id}'.")
+    # El documento ya se borró: si Redis falla solo se registra (los demás workers verán el cambio
+    # con la próxima versión del corpus) en vez de responder con un error un borrado que sí ocurrió
+    try:
+        await bump_corpus_version()
+    except Exception as e:
+        print(f"No se pudo actualizar la versión del corpus tras eliminar '{doc_id}': {e}")
+    return {"status": "deleted", "doc_id": doc_id, "chunks_removed": deleted}
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from config.health import readiness
+
+router = APIRouter()
+
+# Ruta GET de liveness: responde mientras el proceso atienda solicitudes, sin consultar dependencias
+@router.get("/healthz", tags=["Salud"])
+async def healthz():
+    return {"status": "ok"}
+
+# Ruta GET de readiness: 200 si Redis, Ollama y la base vectorial responden; 503 con el detalle si no
+@router.get("/readyz", tags=["Salud"])
+async def readyz():
+    result = await readiness()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
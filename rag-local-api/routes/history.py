@@ -1,21 +1,27 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
 
 # Importa las funciones del historial
-from config.history import get_full_history, clear_history
+from config.history import get_history_page, clear_history, DEFAULT_SESSION_ID
 
 router = APIRouter()
 
-# Ruta para obtener el historial completo de conversación
+# Ruta para obtener el historial de conversación de una sesión, paginado desde lo más reciente.
+# Para pedir pares más antiguos se envía el 'next_cursor' de la respuesta anterior como 'cursor'.
 @router.get("/history")
-async def get_chat_history():
-    return get_full_history()
+async def get_chat_history(
+    session_id: str = Query(DEFAULT_SESSION_ID),
+    cursor: Optional[int] = Query(None),
+    limit: int = Query(20, ge=1, le=200),
+):
+    return await get_history_page(session_id, cursor, limit)
 
-# Ruta para limpiar/eliminar todo el historial de conversación
+# Ruta para limpiar/eliminar todo el historial de conversación de una sesión
 @router.post("/clearHistory")
-async def clear_chat_history():
+async def clear_chat_history(session_id: str = Query(DEFAULT_SESSION_ID)):
     try:
         # Llama a la función que elimina el historial en Redis
-        clear_history()
+        await clear_history(session_id)
         return {"message": "Historial de conversación eliminado correctamente."}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
@@ -2,26 +2,34 @@ import os
 import tempfile
 from pydantic import BaseModel
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from typing import List, Optional
-
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from typing import List, Optional, Tuple
 
 #configuración, validaciones, utilidades
 from config import settings
-from config.utils import validate_file, LOADERS
-from langchain_core.documents import Document
+from config.utils import validate_file, run_blocking, LOADERS
+from config import ingestion
+from config.parsing import friendly_error
+from config.jobs import new_job, save_job, get_job
+from config.ingest_pipeline import UploadedFile, start_ingest_job
+from config.corpus import bump_corpus_version, new_vector_generation
 
 router = APIRouter()
 
-# Ruta para ingestar documentos
-@router.post("/ingest")
+# Copia el archivo subido a un temporal por bloques y devuelve su ruta y la huella de su contenido
+def save_upload(file: UploadFile, suffix: str) -> Tuple[str, str]:
+    file.file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        file_hash = ingestion.copy_with_fingerprint(file.file, tmp)
+        return tmp.name, file_hash
+
+# Ruta para ingestar documentos: guarda los archivos y devuelve de inmediato el id del trabajo.
+# El procesamiento ocurre en segundo plano; el progreso se consulta en /ingest/{job_id}.
+@router.post("/ingest", status_code=202)
 async def ingest(
     files: List[UploadFile] = File(...),  # Permite subir uno o varios archivos
     chunk_size: Optional[int] = Form(1000),  # Tamaño de cada fragmento de texto
     chunk_overlap: Optional[int] = Form(50),  # Porcentaje de solapamiento entre fragmentos
 ):
-    vectordb = settings.get_vectordb()  # Obtiene la instancia actual de la base vectorial
-
     if not files:
         raise HTTPException(status_code=400, detail="Debes enviar al menos un archivo.")
     
@@ -33,107 +41,82 @@ async def ingest(
     if chunk_overlap >= chunk_size:
         raise HTTPException(status_code=400, detail="chunk_overlap debe ser menor que chunk_size.")
 
-    # Variables auxiliares para la respuesta final
-    total_chunks = 0
-    indexed_files = []
+    uploads = []
     errors = []
 
-    # Procesamiento de cada archivo recibido
-    for file in files:
-        validate_file(file)  # Validar tamaño y tipo permitido
-        suffix = os.path.splitext(file.filename)[-1].lower()  # Obtener extensión
-        tmp_path = None
-
-        # Verificar si hay un loader para la extensión dada
-        if suffix not in LOADERS:
-            errors.append({"file": file.filename, "error": f"Tipo de archivo no soportado: {suffix}"})
-            continue
-
-        try:
-            # Guardar archivo temporalmente
-            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-                tmp.write(await file.read())
-                tmp_path = tmp.name
-
-            # Cargar el archivo con el loader adecuado
-            loader = LOADERS[suffix](tmp_path)
-            raw_documents = loader.load()
-
-            # Función auxiliar para extraer texto de un documento
-            def extract_text(doc):
-                if isinstance(doc, tuple):
-                    return doc[0]
-                elif isinstance(doc, Document):
-                    return doc.page_content
-                return str(doc)
-
-            # Verificar si el documento tiene texto legible
-            if not raw_documents or all(len(extract_text(doc).strip()) < 20 for doc in raw_documents):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"El archivo {file.filename} parece estar escaneado o no contiene texto extraíble."
-                )
-
-            # Convertir los documentos a objetos Document de LangChain
-            processed_documents = []
-            for doc in raw_documents:
-                if isinstance(doc, tuple):
-                    content, metadata = doc
-                    if not isinstance(metadata, dict):
-                        metadata = {"source": file.filename}
-                    processed_documents.append(Document(page_content=content, metadata=metadata))
-                elif isinstance(doc, Document):
-                    processed_documents.append(doc)
-                else:
-                    processed_documents.append(Document(page_content=str(doc), metadata={"source": file.filename}))
-
-            # Dividir documentos en fragmentos (chunks)
-            splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-            docs = splitter.split_documents(processed_documents)
-
-            # Agregar documentos a la base vectorial
-            vectordb.add_documents(docs)
-
-            total_chunks += len(docs)
-            indexed_files.append(file.filename)
-
-        except HTTPException as ve:
-            errors.append({"file": file.filename, "error": ve.detail})
-        except Exception as e:
-            error_msg = str(e)
-            if "Invalid Elementary Object" in error_msg or "Could not read malformed PDF file" in error_msg:
-                friendly_error = (
-                    f"El archivo '{file.filename}' parece estar dañado o contener contenido no estándar. "
-                    "Asegúrate de subir un PDF válido con texto extraíble."
-                )
-            else:
-                friendly_error = f"Hubo un error al procesar '{file.filename}': {error_msg}"
-            errors.append({"file": file.filename, "error": friendly_error})
-        finally:
-            # Elimina el archivo temporal
-            if tmp_path and os.path.exists(tmp_path):
-                os.remove(tmp_path)
+    # Guarda cada archivo recibido en disco para procesarlo después de responder.
+    # Los archivos inválidos se reportan en el resumen del trabajo sin detener el resto de la carga.
+    try:
+        for file in files:
+            try:
+                validate_file(file)  # Validar tamaño y tipo permitido
+            except HTTPException as e:
+                errors.append({"file": file.filename, "error": e.detail})
+                await file.close()
+                continue
+            suffix = os.path.splitext(file.filename)[-1].lower()  # Obtener extensión
+
+            # Verificar si hay un loader para la extensión dada
+            if suffix not in LOADERS:
+                errors.append({"file": file.filename, "error": f"Tipo de archivo no soportado: {suffix}"})
+                await file.close()
+                continue
+
+            try:
+                tmp_path, file_hash = await run_blocking(save_upload, file, suffix)
+                uploads.append(UploadedFile(
+                    filename=file.filename,
+                    suffix=suffix,
+                    path=tmp_path,
+                    file_hash=file_hash,
+                ))
+            except Exception as e:
+                errors.append({"file": file.filename, "error": friendly_error(file.filename, e)})
+            finally:
+                await file.close()
+
+        # Crea el trabajo y lo lanza en segundo plano (los errores de carga se incluyen en su resumen final)
+        job = new_job([upload.filename for upload in uploads], chunk_size, chunk_overlap)
+        job["upload_errors"] = errors
+        await save_job(job)
+    except BaseException:
+        # Si la petición falla antes de lanzar el trabajo, nadie más borrará los temporales
+        for upload in uploads:
+            if os.path.exists(upload.path):
+                os.remove(upload.path)
+        for file in files:
             await file.close()
-
-    # Construir la respuesta final
-    response = {
-        "status": "partial_success" if errors else "indexed",
-        "files_indexed": indexed_files,
-        "total_chunks": total_chunks,
-    }
-    if errors:
-        response["errors"] = errors
-    return response
-
-# Ruta para eliminar todos los embeddings de ChromaDB
+        raise
+    start_ingest_job(job, uploads)
+    return job
+
+# Ruta para consultar el progreso de un trabajo de ingesta
+@router.get("/ingest/{job_id}")
+async def ingest_status(job_id: str):
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No existe el trabajo de ingesta '{job_id}'.")
+    return job
+
+# Ruta para eliminar todos los embeddings: cambia a una generación nueva y vacía de la base vectorial
+# (los demás workers la abren al sincronizarse) y borra los datos de las generaciones anteriores
 @router.delete("/reset_embeddings")
 async def reset_embeddings():
     try:
-        # Reinicia la base de datos vectorial
-        settings.reset_vectordb()
+        generation = await new_vector_generation()
+        version = await bump_corpus_version()
+        await run_blocking(settings.reset_vectordb, generation, version)
         return {
             "status": "ok",
             "message": "Base de datos reseteada completamente."
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al resetear base de datos: {e}")
+
+# Ruta para consultar el estado de la caché de embeddings (aciertos, fallos y tamaño)
+@router.get("/embeddings/cache")
+async def embedding_cache_stats():
+    embeddings = await run_blocking(settings.get_embeddings)
+    if not hasattr(embeddings, "stats"):
+        return {"enabled": False}
+    return {"enabled": True, **embeddings.stats()}
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from config import settings
+from config.utils import run_blocking
+from config.corpus import sync_corpus
+from config.metrics import (
+    COLLECTION_CHUNKS, LEXICAL_INDEX_CHUNKS, EMBED_CACHE_ENTRIES, EMBED_CACHE_HITS, EMBED_CACHE_MISSES,
+)
+
+router = APIRouter()
+
+# Actualiza los indicadores de tamaño (colección, índice léxico, caché de embeddings)
+def update_size_gauges() -> None:
+    COLLECTION_CHUNKS.set(settings.get_vectordb().count())
+    LEXICAL_INDEX_CHUNKS.set(len(settings.get_lexical_index()))
+    embeddings = settings.get_embeddings()
+    if hasattr(embeddings, "stats"):
+        stats = embeddings.stats()
+        EMBED_CACHE_ENTRIES.set(stats["entries"])
+        EMBED_CACHE_HITS.set(stats["hits"])
+        EMBED_CACHE_MISSES.set(stats["misses"])
+
+# Ruta GET con las métricas en formato Prometheus
+@router.get("/metrics", tags=["Métricas"])
+async def metrics():
+    try:
+        await sync_corpus()
+        await run_blocking(update_size_gauges)
+    except Exception as e:
+        print(f"Error al actualizar las métricas de tamaño: {e}")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,102 @@
+import os
+import sys
+import socket
+import shutil
+import tempfile
+
+import httpx
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, API_DIR)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# La configuración se lee al importar los módulos de la API, así que se fija antes de importar main:
+# Ollama falso y Redis en proceso en puertos libres, y la base vectorial en un directorio temporal
+WORKDIR = tempfile.mkdtemp(prefix="rag_tests_")
+OLLAMA_PORT = free_port()
+REDIS_PORT = free_port()
+os.environ.update({
+    "OLLAMA_HOST": f"http://127.0.0.1:{OLLAMA_PORT}",
+    "REDIS_HOST": "127.0.0.1",
+    "REDIS_PORT": str(REDIS_PORT),
+    "REDIS_DB": "0",
+    "REDIS_CONNECT_TIMEOUT": "5",
+    "VECTOR_BACKEND": "numpy",
+    "CHROMA_DIR": os.path.join(WORKDIR, "db"),
+    "EMBED_CACHE_PATH": os.path.join(WORKDIR, "embedding_cache", "embeddings.sqlite3"),
+    "ANSWER_CACHE_ENABLED": "false",
+    "OLLAMA_WARMUP": "false",
+    # Sin límite efectivo en el planificador: las pruebas de concurrencia miden la API, no la admisión
+    "SCHEDULER_CHAT_CONCURRENCY": "32",
+    "SCHEDULER_MAX_QUEUE": "64",
+})
+
+CHAT_MODEL = "llama3.2:latest"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+# Servidor falso de Ollama en un hilo; las pruebas pueden cambiar su latencia (se lee en cada llamada)
+@pytest.fixture(scope="session")
+def fake_ollama():
+    from benchmarks.fake_ollama import FakeOllamaConfig, start_in_thread
+
+    config = FakeOllamaConfig(base_latency=0.0, per_item_latency=0.0, parallel=64, prompt_latency=0.0,
+                              tokens_per_second=1000.0, answer_tokens=3)
+    _, server = start_in_thread(config, OLLAMA_PORT)
+    yield config
+    server.should_exit = True
+
+
+@pytest.fixture(scope="session")
+def fake_redis():
+    from benchmarks.load_bench import start_fake_redis
+
+    start_fake_redis(REDIS_PORT)
+
+
+# La API con su lifespan (conexiones, tareas en segundo plano) durante toda la sesión
+@pytest.fixture(scope="session")
+async def app(fake_ollama, fake_redis):
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture
+async def client(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=60) as client:
+        yield client
+
+
+# Fragmentos indexados directamente en la base vectorial y el índice léxico (sin pasar por /ingest)
+@pytest.fixture(scope="session")
+def indexed_corpus(app):
+    from config import settings
+    from benchmarks.fake_ollama import fake_embedding
+
+    texts = [
+        "Factura 17: número de cuenta 123456 del Banco Central, a nombre de Ana Pérez.",
+        "Menú del restaurante: lomo saltado $30.000, ceviche mixto $28.000, pollo a la parrilla $25.000.",
+        "Servicios prestados en marzo: mantenimiento preventivo y soporte técnico por 40 horas.",
+    ]
+    ids = [f"test-doc:{i}" for i in range(len(texts))]
+    settings.get_vectordb().upsert(
+        ids=ids,
+        embeddings=[fake_embedding(text, 1024) for text in texts],
+        documents=texts,
+        metadatas=[{"doc_id": "test-doc", "source": "test.txt", "chunk_index": i} for i in range(len(texts))],
+    )
+    settings.get_lexical_index().add_many(zip(ids, texts))
+    return ids
@@ -0,0 +1,50 @@
+from config.answer_cache import lookup_answer, store_answer
+
+MODEL = "modelo-prueba"
+
+
+# Una pregunta casi idéntica a una ya respondida reutiliza la respuesta; una distinta no
+async def test_lookup_returns_most_similar_answer(app):
+    await store_answer("¿Cuánto cuesta el ceviche?", [1.0, 0.0, 0.0], MODEL, 7, ["doc:1"], "Cuesta $28.000.")
+    await store_answer("¿Quién firmó la factura?", [0.0, 1.0, 0.0], MODEL, 7, ["doc:2"], "Ana Pérez.")
+
+    hit = await lookup_answer([0.99, 0.05, 0.0], MODEL, 7)
+    assert hit["answer"] == "Cuesta $28.000."
+    assert hit["chunk_ids"] == ["doc:1"]
+    assert "embedding" not in hit
+
+    assert await lookup_answer([0.0, 0.0, 1.0], MODEL, 7) is None
+    # Otra versión del corpus no comparte entradas
+    assert await lookup_answer([1.0, 0.0, 0.0], MODEL, 8) is None
+
+
+# Con Redis caído la caché se comporta como un fallo (consulta) y una operación nula (guardado)
+async def test_redis_errors_are_cache_misses(app, monkeypatch):
+    from config import answer_cache
+
+    def broken(*args, **kwargs):
+        raise ConnectionError("Redis no disponible")
+
+    monkeypatch.setattr(answer_cache.redis_client, "lrange", broken)
+    monkeypatch.setattr(answer_cache.redis_client, "pipeline", broken)
+
+    assert await lookup_answer([1.0, 0.0, 0.0], MODEL, 7) is None
+    await store_answer("¿Cuánto cuesta?", [1.0, 0.0, 0.0], MODEL, 7, ["doc:1"], "Cuesta $28.000.")
+
+
+# /ask_model responde aunque no se pueda leer la versión del corpus para la caché
+async def test_ask_model_answers_without_cache_when_redis_fails(client, indexed_corpus, monkeypatch):
+    from tests.conftest import CHAT_MODEL
+
+    async def broken_version():
+        raise ConnectionError("Redis no disponible")
+
+    monkeypatch.setattr("routes.ask.get_corpus_version", broken_version)
+    response = await client.post("/ask_model", json={
+        "question": "¿Cuál es el número de cuenta?",
+        "model": CHAT_MODEL,
+        "session_id": "cache-sin-redis",
+        "use_cache": True,
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["answer"]
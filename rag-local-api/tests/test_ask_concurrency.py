@@ -0,0 +1,40 @@
+import time
+import asyncio
+
+from tests.conftest import CHAT_MODEL
+
+# Solicitudes simultáneas y latencia de cada inferencia en el Ollama falso
+CONCURRENT_ASKS = 8
+INFERENCE_SECONDS = 0.5
+
+
+async def ask(client, question: str, session_id: str):
+    return await client.post("/ask_model", json={
+        "question": question,
+        "model": CHAT_MODEL,
+        "session_id": session_id,
+        "retrieval_mode": "mmr",
+    })
+
+
+# Las consultas a /ask_model no deben bloquear el event loop: N solicitudes a la vez contra un
+# Ollama que tarda INFERENCE_SECONDS por respuesta terminan en el tiempo de unas pocas, no de N
+async def test_concurrent_asks_overlap(client, fake_ollama, indexed_corpus):
+    # La primera consulta paga importaciones y la creación del modelo; no cuenta en la medición
+    response = await ask(client, "precalentamiento", "overlap-warmup")
+    assert response.status_code == 200, response.text
+
+    fake_ollama.prompt_latency = INFERENCE_SECONDS
+    try:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            ask(client, f"¿Cuál es el número de cuenta {i}?", f"overlap-{i}") for i in range(CONCURRENT_ASKS)
+        ))
+        elapsed = time.perf_counter() - start
+    finally:
+        fake_ollama.prompt_latency = 0.0
+
+    assert [r.status_code for r in responses] == [200] * CONCURRENT_ASKS, [r.text for r in responses]
+    assert all(r.json()["answer"] for r in responses)
+    # En serie tardarían CONCURRENT_ASKS * INFERENCE_SECONDS (4 s)
+    assert elapsed < CONCURRENT_ASKS * INFERENCE_SECONDS / 3, f"{elapsed:.2f} s"
@@ -0,0 +1,50 @@
+import json
+
+from tests.conftest import CHAT_MODEL
+
+
+def parse_events(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def stream(client, session_id: str):
+    response = await client.post("/ask_model/stream", json={
+        "question": "¿Cuál es el número de cuenta?",
+        "model": CHAT_MODEL,
+        "session_id": session_id,
+        "use_cache": False,
+    })
+    assert response.status_code == 200, response.text
+    return parse_events(response.text)
+
+
+# La respuesta completa termina con "done", que informa el uso de tokens solo dentro de "usage"
+async def test_stream_ends_with_done(client, indexed_corpus):
+    events = await stream(client, "stream-ok")
+
+    assert [name for name, _ in events][0] == "metadata"
+    name, done = events[-1]
+    assert name == "done"
+    assert "usage" in done and "prompt_tokens" not in done and "completion_tokens" not in done
+
+
+# Si Ollama falla a mitad de la respuesta, el stream termina con un evento "error"
+async def test_stream_reports_midstream_failure(client, indexed_corpus, monkeypatch):
+    class Chunk:
+        content = "La cuenta es"
+        response_metadata = {}
+
+    class FailingModel:
+        async def astream(self, messages):
+            yield Chunk()
+            raise TimeoutError("Ollama no respondió")
+
+    monkeypatch.setattr("routes.ask.get_chat_model", lambda model_name: FailingModel())
+    events = await stream(client, "stream-error")
+
+    assert [name for name, _ in events] == ["metadata", "token", "error"]
+    assert "Ollama no respondió" in events[-1][1]["detail"]
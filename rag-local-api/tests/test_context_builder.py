@@ -0,0 +1,50 @@
+from langchain_core.documents import Document
+
+from config import context_builder
+from config.context_builder import build_prompt_context
+
+PASSAGE = "Cuenta corriente 123-456789-00 del Banco Central a nombre de Ana Pérez. " * 20
+
+
+def docs():
+    return [Document(id="doc:0", page_content=PASSAGE,
+                     metadata={"doc_id": "doc", "source": "factura.pdf", "chunk_index": 0})]
+
+
+def history(pairs: int):
+    return [{"question": f"Pregunta anterior {i} " * 10, "answer": f"Respuesta anterior {i} " * 30}
+            for i in range(pairs)]
+
+
+def window_tokens(monkeypatch, question: str, extra: int) -> None:
+    base = context_builder.estimate_tokens(context_builder.SYSTEM_PROMPT) + context_builder.estimate_tokens(
+        context_builder.build_prompt(question, "", "")
+    )
+    window = base + context_builder.ANSWER_RESERVED_TOKENS + extra
+    monkeypatch.setattr(context_builder, "context_window", lambda model_name: window)
+
+
+# Si la pregunta y el historial llenan la ventana, se recorta el historial y no el contexto mínimo
+def test_history_yields_to_minimum_context(monkeypatch):
+    question = "¿Cuál es el número de cuenta?"
+    window_tokens(monkeypatch, question, context_builder.CONTEXT_MIN_TOKENS + 100)
+
+    result = build_prompt_context(question, docs(), history(10), "modelo")
+
+    assert result.sources and result.context_tokens_estimated > 0
+    assert result.context_tokens_estimated <= context_builder.CONTEXT_MIN_TOKENS + 100
+    assert result.history_pairs < 10
+    assert not result.context_truncated
+
+
+# Aunque la pregunta llene la ventana, el pasaje más relevante va recortado y se informa
+def test_top_passage_survives_full_window(monkeypatch):
+    question = "¿Cuál es el número de cuenta? " * 50
+    window_tokens(monkeypatch, question, 0)
+
+    result = build_prompt_context(question, docs(), history(3), "modelo")
+
+    assert "123-456789-00" in result.prompt
+    assert [s["source"] for s in result.sources] == ["factura.pdf"]
+    assert result.history_pairs == 0
+    assert result.context_truncated
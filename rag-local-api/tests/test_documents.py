@@ -0,0 +1,44 @@
+from config import settings
+from benchmarks.fake_ollama import fake_embedding
+
+
+def index_document(doc_id: str, texts):
+    ids = [f"{doc_id}:{i}" for i in range(len(texts))]
+    settings.get_vectordb().upsert(
+        ids=ids,
+        embeddings=[fake_embedding(text, 1024) for text in texts],
+        documents=texts,
+        metadatas=[{"doc_id": doc_id, "source": f"{doc_id}.txt", "chunk_index": i} for i in range(len(texts))],
+    )
+    settings.get_lexical_index().add_many(zip(ids, texts))
+    return ids
+
+
+# Si Redis falla después de borrar, el borrado se informa como exitoso (ya ocurrió)
+async def test_delete_succeeds_when_corpus_version_bump_fails(client, monkeypatch):
+    index_document("borrable", ["Acta de entrega de la bodega sur."])
+
+    async def broken_bump():
+        raise ConnectionError("Redis no disponible")
+
+    monkeypatch.setattr("routes.documents.bump_corpus_version", broken_bump)
+    response = await client.delete("/documents/borrable")
+    assert response.status_code == 200, response.text
+    assert response.json()["chunks_removed"] == 1
+    assert settings.get_lexical_index().search("entrega", 5) == []
+
+
+# El borrado quita los fragmentos del índice léxico que se le pasa (el de la generación de la base
+# vectorial), no del que esté abierto globalmente en ese momento
+def test_delete_document_uses_given_lexical_index(app, tmp_path):
+    from config import ingestion
+    from config.lexical_index import LexicalIndex
+
+    ids = index_document("pareado", ["Planilla de turnos del personal de aseo."])
+    paired = LexicalIndex(str(tmp_path / "bm25.sqlite3"))
+    paired.add_many([(ids[0], "Planilla de turnos del personal de aseo.")])
+
+    assert ingestion.delete_document(settings.get_vectordb(), paired, "pareado") == 1
+    assert paired.search("planilla", 5) == []
+    assert [chunk_id for chunk_id, _ in settings.get_lexical_index().search("planilla", 5)] == ids
+    settings.get_lexical_index().remove_many(ids)
@@ -0,0 +1,12 @@
+from config import history
+
+
+# Si Redis falla, la página del historial sale vacía como en los demás accesos al historial
+async def test_history_page_is_empty_when_redis_fails(app, monkeypatch):
+    def broken_pipeline(*args, **kwargs):
+        raise ConnectionError("Redis no disponible")
+
+    monkeypatch.setattr(history.redis_client, "pipeline", broken_pipeline)
+
+    page = await history.get_history_page("sesion-sin-redis")
+    assert page == {"session_id": "sesion-sin-redis", "items": [], "next_cursor": None}
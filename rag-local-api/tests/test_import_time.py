@@ -0,0 +1,20 @@
+import os
+import statistics
+
+from benchmarks.import_bench import HEAVY_MODULES, measure
+
+# Importaciones medidas (cada una en un proceso nuevo) y mediana máxima permitida, como en el benchmark
+IMPORT_RUNS = 3
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 1500))
+
+
+# El arranque en frío de la API no debe cargar LangChain/Ollama, Chroma ni los loaders de PDF/DOCX
+def test_import_main_is_fast_and_lazy():
+    runs = [measure() for _ in range(IMPORT_RUNS)]
+
+    heavy = sorted({name for run in runs for name in run["heavy"]})
+    assert {"langchain_ollama", "chromadb", "pypdf", "docx"} <= set(HEAVY_MODULES)
+    assert heavy == [], f"módulos pesados importados al arrancar: {', '.join(heavy)}"
+
+    median_ms = statistics.median(run["seconds"] * 1000 for run in runs)
+    assert median_ms < IMPORT_BUDGET_MS, f"la mediana ({median_ms:.0f} ms) supera {IMPORT_BUDGET_MS:g} ms"
@@ -0,0 +1,62 @@
+import os
+import asyncio
+
+# Espera máxima a que termine un trabajo de ingesta (el primer parseo arranca el pool de procesos)
+JOB_TIMEOUT_SECONDS = 60
+
+
+async def wait_for_job(client, job_id: str) -> dict:
+    for _ in range(JOB_TIMEOUT_SECONDS * 10):
+        job = (await client.get(f"/ingest/{job_id}")).json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        await asyncio.sleep(0.1)
+    raise AssertionError(f"el trabajo {job_id} no terminó: {job}")
+
+
+# Un archivo con un tipo no permitido se reporta en el resumen sin rechazar el resto de la carga
+async def test_invalid_file_is_reported_without_failing_batch(client):
+    response = await client.post("/ingest", files=[
+        ("files", ("valido.txt", "Informe de mantenimiento preventivo de marzo.".encode(), "text/plain")),
+        ("files", ("programa.exe", b"MZ\x00\x00", "application/octet-stream")),
+    ])
+    assert response.status_code == 202, response.text
+
+    job = response.json()
+    assert [f["file"] for f in job["files"]] == ["valido.txt"]
+    assert [e["file"] for e in job["upload_errors"]] == ["programa.exe"]
+
+    job = await wait_for_job(client, job["job_id"])
+    assert job["status"] == "partial_success", job
+    assert job["files_indexed"] == ["valido.txt"]
+    assert [e["file"] for e in job["errors"]] == ["programa.exe"]
+
+
+# Si falla el cierre del trabajo (por ejemplo, al publicar la versión del corpus), el trabajo queda
+# en "error" en vez de "running" y los temporales de la carga se borran igual
+async def test_job_failure_is_recorded_and_uploads_removed(client, monkeypatch):
+    from config import ingest_pipeline
+
+    uploads = []
+    start_ingest_job = ingest_pipeline.start_ingest_job
+
+    def capture_uploads(job, job_uploads):
+        uploads.extend(job_uploads)
+        start_ingest_job(job, job_uploads)
+
+    async def broken_bump():
+        raise ConnectionError("Redis no disponible")
+
+    monkeypatch.setattr("routes.ingest.start_ingest_job", capture_uploads)
+    monkeypatch.setattr(ingest_pipeline, "bump_corpus_version", broken_bump)
+
+    response = await client.post("/ingest", files=[
+        ("files", ("fallido.txt", "Contrato de arriendo de la bodega norte.".encode(), "text/plain")),
+    ])
+    assert response.status_code == 202, response.text
+
+    job = await wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "error", job
+    assert "Redis no disponible" in job["error"]
+    assert job["finished_at"]
+    assert uploads and not any(os.path.exists(upload.path) for upload in uploads)
@@ -0,0 +1,51 @@
+from config.lexical_index import LexicalIndex
+
+
+# La reconstrucción reemplaza el contenido, guarda la generación de origen y persiste en disco
+def test_rebuild_replaces_index_and_stores_generation(tmp_path):
+    path = str(tmp_path / "bm25.sqlite3")
+    index = LexicalIndex(path)
+    index.add_many([("viejo:0", "fragmento que ya no existe en la base vectorial")])
+    assert index.generation() is None
+
+    index.rebuild(lambda: [("doc:0", "cuenta 123-456789-00 del Banco Central")], 3)
+
+    assert index.generation() == 3
+    assert [chunk_id for chunk_id, _ in index.search("456789", 5)] == ["doc:0"]
+    assert index.search("fragmento", 5) == []
+
+    reopened = LexicalIndex(path)
+    assert reopened.generation() == 3
+    assert len(reopened) == 1
+
+
+# Lo que se escribe mientras se leen los fragmentos de origen no se pierde al reemplazar el índice
+def test_rebuild_keeps_writes_made_while_loading(tmp_path):
+    index = LexicalIndex(str(tmp_path / "bm25.sqlite3"))
+    index.add_many([("doc:1", "ceviche mixto"), ("doc:2", "lomo saltado")])
+
+    def load():
+        index.add_many([("doc:3", "pollo a la parrilla")])  # Ingesta que escribe durante la lectura
+        index.remove_many(["doc:2"])
+        return [("doc:1", "ceviche mixto"), ("doc:2", "lomo saltado")]
+
+    index.rebuild(load, 0)
+
+    assert sorted(index._doc_terms) == ["doc:1", "doc:3"]
+    assert [chunk_id for chunk_id, _ in index.search("parrilla", 5)] == ["doc:3"]
+    assert len(LexicalIndex(str(tmp_path / "bm25.sqlite3"))) == 2
+
+
+# Al cambiar a una generación nueva (vacía) su índice léxico queda marcado: la primera búsqueda
+# híbrida después de /reset_embeddings no reconstruye nada
+def test_new_generation_index_is_marked(tmp_path, monkeypatch):
+    from config import settings
+
+    monkeypatch.setattr(settings, "CHROMA_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "VECTOR_BACKEND", "numpy")
+    state = (settings._generation, settings._corpus_version, settings._vectordb, settings._lexical_index)
+    try:
+        settings.sync_corpus_state(state[0] + 1, 0)
+        assert settings.get_lexical_index().generation() == state[0] + 1
+    finally:
+        (settings._generation, settings._corpus_version, settings._vectordb, settings._lexical_index) = state
@@ -13,7 +13,7 @@ import { formatDate } from "../utils/formatUtils";
 
 function Home() {
   const askModelUrl = "http://localhost:8000/ask_model";
-  const historyUrl = "http://localhost:8000/history";
+  const historyUrl = "http://localhost:8000/history?limit=50";
 
   const chatContainerRef = useRef(null);
 
@@ -36,8 +36,9 @@ function Home() {
   );
 
   useEffect(() => {
-    if (data && data.history) {
-      setChatHistory(data.history);
+    // La API devuelve solo el par recién guardado; se agrega al final del historial
+    if (data && data.history_item) {
+      setChatHistory((prev) => [...prev, data.history_item]);
     }
   }, [data, setChatHistory]);
 
@@ -14,7 +14,8 @@ export function useChatHistory(historyUrl) {
     setHistoryError(null);
     try {
       const response = await axios.get(historyUrl);
-      setChatHistory(response.data);
+      // La API devuelve una página con los pares más recientes de la sesión
+      setChatHistory(response.data.items || []);
     } catch (e) {
       console.error("Error al obtener el historial:", e);
       setHistoryError("Error al cargar el historial. Intente recargar la página.");
@@ -3,6 +3,31 @@ import { Report } from "notiflix/build/notiflix-report-aio";
 import { Confirm } from 'notiflix/build/notiflix-confirm-aio';
 import axios from "axios";
 
+// Intervalo de consulta del estado de un trabajo de ingesta (ms)
+const JOB_POLL_INTERVAL = 1000;
+
+// Consultas máximas antes de dejar de esperar un trabajo (30 minutos con el intervalo anterior)
+const JOB_POLL_MAX_ATTEMPTS = 1800;
+
+// Error de un trabajo de ingesta con el mensaje que se muestra al usuario
+const ingestJobError = (detail) => Object.assign(new Error(detail), { detail });
+
+// Consulta el trabajo de ingesta hasta que termine y devuelve su resumen final
+const waitForIngestJob = async (jobId) => {
+  for (let attempt = 0; attempt < JOB_POLL_MAX_ATTEMPTS; attempt++) {
+    const response = await axios.get(`http://localhost:8000/ingest/${jobId}`);
+    const job = response.data;
+    if (job.status === "error") {
+      throw ingestJobError(job.error || "El trabajo de ingesta terminó con un error.");
+    }
+    if (job.status !== "queued" && job.status !== "running") {
+      return job;
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL));
+  }
+  throw ingestJobError("El trabajo de ingesta no terminó a tiempo; revisa su estado más tarde.");
+};
+
 export function useUploader() {
   const [selectedFiles, setSelectedFiles] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -39,10 +64,12 @@ export function useUploader() {
         },
       });
 
-      setResult(response.data);
+      // La API responde de inmediato con el id del trabajo; el resultado se obtiene al terminar
+      const job = await waitForIngestJob(response.data.job_id);
+      setResult(job);
     } catch (err) {
       const errorMsg =
-        err?.response?.data?.detail || "Ocurrió un error al subir los archivos.";
+        err?.response?.data?.detail || err?.detail || "Ocurrió un error al subir los archivos.";
       setResult({
         files_indexed: [],
         total_chunks: 0,